@@ -34,6 +34,12 @@ def create_app():
     app.config['FRAME_WIDTH'] = 640
     app.config['FRAME_HEIGHT'] = 480
     app.config['FPS'] = 24
+    
+    # MJPEG stream encoding: one encode per camera, shared by every viewer
+    app.config['STREAM_JPEG_QUALITY'] = 80       # OpenCV's default is 95
+    app.config['STREAM_MAX_WIDTH'] = None        # downscale wider frames for remote viewers
+    app.config['STREAM_JPEG_OPTIMIZE'] = False
+    app.config['STREAM_VIEWER_MAX_KBPS'] = None  # per-viewer bandwidth cap; frames over it are skipped
     app.config['PROCTORING_THRESHOLDS'] = {
         'MAX_HEAD_YAW': 25,          # degrees
         'MAX_HEAD_PITCH': 15,        # degrees
@@ -41,7 +47,18 @@ def create_app():
         'MAX_ABSENCE_TIME': 5,       # seconds
         'FACE_CONFIDENCE': 0.8,
         'NECK_MOVEMENT_THRESHOLD': 0.35,
-        'FACE_DETECTION_FREQUENCY': 5, # frames
+        'MOVEMENT_HISTORY_SIZE': 5,   # head positions averaged for movement detection
+        'FACE_DETECTION_FREQUENCY': 5, # frames between detections in a static scene
+        'FACE_TRACK_REFRESH': 10,     # frames between full-frame face scans while faces are tracked
+        'DETECTION_WIDTH': 320,       # Haar cascade width, raised where MIN_FACE_RATIO faces would shrink below 24 px (512 at 640x480)
+        'DETECTION_SCALE_FACTOR': 1.2, # cascade scale step
+        'DETECTION_MIN_NEIGHBORS': 5,
+        'MIN_FACE_RATIO': 30 / 480,   # smallest face height / frame height (30 px at 480p, keeps faces in the background)
+        'MAX_FACE_RATIO': None,       # largest face height / frame height (None: no limit)
+        'TARGET_FRAME_LATENCY': 0.1,  # seconds of analysis per frame before detections are spaced out
+        'MOTION_THRESHOLD': 0.02,     # mean frame difference (0-1) that counts as motion
+        'STATIC_FRAME_THRESHOLD': 0.005, # difference from the last analysed frame below which it is reused
+        'MAX_SKIPPED_FRAMES': 30,     # unchanged frames in a row that may reuse the last analysis
         'EYE_ASPECT_RATIO': 0.2,      # closed eye threshold
         # New procrastination monitoring thresholds
         'MOVEMENT_DURATION_THRESHOLD': 2.0,  # Seconds of continuous movement to trigger alert
@@ -49,6 +66,37 @@ def create_app():
         'ABSENCE_DURATION_THRESHOLD': 5.0,  # Seconds of absence to trigger alert
     }
     
+    # Batch face detection for many simultaneous streams in a process pool
+    app.config['BATCH_DETECTION_ENABLED'] = os.environ.get('BATCH_DETECTION_ENABLED', '').lower() in ('1', 'true')
+    app.config['BATCH_DETECTION_WINDOW'] = 0.01   # seconds to collect a batch
+    app.config['BATCH_DETECTION_MAX_SIZE'] = 32   # frames per batch
+    app.config['BATCH_DETECTION_WORKERS'] = None  # defaults to the CPU count
+    
+    # Frame analysis in worker processes so CV work never blocks the server
+    app.config['ANALYSIS_POOL_ENABLED'] = os.environ.get('ANALYSIS_POOL_ENABLED', '').lower() in ('1', 'true')
+    app.config['ANALYSIS_POOL_WORKERS'] = None      # defaults to the CPU count
+    app.config['ANALYSIS_POOL_MAX_PENDING'] = None  # frames in flight before answering 429, defaults to 2x workers
+    app.config['ANALYSIS_TIMEOUT'] = 5.0            # seconds to wait for a frame's analysis
+    
+    # Warning counters shared by all workers: 'mongo', or 'local' for an SQLite
+    # file in the instance folder when running without MongoDB
+    app.config['WARNING_COUNTER_BACKEND'] = os.environ.get('WARNING_COUNTER_BACKEND', 'mongo')
+    app.config['WARNING_COUNTER_PATH'] = None           # defaults to instance/warning_counters.sqlite3
+    app.config['WARNING_COUNTER_CACHE_TTL'] = 1.0       # seconds a count read from the store is reused
+    app.config['WARNING_COUNTER_WRITE_BEHIND'] = False  # buffer increments and flush them periodically
+    app.config['WARNING_COUNTER_FLUSH_INTERVAL'] = 1.0  # seconds between write-behind flushes
+    
+    # Procrastination violations are written in batches off the request path;
+    # batches the database refuses wait in a spool file in the instance folder
+    app.config['VIOLATION_BUFFER_MAX_BATCH'] = 100       # queued records that trigger a write
+    app.config['VIOLATION_BUFFER_FLUSH_INTERVAL'] = 1.0  # seconds between writes of a partial batch
+    app.config['VIOLATION_SPOOL_PATH'] = None            # defaults to instance/violation_spool.jsonl
+    
+    # Socket.IO message queue (e.g. redis://localhost:6379/0) through which
+    # every server process emits, so a push reaches a student connected to
+    # another process; required when running more than one process
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    
     # Ensure instance folder exists
     try:
         os.makedirs(app.instance_path)
@@ -76,8 +124,56 @@ def create_app():
     app.config['SESSION_FILE_DIR'] = os.path.join(app.instance_path, 'flask_session')
     sess.init_app(app)
     
+    # Size the head-position ring buffer, motion gate and face tracker of new proctoring sessions
+    from .utils.proctor_session import proctor_sessions
+    proctor_sessions.position_history = app.config['PROCTORING_THRESHOLDS']['MOVEMENT_HISTORY_SIZE']
+    proctor_sessions.static_threshold = app.config['PROCTORING_THRESHOLDS']['STATIC_FRAME_THRESHOLD']
+    proctor_sessions.max_skipped_frames = app.config['PROCTORING_THRESHOLDS']['MAX_SKIPPED_FRAMES']
+    proctor_sessions.face_track_refresh = app.config['PROCTORING_THRESHOLDS']['FACE_TRACK_REFRESH']
+    
+    # Warning counter used by the exam routes
+    from .utils.warning_counter import create_warning_counter, set_warning_counter
+    set_warning_counter(create_warning_counter(app.config, app.instance_path))
+    
+    # Background writer for procrastination violation records
+    from .utils.violation_buffer import create_violation_buffer, set_violation_buffer
+    set_violation_buffer(create_violation_buffer(app.config, app.instance_path))
+    
+    # Haar cascade resolution and face sizes, before any worker is started
+    from .utils.cascade_settings import CascadeSettings, set_detection_settings
+    set_detection_settings(CascadeSettings.from_thresholds(app.config['PROCTORING_THRESHOLDS']))
+    
+    # Move frame analysis into worker processes if enabled
+    analysis_pool = None
+    if app.config['ANALYSIS_POOL_ENABLED']:
+        from .utils.analysis_pool import AnalysisPool, set_analysis_pool
+        analysis_pool = AnalysisPool(
+            workers=app.config['ANALYSIS_POOL_WORKERS'],
+            max_pending=app.config['ANALYSIS_POOL_MAX_PENDING'],
+            timeout=app.config['ANALYSIS_TIMEOUT'],
+            face_track_refresh=app.config['PROCTORING_THRESHOLDS']['FACE_TRACK_REFRESH']
+        )
+        set_analysis_pool(analysis_pool)
+    
+    # Route cascade detection through the batching engine if enabled,
+    # sharing the analysis workers when there are any
+    if app.config['BATCH_DETECTION_ENABLED']:
+        from .utils.batch_engine import BatchDetectionEngine
+        from .utils.face_detection import set_batch_engine
+        set_batch_engine(BatchDetectionEngine(
+            max_batch=app.config['BATCH_DETECTION_MAX_SIZE'],
+            window=app.config['BATCH_DETECTION_WINDOW'],
+            workers=analysis_pool.workers if analysis_pool else app.config['BATCH_DETECTION_WORKERS'],
+            pool=analysis_pool
+        ))
+    
     # Initialize SocketIO
-    socketio.init_app(app, cors_allowed_origins="*", async_mode='eventlet')
+    socketio.init_app(app, cors_allowed_origins="*", async_mode='eventlet',
+                      message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
+    
+    # Exam pages report violations over their own namespace
+    from .utils.exam_channel import ExamNamespace
+    socketio.on_namespace(ExamNamespace())
     
     # Register SocketIO event handlers
     @socketio.on('exam_warning')
@@ -94,6 +190,13 @@ def create_app():
             }]
         })
     
+    # One-off move of per-poll violation records into the timeline buckets:
+    # flask --app app migrate-violations
+    @app.cli.command('migrate-violations')
+    def migrate_violations():
+        from .utils.violation_timeline import migrate_legacy_records
+        print(f"Migrated {migrate_legacy_records()} procrastination violation records")
+    
     # Add context processor for csrf_token (disabled for procrastination detection)
     @app.context_processor
     def inject_csrf_token():
@@ -16,6 +16,8 @@ class MongoConfig:
     EXAMS_COLLECTION = 'exams'
     SUBMISSIONS_COLLECTION = 'submissions'
     CLASSES_COLLECTION = 'classes'
+    WARNING_COUNTERS_COLLECTION = 'warning_counters'
+    VIOLATION_TIMELINE_COLLECTION = 'violation_timeline'
     
     # Indexes
     INDEXES = {
@@ -42,6 +44,15 @@ class MongoConfig:
             IndexModel([('teacher_id', ASCENDING)]),
             IndexModel([('students', ASCENDING)]),
             IndexModel([('created_at', DESCENDING)])
+        ],
+        WARNING_COUNTERS_COLLECTION: [
+            # Atomic $inc upserts need exactly one counter per student and exam
+            IndexModel([('student_id', ASCENDING), ('exam_id', ASCENDING)], unique=True)
+        ],
+        VIOLATION_TIMELINE_COLLECTION: [
+            # One bucket per student, exam and time slot; also what makes retried flushes idempotent
+            IndexModel([('student_id', ASCENDING), ('exam_id', ASCENDING), ('bucket', ASCENDING)], unique=True),
+            IndexModel([('exam_id', ASCENDING)])
         ]
     }
     
@@ -1,8 +1,9 @@
 import os
 from flask_pymongo import PyMongo
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
 from .models import User, Exam, Question, Submission, Class
+from pymongo import ReturnDocument
 from pymongo.errors import ConnectionFailure
 import traceback
 
@@ -1695,15 +1696,91 @@ class MongoManager:
             return []
 
     @staticmethod
-    def get_warning_count(student_id, exam_id):
-        """Get the total warning count for a student in an exam"""
+    def get_warning_count(student_id, exam_id, default=0):
+        """Get the total warning count for a student in an exam, or `default` on error"""
         try:
-            # Count warnings from the warnings collection
-            warning_count = mongo.db.warnings.count_documents({
-                'student_id': ObjectId(student_id),
-                'exam_id': ObjectId(exam_id)
-            })
-            return warning_count
+            # One counter document per student and exam, found through its unique index
+            counter = mongo.db.warning_counters.find_one(
+                {'student_id': str(student_id), 'exam_id': str(exam_id)},
+                {'count': True, '_id': False}
+            )
+            return counter['count'] if counter else 0
         except Exception as e:
             print(f"Error getting warning count: {str(e)}")
-            return 0
\ No newline at end of file
+            return default
+
+    @staticmethod
+    def get_violation_timeline(student_id, exam_id, since=None, until=None):
+        """Get a student's proctoring violations in an exam, oldest first"""
+        from .utils.violation_timeline import BUCKET_SECONDS, expand_buckets
+        try:
+            query = {'student_id': str(student_id), 'exam_id': str(exam_id)}
+            if since or until:
+                # Buckets are keyed by their start, so widen the lower bound by one bucket
+                query['bucket'] = {}
+                if since:
+                    query['bucket']['$gt'] = since - timedelta(seconds=BUCKET_SECONDS)
+                if until:
+                    query['bucket']['$lte'] = until
+            events = expand_buckets(mongo.db.violation_timeline.find(query, {'applied': False}).sort('bucket', 1))
+            return [event for event in events
+                    if (not since or event['timestamp'] >= since) and (not until or event['timestamp'] <= until)]
+        except Exception as e:
+            print(f"Error getting violation timeline: {str(e)}")
+            return []
+
+    @staticmethod
+    def get_violation_summary(student_id, exam_id):
+        """Get counts by type and severity of a student's proctoring violations in an exam"""
+        from .utils.violation_timeline import SUMMARY_PROJECTION, summarise_buckets
+        try:
+            buckets = mongo.db.violation_timeline.find(
+                {'student_id': str(student_id), 'exam_id': str(exam_id)}, SUMMARY_PROJECTION
+            )
+            return summarise_buckets(buckets)
+        except Exception as e:
+            print(f"Error getting violation summary: {str(e)}")
+            return summarise_buckets([])
+
+    @staticmethod
+    def get_exam_violation_summaries(exam_id):
+        """Get violation summaries of every student in an exam, keyed by student id"""
+        from .utils.violation_timeline import SUMMARY_PROJECTION, summarise_buckets
+        try:
+            by_student = {}
+            for bucket in mongo.db.violation_timeline.find({'exam_id': str(exam_id)}, SUMMARY_PROJECTION):
+                by_student.setdefault(bucket['student_id'], []).append(bucket)
+            return {student_id: summarise_buckets(buckets) for student_id, buckets in by_student.items()}
+        except Exception as e:
+            print(f"Error getting exam violation summaries: {str(e)}")
+            return {}
+
+    @staticmethod
+    def increment_warning_count(student_id, exam_id, amount=1):
+        """Atomically add to a student's warning count for an exam; returns the new total or None on error"""
+        try:
+            counter = mongo.db.warning_counters.find_one_and_update(
+                {'student_id': str(student_id), 'exam_id': str(exam_id)},
+                {'$inc': {'count': amount}, '$set': {'updated_at': datetime.utcnow()}},
+                projection={'count': True, '_id': False},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return counter['count']
+        except Exception as e:
+            print(f"Error incrementing warning count: {str(e)}")
+            return None
+
+    @staticmethod
+    def reset_warning_count(student_id, exam_id):
+        """Set a student's warning count for an exam back to zero"""
+        try:
+            mongo.db.warning_counters.update_one(
+                {'student_id': str(student_id), 'exam_id': str(exam_id)},
+                {'$set': {'count': 0, 'updated_at': datetime.utcnow()}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"Error resetting warning count: {str(e)}")
+            return False
\ No newline at end of file
@@ -1,30 +1,59 @@
-from flask import Blueprint, Response, render_template, current_app, jsonify
+from flask import Blueprint, Response, render_template, current_app, jsonify, request, stream_with_context
+from flask_login import current_user
 import cv2
-from typing import Generator, Tuple, Dict, List, Any
+from typing import Generator, Tuple, Dict, List, Any, Optional
 import time
+import uuid
 import numpy as np
 import logging
-import base64
-import io
-from PIL import Image
+from concurrent.futures import TimeoutError as AnalysisTimeout
 
 from app.utils.pose_analysis import detect_neck_movement
 from app.utils.face_detection import detect_multiple_persons
-from app.utils.alerts import check_suspicious_activity, get_activity_summary
-from app.utils.frame_processing import process_frame, add_status_indicators
+from app.utils.alerts import check_suspicious_activity, extend_activity_timers, get_activity_summary, is_alert_building
+from app.utils.frame_processing import process_frame, add_status_indicators, annotate_frame
+from app.utils.stream_pipeline import FramePipeline, get_pipeline_stats
+from app.utils.camera_broadcast import subscribe, get_broadcast_stats
+from app.utils.detection_scheduler import DetectionScheduler
+from app.utils.frame_context import FrameContext
+from app.utils.proctor_session import proctor_sessions, session_key
+from app.utils.analysis_pool import PoolBusy, get_analysis_pool
+from app.utils.frame_codec import decode_base64_frame, decode_frame_buffer
+from app.utils.motion_gate import gate_stats
+from app.utils.jpeg_encoder import BitrateLimiter, JpegEncoder, multipart_parts
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 proctor_bp = Blueprint('proctor', __name__, url_prefix='/proctor')
 
-def gen_frames() -> Generator[bytes, None, None]:
-    """Generate camera frames with real-time processing."""
+def gen_frames(max_kbps: Optional[float] = None) -> Generator[bytes, None, None]:
+    """
+    Generate camera frames with real-time processing.
+    
+    Capture, analysis and JPEG encoding run as separate pipeline stages, so
+    the stream keeps the camera frame rate while detection runs as fast as
+    it can on the latest frame. Viewers of the same camera share a single
+    pipeline, which is released when the last viewer disconnects. With an
+    analysis pool configured, detection runs in a worker process and frames
+    arriving while the pool is saturated are shown with the last results.
+    
+    Frames are JPEG-encoded once per camera at the configured quality and
+    width, and each viewer is held to its own bandwidth cap by skipping
+    frames.
+    
+    Args:
+        max_kbps: Bandwidth cap requested by this viewer, in kbit/s; it can
+            only lower the configured STREAM_VIEWER_MAX_KBPS
+    """
     # Initialize with default values
     camera_index = 0
     frame_width = 640
     frame_height = 480
     fps = 24
+    thresholds = {}
+    encoder_config = {}
+    viewer_kbps = None
     
     # Try to get values from app config if available
     try:
@@ -32,58 +61,90 @@ def gen_frames() -> Generator[bytes, None, None]:
         frame_width = current_app.config.get('FRAME_WIDTH', 640)
         frame_height = current_app.config.get('FRAME_HEIGHT', 480)
         fps = current_app.config.get('FPS', 24)
+        thresholds = current_app.config.get('PROCTORING_THRESHOLDS', {})
+        encoder_config = current_app.config
+        viewer_kbps = current_app.config.get('STREAM_VIEWER_MAX_KBPS')
     except (RuntimeError, KeyError):
         # Use defaults if not in app context or keys missing
         pass
     
-    # Initialize the camera
-    camera = cv2.VideoCapture(camera_index)
-    camera.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
-    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
-    camera.set(cv2.CAP_PROP_FPS, fps)
-    
-    # For demo purposes, simulate warnings after a few frames
-    frame_count = 0
-    warning_sent = False
-    
-    try:
-        while True:
-            success, frame = camera.read()
-            if not success:
-                # If camera read fails, return a blank frame with error message
-                blank_frame = create_error_frame(frame_width, frame_height, "Camera not available")
-                ret, buffer = cv2.imencode('.jpg', blank_frame)
-                if ret:
-                    yield (b'--frame\r\n'
-                          b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-                time.sleep(1)  # Wait before trying again
-                continue
-            
-            # Process frame and check for suspicious activity
-            processed_frame, metadata = process_frame(frame)
-            frame_count += 1
-            
-            # Check for alerts less frequently to improve performance
-            face_detection_frequency = 5
-            if frame_count % face_detection_frequency == 0:
+    def create_pipeline(sink) -> FramePipeline:
+        # Only the first viewer of this camera opens the device
+        camera = cv2.VideoCapture(camera_index)
+        camera.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
+        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
+        camera.set(cv2.CAP_PROP_FPS, fps)
+        
+        stream_key = f"camera:{camera_index}"
+        scheduler = DetectionScheduler(
+            base_interval=thresholds.get('FACE_DETECTION_FREQUENCY', 5),
+            target_latency=thresholds.get('TARGET_FRAME_LATENCY', 0.1),
+            motion_threshold=thresholds.get('MOTION_THRESHOLD', 0.02)
+        )
+        previous = {}
+        session = proctor_sessions.get(stream_key)
+        encoder = JpegEncoder.from_config(encoder_config)
+        
+        def analyze(frame: np.ndarray) -> Dict[str, Any]:
+            nonlocal previous, session
+            start = time.perf_counter()
+            # Looked up per frame so the registry sees the stream as alive
+            session = proctor_sessions.get(stream_key)
+            context = FrameContext(frame)
+            detectors = scheduler.plan(context, alert_building=is_alert_building(session))
+            pool = get_analysis_pool()
+            if detectors and pool is not None:
                 try:
-                    check_suspicious_activity(frame, metadata)
-                except Exception as e:
-                    print(f"Error in suspicious activity check: {e}")
+                    pool.analyze(context, stream_key, detectors)
+                except (PoolBusy, AnalysisTimeout):
+                    # Backpressure: skip detection and carry the last results
+                    detectors = set()
+            # The overlay is drawn by the render stage, on the streamed copy
+            _, metadata = process_frame(frame, stream_key=stream_key, context=context,
+                                        detectors=detectors, previous=previous, session=session,
+                                        annotate=False)
             
-            # Use processed frame instead of original
-            frame = processed_frame
+            # Fresh detections update the suspicious activity timers; on
+            # skipped frames the running timers are carried forward
+            try:
+                if detectors:
+                    check_suspicious_activity(frame, metadata, context, session)
+                else:
+                    extend_activity_timers(metadata, session)
+            except Exception as e:
+                print(f"Error in suspicious activity check: {e}")
             
-            # Encode the frame for streaming
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
+            scheduler.record(time.perf_counter() - start)
+            previous = metadata
+            return metadata
+        
+        return FramePipeline(
+            camera,
+            analyze=analyze,
+            render=lambda frame, metadata: annotate_frame(frame, metadata, session),
+            on_read_error=lambda: create_error_frame(frame_width, frame_height, "Camera not available"),
+            encode=encoder,
+            sink=sink,
+            name=stream_key,
+            extra_stats=lambda: {'scheduler': scheduler.stats(), 'face_tracker': session.face_tracker.stats(),
+                                 'encoder': encoder.stats()}
+        )
+    
+    if max_kbps:
+        viewer_kbps = min(max_kbps, viewer_kbps) if viewer_kbps else max_kbps
+    limiter = BitrateLimiter(viewer_kbps)
+    
+    # Every viewer of the same camera shares one capture/analysis pipeline
+    stream = subscribe(camera_index, create_pipeline)
+    try:
+        for jpeg in stream:
+            if not limiter.allow(len(jpeg)):
                 continue
-                
-            # Yield the frame in the format expected by multipart HTTP response
-            yield (b'--frame\r\n'
-                  b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+            # Header, JPEG and trailer of the multipart part, without
+            # concatenating them into a copy of the frame
+            yield from multipart_parts(jpeg)
     finally:
-        camera.release()
+        stream.close()
 
 def create_error_frame(width: int, height: int, message: str) -> np.ndarray:
     """Create an error message frame when camera is not available."""
@@ -95,7 +156,9 @@ def create_error_frame(width: int, height: int, message: str) -> np.ndarray:
 @proctor_bp.route('/video_feed')
 def video_feed() -> Response:
     """Stream video feed with processed frames."""
-    return Response(gen_frames(),
+    # Keep the app context so gen_frames can read the proctoring config
+    max_kbps = request.args.get('max_kbps', type=float)
+    return Response(stream_with_context(gen_frames(max_kbps)),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @proctor_bp.route('/dashboard')
@@ -111,7 +174,8 @@ def verify_image():
     Expects a base64 encoded image in the request body.
     
     Returns:
-        JSON response with detection results
+        JSON response with detection results, or 429 if the analysis pool
+        is saturated
     """
     from flask import request
     
@@ -124,62 +188,169 @@ def verify_image():
                 'message': 'No image data provided'
             }), 400
         
-        # Decode base64 image
-        image_data = data['image_data']
-        if image_data.startswith('data:image'):
-            # Remove data URL prefix if present
-            image_data = image_data.split(',')[1]
-        
         # Convert to OpenCV format
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
-        frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Process frame
-        processed_frame, metadata = process_frame(frame)
+        frame = decode_base64_frame(data['image_data'])
         
-        # Extract face data for client-side visualization
-        face_data = {}
-        if 'multiple_people' in metadata:
-            _, face_count = metadata['multiple_people']
-            face_data['face_count'] = face_count
+        return _verify_frame(frame, _upload_stream_key(data))
         
-        if 'neck_movement' in metadata:
-            moved, ratio = metadata['neck_movement']
-            face_data['movement'] = {
-                'detected': moved,
-                'ratio': ratio
-            }
+    except Exception as e:
+        logger.error(f"Error processing image: {str(e)}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'Error processing image: {str(e)}',
+            'alerts': ["System error occurred"]
+        }), 500
+
+@proctor_bp.route('/verify_frame', methods=['POST'])
+def verify_frame():
+    """
+    Binary variant of verify_image.
+    
+    Accepts the encoded image (JPEG, PNG, ...) either as the raw request
+    body (Content-Type image/jpeg or application/octet-stream) or as the
+    `frame` field of a multipart form. Grayscale and downscaled frames are
+    accepted as sent. student_id, exam_id and stream_id are read from the
+    query string or the form fields.
+    
+    Returns:
+        The same JSON response as verify_image
+    """
+    from flask import request
+    
+    try:
+        upload = request.files.get('frame')
+        if upload is not None:
+            stream = upload.stream
+            # Spooled uploads expose their buffer, others are read once
+            buffer = stream.getbuffer() if hasattr(stream, 'getbuffer') else stream.read()
+            fields = request.form
+        else:
+            buffer = request.get_data(cache=False)
+            fields = request.args
         
-        # Extract warnings
-        warnings = metadata.get('warnings', [])
-        alerts = [w['message'] for w in warnings]
+        frame = decode_frame_buffer(buffer)
+        if frame is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'No decodable image provided'
+            }), 400
         
-        return jsonify({
-            'status': 'ok' if not alerts else 'warning',
-            'alerts': alerts,
-            'face_data': face_data,
-            'warning_count': len(alerts)
-        })
+        return _verify_frame(frame, _upload_stream_key(fields))
         
     except Exception as e:
-        logger.error(f"Error processing image: {str(e)}", exc_info=True)
+        logger.error(f"Error processing frame: {str(e)}", exc_info=True)
         return jsonify({
             'status': 'error',
-            'message': f'Error processing image: {str(e)}',
+            'message': f'Error processing frame: {str(e)}',
             'alerts': ["System error occurred"]
         }), 500
 
+def _upload_stream_key(fields) -> str:
+    """
+    Key of the proctoring session an uploaded frame belongs to.
+    
+    Frames are processed with the FaceMesh graph and proctoring state of
+    the student's exam: the one named in the request, or the logged-in
+    student's. Without an exam they belong to the given stream_id or else
+    to the client's browser session, never to its address, which every
+    student behind one NAT or proxy shares.
+    """
+    from flask import session
+    
+    if fields.get('student_id') and fields.get('exam_id'):
+        return session_key(fields['student_id'], fields['exam_id'])
+    if fields.get('exam_id') and current_user.is_authenticated:
+        return session_key(current_user.id, fields['exam_id'])
+    if fields.get('stream_id'):
+        return f"client:{fields['stream_id']}"
+    if 'proctor_stream_id' not in session:
+        session['proctor_stream_id'] = uuid.uuid4().hex
+    return f"client:{session['proctor_stream_id']}"
+
+def _verify_frame(frame: np.ndarray, stream_key: str):
+    """
+    Analyse an uploaded frame and build the verify_image JSON response.
+    
+    A frame that is unchanged since the session's last analysed upload
+    gets that upload's response again (with `reused` set) instead of
+    running the detectors. Uploads never start activity timers, so there
+    are none to carry forward.
+    """
+    context = FrameContext(frame)
+    session = proctor_sessions.get(stream_key)
+    gate = session.motion_gate
+    if not gate.should_analyze(context):
+        return jsonify(dict(gate.result, reused=True))
+    
+    # Run the detectors in a worker process if a pool is configured, so
+    # this worker stays free to serve other requests meanwhile
+    pool = get_analysis_pool()
+    if pool is not None:
+        try:
+            pool.analyze(context, stream_key)
+        except (PoolBusy, AnalysisTimeout):
+            response = jsonify({
+                'status': 'busy',
+                'message': 'Proctoring server is busy, retry shortly',
+                'alerts': []
+            })
+            response.headers['Retry-After'] = '1'
+            return response, 429
+    
+    # Only metadata goes back to the client, so nothing is drawn
+    _, metadata = process_frame(frame, stream_key=stream_key, context=context,
+                                session=session, annotate=False)
+    
+    # Extract face data for client-side visualization
+    face_data = {}
+    if 'multiple_people' in metadata:
+        _, face_count = metadata['multiple_people']
+        face_data['face_count'] = face_count
+    
+    if 'neck_movement' in metadata:
+        moved, ratio = metadata['neck_movement']
+        face_data['movement'] = {
+            'detected': moved,
+            'ratio': ratio
+        }
+    
+    # Extract warnings
+    warnings = metadata.get('warnings', [])
+    alerts = [w['message'] for w in warnings]
+    
+    result = {
+        'status': 'ok' if not alerts else 'warning',
+        'alerts': alerts,
+        'face_data': face_data,
+        'warning_count': len(alerts)
+    }
+    gate.store(result)
+    return jsonify(dict(result, reused=False))
+
 @proctor_bp.route('/camera_status')
 def camera_status() -> Dict:
     """Return camera status for health check."""
     return jsonify({"status": "active"})
 
+@proctor_bp.route('/pipeline_stats')
+def pipeline_stats() -> Dict:
+    """Return queue depths, drop counts and stage latency of active streams."""
+    pool = get_analysis_pool()
+    return jsonify({
+        'pipelines': get_pipeline_stats(),
+        'broadcasters': get_broadcast_stats(),
+        'analysis_pool': pool.stats() if pool is not None else None,
+        'motion_gate': gate_stats()
+    })
+
 @proctor_bp.route('/activity_summary')
 def activity_summary() -> Dict:
-    """Return a summary of suspicious activities."""
+    """Return a summary of suspicious activities for one proctoring session."""
+    from flask import request
+    
     try:
-        summary = get_activity_summary()
+        key = request.args.get('session') or f"camera:{current_app.config.get('CAMERA_SOURCE', 0)}"
+        summary = get_activity_summary(proctor_sessions.get(key))
         return jsonify(summary)
     except Exception as e:
         logger.error(f"Error getting activity summary: {str(e)}", exc_info=True)
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
 from flask_login import login_required, current_user
 from functools import wraps
 from datetime import datetime, timedelta
@@ -6,9 +6,6 @@ import random
 import logging
 import json
 import base64
-import cv2
-import numpy as np
-import mediapipe as mp
 import time
 from bson import ObjectId
 
@@ -18,6 +15,12 @@ from ..models.user import User
 from ..models.exam import Exam
 from ..models.question import Question
 from ..models.class_model import Class
+from ..utils.warning_counter import get_warning_counter
+from ..utils.procrastination import check_violations, clean_poll_response, record_reported_violation
+from ..utils.student_analysis import (
+    NECK_MOVEMENT_THRESHOLD, extract_face_features, detect_neck_movement,
+    detect_multiple_persons, detect_looking_away, detect_camera_blocked, analyze_frame
+)
 # Removed unused import
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
@@ -25,24 +28,6 @@ student_bp = Blueprint('student', __name__, url_prefix='/student')
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Global variables for MediaPipe
-mp_face_detection = mp.solutions.face_detection
-mp_face_mesh = mp.solutions.face_mesh
-mp_drawing = mp.solutions.drawing_utils
-
-# Initialize MediaPipe
-face_detection = mp_face_detection.FaceDetection(
-    model_selection=0, min_detection_confidence=0.5)
-face_mesh = mp_face_mesh.FaceMesh(
-    static_image_mode=False,
-    max_num_faces=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
-
-# Warning tracking
-warning_counts = {}
-
 # Enhanced tracking with better verification and cooldown
 activity_tracking = {
     'neck_movement': {
@@ -94,27 +79,22 @@ MOVEMENT_DURATION_THRESHOLD = 3.0  # 3 seconds of movement
 MULTIPLE_PEOPLE_DURATION_THRESHOLD = 2.0  # 2 seconds
 LOOKING_AWAY_DURATION_THRESHOLD = 3.0  # 3 seconds
 CAMERA_BLOCKED_DURATION_THRESHOLD = 2.0  # 2 seconds
-NECK_MOVEMENT_THRESHOLD = 0.08  # More sensitive
 
 def get_warning_count(student_id, exam_id):
     """Get the total warning count for a student in an exam"""
     try:
-        # Count warnings from the warnings collection
-        warning_count = MongoManager.get_warning_count(student_id, exam_id)
-        return warning_count
+        # Shared by every worker; recent reads are served from the local cache
+        return get_warning_counter().get(student_id, exam_id)
     except Exception as e:
         print(f"Error getting warning count: {e}")
         return 0
 
 def increment_warning_count(user_id, exam_id):
-    key = f"{user_id}_{exam_id}"
-    warning_counts[key] = warning_counts.get(key, 0) + 1
-    return warning_counts[key]
+    """Atomically add a warning and return the new total"""
+    return get_warning_counter().increment(user_id, exam_id)
 
 def reset_warning_count(user_id, exam_id):
-    key = f"{user_id}_{exam_id}"
-    warning_counts[key] = 0
-    return 0
+    return get_warning_counter().reset(user_id, exam_id)
 
 def csrf_exempt(f):
     f._csrf_exempt = True
@@ -129,332 +109,6 @@ def student_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Global variables for tracking
-last_landmarks = None
-previous_positions = []
-MAX_POSITION_HISTORY = 10
-
-# Eye Aspect Ratio (EAR) calculation for better detection
-def calculate_ear(eye_landmarks):
-    """Calculate Eye Aspect Ratio using 6 eye landmarks"""
-    # Vertical eye landmarks
-    A = np.linalg.norm(np.array([eye_landmarks[1].x, eye_landmarks[1].y]) - 
-                      np.array([eye_landmarks[5].x, eye_landmarks[5].y]))
-    B = np.linalg.norm(np.array([eye_landmarks[2].x, eye_landmarks[2].y]) - 
-                      np.array([eye_landmarks[4].x, eye_landmarks[4].y]))
-    # Horizontal eye landmark
-    C = np.linalg.norm(np.array([eye_landmarks[0].x, eye_landmarks[0].y]) - 
-                      np.array([eye_landmarks[3].x, eye_landmarks[3].y]))
-    
-    # EAR calculation
-    ear = (A + B) / (2.0 * C)
-    return ear
-
-def detect_neck_movement(frame, threshold=NECK_MOVEMENT_THRESHOLD):
-    """Enhanced neck movement detection using MediaPipe Face Mesh with EAR and head pose"""
-    global last_landmarks, previous_positions
-    
-    try:
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
-        
-        if not results.multi_face_landmarks:
-            return False, 0.0, "No face detected"
-        
-        landmarks = results.multi_face_landmarks[0].landmark
-        
-        # Key facial landmarks for comprehensive movement detection
-        nose_tip = landmarks[1]  # Nose tip
-        left_eye_outer = landmarks[33]  # Left eye outer corner
-        right_eye_outer = landmarks[263]  # Right eye outer corner
-        chin = landmarks[175]  # Chin
-        forehead = landmarks[10]  # Forehead center
-        
-        # Left eye landmarks for EAR calculation (6 points)
-        left_eye = [landmarks[i] for i in [33, 160, 158, 133, 153, 144]]
-        # Right eye landmarks for EAR calculation (6 points)  
-        right_eye = [landmarks[i] for i in [362, 385, 387, 263, 373, 380]]
-        
-        # Calculate EAR for both eyes
-        left_ear = calculate_ear(left_eye)
-        right_ear = calculate_ear(right_eye)
-        avg_ear = (left_ear + right_ear) / 2.0
-        
-        # Head pose estimation using key points
-        face_2d = []
-        face_3d = []
-        
-        # 3D model points for head pose
-        model_points = np.array([
-            (0.0, 0.0, 0.0),             # Nose tip
-            (0.0, -330.0, -65.0),        # Chin
-            (-225.0, 170.0, -135.0),     # Left eye left corner
-            (225.0, 170.0, -135.0),      # Right eye right corner
-            (-150.0, -150.0, -125.0),    # Left Mouth corner
-            (150.0, -150.0, -125.0)      # Right mouth corner
-        ])
-        
-        # 2D image points
-        img_h, img_w = frame.shape[:2]
-        face_2d.append([nose_tip.x * img_w, nose_tip.y * img_h])
-        face_2d.append([chin.x * img_w, chin.y * img_h])
-        face_2d.append([left_eye_outer.x * img_w, left_eye_outer.y * img_h])
-        face_2d.append([right_eye_outer.x * img_w, right_eye_outer.y * img_h])
-        face_2d.append([landmarks[61].x * img_w, landmarks[61].y * img_h])  # Left mouth
-        face_2d.append([landmarks[291].x * img_w, landmarks[291].y * img_h])  # Right mouth
-        
-        face_2d = np.array(face_2d, dtype=np.float64)
-        
-        # Camera parameters (estimated)
-        focal_length = 1 * img_w
-        cam_matrix = np.array([[focal_length, 0, img_h / 2],
-                              [0, focal_length, img_w / 2],
-                              [0, 0, 1]])
-        
-        dist_matrix = np.zeros((4, 1), dtype=np.float64)
-        
-        # Solve PnP
-        success, rot_vec, trans_vec = cv2.solvePnP(model_points, face_2d, cam_matrix, dist_matrix)
-        
-        # Get rotation matrix
-        rmat, jac = cv2.Rodrigues(rot_vec)
-        
-        # Get angles
-        angles, mtxR, mtxQ, Qx, Qy, Qz = cv2.RQDecomp3x3(rmat)
-        
-        # Get the y rotation degree
-        x_angle = angles[0] * 360
-        y_angle = angles[1] * 360
-        z_angle = angles[2] * 360
-        
-        # Calculate movement metrics
-        current_pos = {
-            'nose_x': nose_tip.x,
-            'nose_y': nose_tip.y,
-            'ear': avg_ear,
-            'x_angle': x_angle,
-            'y_angle': y_angle,
-            'z_angle': z_angle,
-            'timestamp': time.time()
-        }
-        
-        movement_ratio = 0.0
-        movement_type = "normal"
-        
-        if last_landmarks is not None:
-            # Calculate position change
-            nose_movement = calculate_distance(
-                (nose_tip.x, nose_tip.y), 
-                (last_landmarks['nose_x'], last_landmarks['nose_y'])
-            )
-            
-            # Calculate angle changes
-            angle_change_x = abs(x_angle - last_landmarks['x_angle'])
-            angle_change_y = abs(y_angle - last_landmarks['y_angle'])
-            angle_change_z = abs(z_angle - last_landmarks['z_angle'])
-            
-            # EAR change (indicates blinking/eye movement)
-            ear_change = abs(avg_ear - last_landmarks['ear'])
-            
-            # Combined movement score
-            movement_ratio = (nose_movement * 2.0 + 
-                            angle_change_x * 0.02 + 
-                            angle_change_y * 0.02 + 
-                            angle_change_z * 0.02 + 
-                            ear_change * 0.5)
-            
-            # Determine movement type based on dominant change
-            if angle_change_y > 15:  # Looking left/right
-                movement_type = "head_turn"
-            elif angle_change_x > 10:  # Looking up/down
-                movement_type = "head_tilt"
-            elif nose_movement > 0.03:
-                movement_type = "head_movement"
-            elif ear_change > 0.1:
-                movement_type = "eye_movement"
-        
-        # Store position history
-        previous_positions.append(current_pos)
-        if len(previous_positions) > MAX_POSITION_HISTORY:
-            previous_positions.pop(0)
-        
-        last_landmarks = current_pos
-        
-        # Enhanced movement detection
-        movement_detected = movement_ratio > threshold
-        
-        return movement_detected, movement_ratio, movement_type
-        
-    except Exception as e:
-        logger.error(f"Error in neck movement detection: {str(e)}")
-        return False, 0.0, "detection_error"
-
-def calculate_distance(point1, point2):
-    """Calculate Euclidean distance between two points"""
-    return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
-
-def detect_multiple_persons(frame):
-    """Enhanced multiple person detection with better face counting"""
-    try:
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_detection.process(rgb_frame)
-        
-        face_count = 0
-        confidence_scores = []
-        
-        if results.detections:
-            for detection in results.detections:
-                confidence = detection.score[0]
-                if confidence > 0.4:  # Lower threshold for better detection
-                    face_count += 1
-                    confidence_scores.append(confidence)
-        
-        avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0
-        
-        # Return multiple people detection AND if NO person is detected
-        multiple_people_detected = face_count > 1
-        no_person_detected = face_count == 0
-        
-        return multiple_people_detected, face_count, avg_confidence, no_person_detected
-        
-    except Exception as e:
-        logger.error(f"Error in multiple person detection: {str(e)}")
-        return False, 0, 0.0, False
-
-def detect_looking_away(frame):
-    """Enhanced looking away detection using iris tracking and gaze estimation"""
-    try:
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
-        
-        if not results.multi_face_landmarks:
-            return False, 0.0, "no_face"
-        
-        landmarks = results.multi_face_landmarks[0].landmark
-        img_h, img_w = frame.shape[:2]
-        
-        # Left eye landmarks
-        left_eye_landmarks = [landmarks[i] for i in [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]]
-        # Right eye landmarks  
-        right_eye_landmarks = [landmarks[i] for i in [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]]
-        
-        # Calculate eye centers
-        left_eye_center_x = sum([lm.x for lm in left_eye_landmarks]) / len(left_eye_landmarks)
-        left_eye_center_y = sum([lm.y for lm in left_eye_landmarks]) / len(left_eye_landmarks)
-        
-        right_eye_center_x = sum([lm.x for lm in right_eye_landmarks]) / len(right_eye_landmarks)
-        right_eye_center_y = sum([lm.y for lm in right_eye_landmarks]) / len(right_eye_landmarks)
-        
-        # Use specific landmarks for pupil/iris estimation
-        left_pupil_x = landmarks[159].x  # Left eye center landmark
-        left_pupil_y = landmarks[159].y
-        right_pupil_x = landmarks[386].x  # Right eye center landmark  
-        right_pupil_y = landmarks[386].y
-        
-        # Calculate gaze direction (pupil position relative to eye center)
-        left_gaze_x = left_pupil_x - left_eye_center_x
-        left_gaze_y = left_pupil_y - left_eye_center_y
-        
-        right_gaze_x = right_pupil_x - right_eye_center_x
-        right_gaze_y = right_pupil_y - right_eye_center_y
-        
-        # Average gaze direction
-        avg_gaze_x = (left_gaze_x + right_gaze_x) / 2
-        avg_gaze_y = (left_gaze_y + right_gaze_y) / 2
-        
-        # Calculate gaze intensity (distance from center)
-        gaze_intensity = np.sqrt(avg_gaze_x**2 + avg_gaze_y**2)
-        
-        # Determine gaze direction
-        direction = "center"
-        if abs(avg_gaze_x) > abs(avg_gaze_y):
-            if avg_gaze_x > 0.015:  # Looking right
-                direction = "right"
-            elif avg_gaze_x < -0.015:  # Looking left
-                direction = "left"
-        else:
-            if avg_gaze_y > 0.01:  # Looking down
-                direction = "down"
-            elif avg_gaze_y < -0.01:  # Looking up
-                direction = "up"
-        
-        # Enhanced head pose for additional validation
-        nose_tip = landmarks[1]
-        left_eye_outer = landmarks[33]
-        right_eye_outer = landmarks[263]
-        
-        # Face asymmetry (indicates head turn)
-        face_asymmetry = abs((nose_tip.x - left_eye_outer.x) - (right_eye_outer.x - nose_tip.x))
-        
-        # Combined looking away score
-        looking_away_score = gaze_intensity + face_asymmetry * 0.5
-        
-        # Threshold for looking away (more sensitive)
-        looking_away_threshold = 0.025
-        looking_away = looking_away_score > looking_away_threshold and direction != "center"
-        
-        return looking_away, looking_away_score, direction
-        
-    except Exception as e:
-        logger.error(f"Error in looking away detection: {str(e)}")
-        return False, 0.0, "detection_error"
-
-def detect_camera_blocked(frame):
-    """Enhanced camera blocking detection with multiple metrics"""
-    try:
-        # Convert to different color spaces for analysis
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
-        # Multiple brightness metrics
-        mean_brightness = np.mean(gray)
-        std_brightness = np.std(gray)
-        min_brightness = np.min(gray)
-        max_brightness = np.max(gray)
-        
-        # HSV analysis
-        mean_saturation = np.mean(hsv[:,:,1])
-        mean_value = np.mean(hsv[:,:,2])
-        
-        # Edge detection for texture analysis
-        edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges > 0) / (frame.shape[0] * frame.shape[1])
-        
-        # Multiple blocking conditions (more sensitive)
-        conditions = {
-            'very_dark': mean_brightness < 25,
-            'uniform_dark': std_brightness < 10 and mean_brightness < 30,
-            'completely_black': max_brightness < 20,
-            'very_bright': mean_brightness > 230,
-            'uniform_bright': std_brightness < 15 and mean_brightness > 220,
-            'low_saturation': mean_saturation < 20,
-            'no_texture': edge_density < 0.01,
-            'extreme_values': mean_value < 30 or mean_value > 240
-        }
-        
-        # Count active conditions
-        active_conditions = sum(conditions.values())
-        
-        # Camera is blocked if multiple conditions are met
-        is_blocked = active_conditions >= 2
-        
-        # Determine blocking type
-        blocking_type = "none"
-        if conditions['completely_black'] or conditions['very_dark']:
-            blocking_type = "dark_blocking"
-        elif conditions['very_bright'] or conditions['uniform_bright']:
-            blocking_type = "bright_blocking"
-        elif conditions['no_texture']:
-            blocking_type = "covered"
-        elif conditions['low_saturation']:
-            blocking_type = "partial_block"
-        
-        return is_blocked, mean_brightness, blocking_type
-        
-    except Exception as e:
-        logger.error(f"Error in camera blocking detection: {str(e)}")
-        return False, 0.0, "detection_error"
-
 def track_activity_with_verification(activity_type, is_detected, current_time, threshold, additional_info=""):
     """Enhanced activity tracking with verification and STRICT cooldown"""
     tracking = activity_tracking[activity_type]
@@ -1375,183 +1029,13 @@ def procrastination_check(exam_id):
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
         user_id = current_user.id
-        current_time = time.time()
-        
-        # Get current warning count
-        current_warnings = get_warning_count(user_id, exam_id)
-        
-        # Log incoming violation data for debugging
-        total_violations_reported = data.get('totalViolations', 0)
-        logger.info(f"🚨 Procrastination Check - User: {user_id}, Exam: {exam_id}")
-        logger.info(f"📊 Current warnings: {current_warnings}/20")
-        logger.info(f"📊 Total violations reported: {total_violations_reported}")
-        logger.info(f"📊 Face data: {data.get('faceData', {})}")
-        logger.info(f"📊 Browser data: {data.get('browserData', {})}")
-        logger.info(f"📊 Input data: {data.get('inputData', {})}")
-        
-        # Initialize violation flags
-        violations = []
-        should_increment_warning = False
-        auto_submit = False
-        
-        # 1. FACE DETECTION VIOLATIONS
-        face_data = data.get('faceData', {})
-        num_faces = face_data.get('numFaces', 0)
-        pose_direction = face_data.get('poseDirection', 'unknown')
-        camera_blocked = face_data.get('cameraBlocked', False)
-        
-        logger.info(f"🔍 Face Detection Check: faces={num_faces}, pose={pose_direction}, blocked={camera_blocked}")
-        
-        # No face detected
-        if num_faces == 0 or camera_blocked:
-            violations.append({
-                'type': 'CAMERA_ISSUE',
-                'message': 'No face detected or camera blocked',
-                'severity': 'HIGH',
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-            logger.info("⚠️ VIOLATION: No face detected - incrementing warning")
-        
-        # Multiple faces detected
-        elif num_faces > 1:
-            violations.append({
-                'type': 'MULTIPLE_FACES',
-                'message': f'{num_faces} faces detected - only one person allowed',
-                'severity': 'HIGH',
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-            logger.info(f"⚠️ VIOLATION: {num_faces} faces detected - incrementing warning")
-        
-        # Looking away detection (only left/right) - MOST COMMON VIOLATION
-        elif pose_direction in ['left', 'right']:
-            violations.append({
-                'type': 'LOOKING_AWAY',
-                'message': f'Looking {pose_direction} - please focus on exam',
-                'severity': 'HIGH',  # Changed to HIGH for better counting
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-            logger.info(f"⚠️ VIOLATION: Looking {pose_direction} - incrementing warning")
-        
-        # 2. BROWSER ACTIVITY VIOLATIONS
-        browser_data = data.get('browserData', {})
-        
-        # Tab switching detection
-        if browser_data.get('tabSwitched', False):
-            violations.append({
-                'type': 'TAB_SWITCH',
-                'message': 'Tab switching detected',
-                'severity': 'HIGH',
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-        
-        # Window focus lost
-        if browser_data.get('windowFocusLost', False):
-            violations.append({
-                'type': 'WINDOW_FOCUS',
-                'message': 'Window focus lost',
-                'severity': 'MEDIUM',
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-        
-        # 3. INPUT ACTIVITY VIOLATIONS
-        input_data = data.get('inputData', {})
-        
-        # Copy/paste detection
-        if input_data.get('copyAttempt', False):
-            violations.append({
-                'type': 'COPY_ATTEMPT',
-                'message': 'Copy operation blocked',
-                'severity': 'HIGH',
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-        
-        if input_data.get('pasteAttempt', False):
-            violations.append({
-                'type': 'PASTE_ATTEMPT',
-                'message': 'Paste operation blocked',
-                'severity': 'HIGH',
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-        
-        # Text selection blocking
-        if input_data.get('textSelectionAttempt', False):
-            violations.append({
-                'type': 'TEXT_SELECTION',
-                'message': 'Text selection blocked',
-                'severity': 'MEDIUM',
-                'timestamp': current_time
-            })
-            should_increment_warning = True  # NOW COUNT text selection as violation
-        
-        # Suspicious key combinations
-        if input_data.get('suspiciousKeys', False):
-            violations.append({
-                'type': 'SUSPICIOUS_KEYS',
-                'message': 'Suspicious key combination detected',
-                'severity': 'MEDIUM',
-                'timestamp': current_time
-            })
-            should_increment_warning = True
-        
-        # 4. WARNING MANAGEMENT
-        new_warning_count = current_warnings
-        if should_increment_warning:
-            logger.info(f"🚨 INCREMENTING WARNING: Current={current_warnings}, Violations={len(violations)}")
-            new_warning_count = increment_warning_count(user_id, exam_id)
-            logger.info(f"🚨 NEW WARNING COUNT: {new_warning_count}/20")
-        
-        # 5. AUTO-SUBMIT CHECK (20 warnings threshold)
-        if new_warning_count >= 20:
-            auto_submit = True
-            violations.append({
-                'type': 'AUTO_SUBMIT',
-                'message': f'Maximum warnings reached ({new_warning_count}/20) - Auto-submitting exam',
-                'severity': 'CRITICAL',
-                'timestamp': current_time
-            })
-        
-        # 6. STORE VIOLATIONS IN DATABASE
-        if violations:
-            from app.mongodb import mongo
-            violation_record = {
-                'user_id': user_id,
-                'exam_id': exam_id,
-                'violations': violations,
-                'warning_count': new_warning_count,
-                'timestamp': datetime.utcnow(),
-                'auto_submit_triggered': auto_submit
-            }
-            mongo.db.procrastination_violations.insert_one(violation_record)
-        
-        # 7. PREPARE RESPONSE
-        response_data = {
-            'success': True,
-            'violations': violations,
-            'warningCount': new_warning_count,
-            'maxWarnings': 20,
-            'autoSubmit': auto_submit,
-            'message': f'Violations detected: {len(violations)}' if violations else 'No violations detected'
-        }
-        
-        logger.info(f"📤 RESPONSE DATA: {response_data}")
-        logger.info(f"📊 Final Warning Count: {new_warning_count}/20")
-        
-        # Add specific messages for different violation types
-        if auto_submit:
-            response_data['autoSubmitMessage'] = 'Maximum violations reached. Exam will be auto-submitted.'
-        elif violations:
-            high_severity_violations = [v for v in violations if v['severity'] == 'HIGH']
-            if high_severity_violations:
-                response_data['alertMessage'] = f"Warning {new_warning_count}/20: {high_severity_violations[0]['message']}"
-        
-        return jsonify(response_data)
+
+        # Clean polls get a prebuilt response: no database, logging or storage
+        body = clean_poll_response(user_id, exam_id, data)
+        if body is not None:
+            return current_app.response_class(body, mimetype='application/json')
+
+        return jsonify(check_violations(user_id, exam_id, data))
 
     except Exception as e:
         logger.error(f"Error in procrastination check: {str(e)}")
@@ -1684,13 +1168,11 @@ def report_violation(exam_id):
     """Handle violation reports from the advanced proctoring system"""
     try:
         data = request.get_json()
-        violation_type = data.get('violation_type')
-        message = data.get('message')
-        timestamp = data.get('timestamp')
-        warning_count = data.get('warning_count', 0)
+        entry = record_reported_violation(current_user.id, exam_id, data)
+        warning_count = entry['warning_count']
         
         # Log the violation
-        logger.info(f"Violation reported for exam {exam_id}, user {current_user.id}: {violation_type} - {message}")
+        logger.info(f"Violation reported for exam {exam_id}, user {current_user.id}: {entry['type']} - {entry['message']}")
         
         # Update warning count in session/database
         warning_key = f'warnings_{current_user.id}_{exam_id}'
@@ -1705,12 +1187,7 @@ def report_violation(exam_id):
         if violation_history_key not in session:
             session[violation_history_key] = []
         
-        session[violation_history_key].append({
-            'type': violation_type,
-            'message': message,
-            'timestamp': timestamp,
-            'warning_count': warning_count
-        })
+        session[violation_history_key].append(entry)
         session.modified = True
         
         return jsonify({
@@ -1317,11 +1317,17 @@ def view_submission(submission_id):
         print(f"  First answer example: {processed_answers[0]}")
     print(f"🔥🔥🔥 END TEMPLATE RENDER DEBUG 🔥🔥🔥")
     
+    # Proctoring violations of this student in this exam
+    violation_summary = MongoManager.get_violation_summary(submission.student_id, submission.exam_id)
+    violation_timeline = MongoManager.get_violation_timeline(submission.student_id, submission.exam_id)
+    
     return render_template('teacher/submission_details.html',
                          submission=submission,
                          exam=exam,
                          student=student,
-                         processed_answers=processed_answers)
+                         processed_answers=processed_answers,
+                         violation_summary=violation_summary,
+                         violation_timeline=violation_timeline)
 
 @teacher_bp.route('/submission/<submission_id>/grade', methods=['POST'])
 @login_required
@@ -1979,6 +1985,9 @@ def export_excel(exam_id):
         all_students = MongoManager.get_all_students()
         print(f"Found {len(all_students)} total students")
         
+        # Proctoring violation counts of every student, read from the timeline counters
+        violation_summaries = MongoManager.get_exam_violation_summaries(exam_id)
+        
         # Create workbook
         wb = openpyxl.Workbook()
         wb.remove(wb.active)
@@ -2007,7 +2016,7 @@ def export_excel(exam_id):
         # Headers - comprehensive student data
         headers = ["#", "Student Name", "Email", "Student ID", "Phone", "College", 
                   "Submitted At", "Score", "Status", "Graded By", "Graded At", 
-                  "Pass/Fail", "Time Taken", "Violations", "Auto-Submit"]
+                  "Pass/Fail", "Time Taken", "Violations", "Auto-Submit", "Violation Types"]
         ws.append(headers)
         
         # Style headers
@@ -2111,6 +2120,11 @@ def export_excel(exam_id):
                     violations = 0
                     auto_submit = "No"
                 
+                # Violations by type, most frequent first
+                by_type = violation_summaries.get(student_id, {}).get('by_type', {})
+                violation_types = ", ".join(f"{name}: {count}" for name, count in
+                                            sorted(by_type.items(), key=lambda item: -item[1])) or "None"
+                
                 # Prepare row data
                 row_data = [
                     student_count,
@@ -2127,7 +2141,8 @@ def export_excel(exam_id):
                     pass_fail,
                     time_taken,
                     violations,
-                    auto_submit
+                    auto_submit,
+                    violation_types
                 ]
                 
                 ws.append(row_data)
@@ -2160,6 +2175,30 @@ def export_excel(exam_id):
                 print(f"Error processing student {getattr(student, 'username', 'Unknown')}: {str(e)}")
                 continue
         
+        # ===== Violation Timeline Sheet =====
+        ws_violations = wb.create_sheet("Violation Timeline")
+        violation_headers = ["Student Name", "Student ID", "Time (UTC)", "Type", "Severity", "Message", "Warning Count"]
+        ws_violations.append(violation_headers)
+        for col_num in range(1, len(violation_headers) + 1):
+            cell = ws_violations.cell(row=1, column=col_num)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.border = border
+        
+        for student in all_students:
+            if not violation_summaries.get(str(student.id), {}).get('total'):
+                continue
+            for event in MongoManager.get_violation_timeline(student.id, exam_id):
+                ws_violations.append([
+                    getattr(student, 'username', 'Unknown'),
+                    getattr(student, 'student_id', 'N/A'),
+                    event['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+                    event['type'],
+                    event['severity'],
+                    event['message'],
+                    event['warning_count']
+                ])
+        
         # ===== Summary Sheet =====
         ws_summary = wb.create_sheet("Summary")
         
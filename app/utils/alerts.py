@@ -1,87 +1,129 @@
 from flask_socketio import SocketIO, emit
 import time
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Optional
 import numpy as np
 
 # Import pose_analysis and face_detection here to avoid circular imports
 from app.utils.pose_analysis import detect_neck_movement
 from app.utils.face_detection import detect_multiple_persons
-
-# Store timestamps of suspicious activities
-activity_log = {
-    'neck_movement': [],
-    'multiple_people': [],
-    'absence': []
-}
-
-# Store continuous activity tracking
-continuous_tracking = {
-    'neck_movement': {
-        'start_time': None,
-        'duration': 0,
-        'is_active': False
-    },
-    'multiple_people': {
-        'start_time': None,
-        'duration': 0,
-        'is_active': False
-    },
-    'absence': {
-        'start_time': None,
-        'duration': 0,
-        'is_active': False
-    }
-}
+from app.utils.frame_context import FrameContext, ensure_context
+from app.utils.proctor_session import ProctorSession, get_session
 
 # Movement thresholds
 MOVEMENT_DURATION_THRESHOLD = 2.0  # Seconds of continuous movement to trigger alert
 MULTIPLE_PEOPLE_DURATION_THRESHOLD = 2.0  # Seconds of multiple people to trigger alert
 ABSENCE_DURATION_THRESHOLD = 5.0  # Seconds of absence to trigger alert
 
-# Store last frame processed time for absence detection
-last_detection_time = time.time()
+ACTIVITY_THRESHOLDS = {
+    'neck_movement': MOVEMENT_DURATION_THRESHOLD,
+    'multiple_people': MULTIPLE_PEOPLE_DURATION_THRESHOLD,
+    'absence': ABSENCE_DURATION_THRESHOLD
+}
 
 def check_suspicious_activity(frame: np.ndarray, 
-                             metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+                             metadata: Dict[str, Any] = None,
+                             context: Optional[FrameContext] = None,
+                             session: Optional[ProctorSession] = None) -> Dict[str, Any]:
     """
     Check for suspicious activities in the frame and emit alerts.
     
     Args:
         frame: Input camera frame
         metadata: Dictionary of pre-computed metadata (optional)
+        context: Shared per-frame analysis context, used for anything
+            missing from metadata (optional)
+        session: Proctoring state of the stream (defaults to the shared
+            default session)
         
     Returns:
         Dictionary of detected warnings
     """
-    global last_detection_time
-    warnings = []
+    session = get_session(session)
+    with session.lock:
+        return _check_session_activity(frame, metadata, context, session)
+
+def _check_session_activity(frame: np.ndarray,
+                            metadata: Optional[Dict[str, Any]],
+                            context: Optional[FrameContext],
+                            session: ProctorSession) -> Dict[str, Any]:
+    """Body of check_suspicious_activity, run under the session lock."""
     current_time = time.time()
     
     # Use pre-computed data if available, otherwise compute
+    context = ensure_context(frame, context)
+    
     if metadata and 'neck_movement' in metadata:
         neck_moved, movement_ratio = metadata['neck_movement']
     else:
-        neck_moved, movement_ratio = detect_neck_movement(frame)
+        neck_moved, movement_ratio = detect_neck_movement(frame, context=context, session=session)
         
     if metadata and 'multiple_people' in metadata:
         multiple_people, face_count = metadata['multiple_people']
     else:
-        multiple_people, face_count = detect_multiple_persons(frame)
+        multiple_people, face_count = detect_multiple_persons(frame, context, session.face_tracker)
     
     # Track neck movement duration
-    track_continuous_activity('neck_movement', neck_moved, current_time, MOVEMENT_DURATION_THRESHOLD)
+    track_continuous_activity('neck_movement', neck_moved, current_time, MOVEMENT_DURATION_THRESHOLD, session)
     
     # Track multiple people duration
-    track_continuous_activity('multiple_people', multiple_people, current_time, MULTIPLE_PEOPLE_DURATION_THRESHOLD)
+    track_continuous_activity('multiple_people', multiple_people, current_time, MULTIPLE_PEOPLE_DURATION_THRESHOLD, session)
     
     # Check for absence (no faces)
     if face_count == 0:
-        track_continuous_activity('absence', True, current_time, ABSENCE_DURATION_THRESHOLD)
+        track_continuous_activity('absence', True, current_time, ABSENCE_DURATION_THRESHOLD, session)
     else:
-        track_continuous_activity('absence', False, current_time, ABSENCE_DURATION_THRESHOLD)
-        last_detection_time = current_time
+        track_continuous_activity('absence', False, current_time, ABSENCE_DURATION_THRESHOLD, session)
+        session.last_detection_time = current_time
+    
+    warnings = _collect_warnings(session, current_time, movement_ratio, face_count)
+    
+    # If any warnings, emit through socketio
+    if warnings:
+        emit_warning(warnings, session.key)
+    
+    return {"warnings": warnings}
+
+def extend_activity_timers(metadata: Optional[Dict[str, Any]] = None,
+                           session: Optional[ProctorSession] = None) -> Dict[str, Any]:
+    """
+    Advance the activity timers on a frame whose analysis was skipped.
+    
+    A skipped frame is unchanged from the last analysed one, so every
+    activity being timed then is still going on: its timer keeps running
+    and can cross its alert threshold without the detectors running again.
+    
+    Args:
+        metadata: Metadata of the last analysed frame, used for the warning details
+        session: Proctoring state of the stream (defaults to the shared default session)
+        
+    Returns:
+        Dictionary of detected warnings
+    """
+    session = get_session(session)
+    metadata = metadata or {}
+    _, movement_ratio = metadata.get('neck_movement', (False, 0.0))
+    _, face_count = metadata.get('multiple_people', (False, 0))
+    
+    with session.lock:
+        current_time = time.time()
+        for activity, tracking in session.continuous_tracking.items():
+            if tracking['start_time'] is not None:
+                track_continuous_activity(activity, True, current_time,
+                                          ACTIVITY_THRESHOLDS[activity], session)
+        warnings = _collect_warnings(session, current_time, movement_ratio, face_count)
+    
+    if warnings:
+        emit_warning(warnings, session.key)
+    
+    return {"warnings": warnings}
+
+def _collect_warnings(session: ProctorSession, current_time: float,
+                      movement_ratio: float, face_count: int) -> List[Dict[str, Any]]:
+    """Warnings for every activity past its threshold, logged in the activity log."""
+    continuous_tracking = session.continuous_tracking
+    activity_log = session.activity_log
+    warnings = []
     
-    # Generate warnings based on continuous activity tracking
     if continuous_tracking['neck_movement']['is_active']:
         warnings.append({
             "type": "neck_movement", 
@@ -111,13 +153,10 @@ def check_suspicious_activity(frame: np.ndarray,
         })
         activity_log['absence'].append(current_time)
     
-    # If any warnings, emit through socketio
-    if warnings:
-        emit_warning(warnings)
-    
-    return {"warnings": warnings}
+    return warnings
 
-def track_continuous_activity(activity_type: str, is_detected: bool, current_time: float, threshold: float) -> None:
+def track_continuous_activity(activity_type: str, is_detected: bool, current_time: float, threshold: float,
+                              session: Optional[ProctorSession] = None) -> None:
     """
     Track continuous activity over time and set flags when thresholds are exceeded.
     
@@ -126,8 +165,9 @@ def track_continuous_activity(activity_type: str, is_detected: bool, current_tim
         is_detected: Whether the activity is currently detected
         current_time: Current timestamp
         threshold: Duration threshold to trigger alert
+        session: Proctoring state of the stream (defaults to the shared default session)
     """
-    tracking = continuous_tracking[activity_type]
+    tracking = get_session(session).continuous_tracking[activity_type]
     
     if is_detected:
         # Activity is currently happening
@@ -154,27 +194,51 @@ def track_continuous_activity(activity_type: str, is_detected: bool, current_tim
         tracking['duration'] = 0
         tracking['is_active'] = False
 
-def emit_warning(warnings: List[Dict[str, Any]]) -> None:
+def emit_warning(warnings: List[Dict[str, Any]], session_key: Any = None) -> None:
     """
     Emit warnings through socketio.
     
     Args:
         warnings: List of warning dictionaries
+        session_key: Key of the proctoring session that raised them (optional)
     """
     try:
         # Import socketio here to avoid circular imports
         from app import socketio
-        socketio.emit('proctor_alert', {'warnings': warnings})
+        payload = {'warnings': warnings}
+        if session_key is not None:
+            payload['session'] = str(session_key)
+        socketio.emit('proctor_alert', payload)
     except Exception as e:
         print(f"Error emitting alert: {e}")
 
-def get_activity_summary() -> Dict[str, Any]:
+def is_alert_building(session: Optional[ProctorSession] = None) -> bool:
+    """
+    Check whether any suspicious activity is currently being timed.
+    
+    Args:
+        session: Proctoring state of the stream (defaults to the shared default session)
+        
+    Returns:
+        True if an activity has started, whether or not it has reached its threshold
+    """
+    return get_session(session).is_alert_building()
+
+def get_activity_summary(session: Optional[ProctorSession] = None) -> Dict[str, Any]:
     """
     Get a summary of suspicious activities.
     
+    Args:
+        session: Proctoring state of the stream (defaults to the shared default session)
+        
     Returns:
         Dictionary with activity summary
     """
+    session = get_session(session)
+    with session.lock:
+        activity_log = {name: list(log) for name, log in session.activity_log.items()}
+        active = {name: tracking['is_active'] for name, tracking in session.continuous_tracking.items()}
+    
     current_time = time.time()
     # Only include events from the last 10 minutes
     time_window = current_time - (10 * 60)
@@ -190,9 +254,9 @@ def get_activity_summary() -> Dict[str, Any]:
         "absence_count": len(recent_absences),
         "total_violations": len(recent_neck_movements) + len(recent_multiple_people) + len(recent_absences),
         "active_warnings": {
-            "neck_movement": continuous_tracking['neck_movement']['is_active'],
-            "multiple_people": continuous_tracking['multiple_people']['is_active'],
-            "absence": continuous_tracking['absence']['is_active']
+            "neck_movement": active['neck_movement'],
+            "multiple_people": active['multiple_people'],
+            "absence": active['absence']
         }
     }
     
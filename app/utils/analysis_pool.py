@@ -0,0 +1,266 @@
+import multiprocessing
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+import numpy as np
+
+from app.utils.cascade_settings import get_detection_settings, set_detection_settings
+from app.utils.detection_scheduler import ALL_DETECTORS, FACE_DETECTOR, NECK_DETECTOR
+from app.utils.frame_context import FrameContext
+
+
+class PoolBusy(Exception):
+    """Raised when the analysis pool has no free slot for another frame."""
+
+
+def _in_green_thread() -> bool:
+    """True inside an eventlet green thread, where a blocking wait stalls the whole hub."""
+    if 'eventlet' not in sys.modules:
+        return False
+    import greenlet
+    # Green threads run under the hub's greenlet; an OS thread's main greenlet has no parent
+    return greenlet.getcurrent().parent is not None
+
+
+def wait_result(future: Future, timeout: Optional[float] = None) -> Any:
+    """
+    Wait for a worker's result without blocking the server.
+
+    Flask-SocketIO serves requests from eventlet green threads, and the app
+    does not monkey-patch the standard library: Future.result() there would
+    block the hub, and with it every other client, until the frame is done.
+    In a green thread the wait runs in eventlet's OS thread pool instead
+    (tpool, EVENTLET_THREADPOOL_SIZE threads), so only this request waits.
+    Plain threads, like the camera pipeline's, wait on the future directly.
+
+    Raises:
+        concurrent.futures.TimeoutError: If no result arrives within timeout
+    """
+    if _in_green_thread():
+        from eventlet import tpool
+        return tpool.execute(future.result, timeout)
+    return future.result(timeout=timeout)
+
+
+# Face trackers of the streams a worker has analysed, least recently used
+# dropped first. A worker handles one frame at a time, so no lock is needed.
+WORKER_FACE_TRACKERS = 64
+_worker_trackers: 'OrderedDict[Hashable, Any]' = OrderedDict()
+# Full face scan interval of the worker's trackers, None for the tracker default
+_worker_track_refresh: Optional[int] = None
+
+
+def _init_worker(settings: Any, face_track_refresh: Optional[int]) -> None:
+    """Worker initializer: take over the parent's detection settings."""
+    global _worker_track_refresh
+    set_detection_settings(settings)
+    _worker_track_refresh = face_track_refresh
+
+
+def _worker_tracker(stream_key: Hashable):
+    from app.utils.face_tracker import FaceTracker
+
+    tracker = _worker_trackers.get(stream_key)
+    if tracker is None:
+        if len(_worker_trackers) >= WORKER_FACE_TRACKERS:
+            _worker_trackers.popitem(last=False)
+        tracker = _worker_trackers[stream_key] = (
+            FaceTracker() if _worker_track_refresh is None else FaceTracker(_worker_track_refresh))
+    else:
+        _worker_trackers.move_to_end(stream_key)
+    return tracker
+
+
+def _analyze_frame(frame: np.ndarray, stream_key: Hashable,
+                   detectors: Iterable[str]) -> Dict[str, Any]:
+    """
+    Worker entry point: the stateless, CPU-bound part of frame analysis.
+
+    Runs the Haar cascade and FaceMesh landmark extraction. Activity timers
+    and head-position history stay in the web process, which applies these
+    results to the session.
+
+    Args:
+        frame: Input BGR camera frame
+        stream_key: Identifier of the stream, selects the worker's FaceMesh and face tracker
+        detectors: Detectors to run
+
+    Returns:
+        Detector results keyed by their FrameContext cache name
+    """
+    # Imported here so the parent does not need these modules to submit work
+    from app.utils.face_detection import detect_faces
+    from app.utils.pose_analysis import extract_head_position
+
+    context = FrameContext(frame)
+    results = {}
+    if FACE_DETECTOR in detectors:
+        results['faces'] = detect_faces(frame, context, _worker_tracker(stream_key))
+    if NECK_DETECTOR in detectors:
+        results['head_position'] = extract_head_position(frame, stream_key, context)
+    return results
+
+
+class AnalysisPool:
+    """
+    Process pool for frame analysis with a bounded number of frames in flight.
+
+    OpenCV and MediaPipe work is moved out of the web worker, so a request
+    waiting for its frame only waits on a future and other requests and
+    sockets keep being served, also from eventlet green threads (see
+    wait_result). When `max_pending` frames are already queued
+    or running, submit() raises PoolBusy instead of queueing more; routes
+    answer 429 and camera streams skip the frame.
+
+    Each worker is its own single-process executor. Work submitted for a
+    stream always goes to the same worker, so the face tracker and FaceMesh
+    graph a worker keeps for the stream see every one of its frames, in
+    order. Work without a stream goes to the worker with the fewest jobs.
+
+    Args:
+        workers: Worker processes (defaults to the CPU count)
+        max_pending: Frames allowed in flight (defaults to twice the workers)
+        timeout: Default seconds to wait for a result
+        face_track_refresh: Full face scan interval of the workers' face
+            trackers (defaults to the tracker's)
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None,
+                 timeout: float = 5.0,
+                 face_track_refresh: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.timeout = timeout
+        # Spawned workers start clean instead of inheriting the parent's
+        # threads, locks and MediaPipe graphs; they get the parent's
+        # cascade settings
+        context = multiprocessing.get_context('spawn')
+        self.executors = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                initializer=_init_worker,
+                                initargs=(get_detection_settings(), face_track_refresh))
+            for _ in range(self.workers)
+        ]
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        # Jobs queued or running per worker
+        self._queued = [0] * self.workers
+        self.in_flight = 0
+        self.submitted = 0
+        self.rejected = 0
+
+    def _worker_for(self, stream_key: Optional[Hashable]) -> int:
+        """Index of the worker that runs work for `stream_key`. Caller holds the lock."""
+        if stream_key is None:
+            return min(range(self.workers), key=self._queued.__getitem__)
+        return hash(stream_key) % self.workers
+
+    def submit(self, fn: Callable, *args: Any, stream_key: Optional[Hashable] = None) -> Future:
+        """
+        Run `fn(*args)` in a worker process if a slot is free.
+
+        Args:
+            fn: Picklable function to run
+            *args: Its arguments
+            stream_key: Stream the work belongs to; all of a stream's work
+                runs in the same worker
+
+        Raises:
+            PoolBusy: If max_pending frames are already in flight
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolBusy(f"{self.max_pending} frames already in flight")
+        with self._lock:
+            worker = self._worker_for(stream_key)
+            self._queued[worker] += 1
+        try:
+            future = self.executors[worker].submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._queued[worker] -= 1
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+        future.add_done_callback(lambda done: self._release(worker))
+        return future
+
+    def _release(self, worker: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._queued[worker] -= 1
+        self._slots.release()
+
+    def run(self, fn: Callable, *args: Any, timeout: Optional[float] = None,
+            stream_key: Optional[Hashable] = None) -> Any:
+        """Submit `fn(*args)` and wait for its result."""
+        return wait_result(self.submit(fn, *args, stream_key=stream_key), timeout or self.timeout)
+
+    def analyze(self, context: FrameContext, stream_key: Hashable,
+                detectors: Optional[Iterable[str]] = None) -> FrameContext:
+        """
+        Run the CPU-bound detectors for a frame in a worker process.
+
+        The results are stored in the context cache, so process_frame uses
+        them instead of running the detectors again.
+
+        Args:
+            context: Per-frame analysis context
+            stream_key: Identifier of the video stream
+            detectors: Detectors to run (defaults to all)
+
+        Returns:
+            The same context, with detector results filled in
+
+        Raises:
+            PoolBusy: If the pool is saturated
+        """
+        detectors = frozenset(ALL_DETECTORS if detectors is None else detectors)
+        if detectors:
+            context.results.update(self.run(_analyze_frame, context.frame, stream_key, detectors,
+                                            stream_key=stream_key))
+        return context
+
+    def shutdown(self) -> None:
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'in_flight': self.in_flight,
+                'queued_per_worker': list(self._queued),
+                'submitted': self.submitted,
+                'rejected': self.rejected
+            }
+
+
+# Optional pool used by the proctoring routes; None analyses in-process
+analysis_pool: Optional[AnalysisPool] = None
+
+
+def set_analysis_pool(pool: Optional[AnalysisPool]) -> None:
+    """
+    Offload frame analysis to a process pool, or back in-process.
+
+    Args:
+        pool: Pool to use, or None for in-process analysis
+    """
+    global analysis_pool
+    previous, analysis_pool = analysis_pool, pool
+    if previous is not None and previous is not pool:
+        previous.shutdown()
+
+
+def get_analysis_pool() -> Optional[AnalysisPool]:
+    return analysis_pool
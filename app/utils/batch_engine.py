@@ -0,0 +1,245 @@
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.analysis_pool import AnalysisPool, PoolBusy, wait_result
+from app.utils.cascade_settings import CascadeSettings, get_detection_settings, set_detection_settings
+
+# Haar cascade shared by in-process and batched detection
+CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+
+# Cascade owned by each worker process, loaded on first batch
+_worker_cascade = None
+
+# What a worker gets per frame: the downscaled gray frame and the smallest
+# and largest face side in its pixels
+WorkItem = Tuple[np.ndarray, float, Optional[float]]
+
+
+def _detect_batch(items: List[WorkItem], settings: CascadeSettings) -> List[np.ndarray]:
+    """
+    Worker entry point: face detection for a batch of prepared frames.
+
+    Args:
+        items: (gray, min_size, max_size) per frame, already downscaled by
+            the submitting process, sizes in the downscaled pixels
+        settings: Cascade scan settings of the submitting process
+
+    Returns:
+        One array of (x, y, w, h) boxes per frame, in the downscaled pixels
+    """
+    global _worker_cascade
+    if _worker_cascade is None:
+        _worker_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE)
+
+    return [settings.scan(_worker_cascade, gray, min_size=min_size, max_size=max_size, scale=1.0)
+            for gray, min_size, max_size in items]
+
+
+def _prepare(frame: np.ndarray, settings: CascadeSettings) -> Tuple[WorkItem, float]:
+    """
+    Grayscale, downscaled copy of a frame for a worker, as scan() would make it.
+
+    Only this copy is pickled to the worker process, not the BGR frame.
+
+    Returns:
+        The worker's (gray, min_size, max_size) item and the downscaling factor
+    """
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height = gray.shape[0]
+    scale = settings.scale_for(gray.shape[1], height)
+    if scale < 1.0:
+        size = (max(1, round(gray.shape[1] * scale)), max(1, round(height * scale)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    max_size = settings.max_face_ratio * height * scale if settings.max_face_ratio else None
+    return (gray, settings.min_face_ratio * height * scale, max_size), scale
+
+
+class BatchDetectionEngine:
+    """
+    Collect frames from many sessions and detect faces in batches.
+
+    Callers submit frames from their own request or stream threads. A
+    collector thread gathers them for up to `window` seconds (or until
+    `max_batch` frames are waiting), splits the batch across worker
+    processes and resolves each caller's future with its face boxes.
+    Per-frame dispatch overhead is paid once per chunk, and detection runs
+    on every core instead of inside the web worker. Only the grayscale,
+    downscaled frame the cascade scans is sent to the workers.
+
+    With an AnalysisPool, chunks go through its bounded submit: when the
+    pool is saturated the chunk's frames fail with PoolBusy and their
+    callers detect in-process, instead of queueing more work for the
+    workers. Without one the engine starts its own spawned process pool.
+
+    Args:
+        max_batch: Maximum frames collected into one batch
+        window: Seconds to wait for more frames after the first arrives
+        workers: Worker processes (defaults to the CPU count, or the pool's)
+        pool: AnalysisPool to share instead of a private process pool
+    """
+
+    def __init__(self, max_batch: int = 32,
+                 window: float = 0.01,
+                 workers: Optional[int] = None,
+                 pool: Optional[AnalysisPool] = None):
+        self.max_batch = max_batch
+        self.window = window
+        self.workers = workers or (pool.workers if pool is not None else None) or os.cpu_count() or 1
+        self._pool = pool
+        self._executor: Optional[Executor] = None
+        self._pending: 'queue.Queue[Tuple[WorkItem, float, Future]]' = queue.Queue()
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.frames = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Start the worker pool and the collector thread."""
+        with self._lock:
+            if self._running.is_set():
+                return
+            if self._pool is None and self._executor is None:
+                # Spawned like the AnalysisPool's workers: forking a process
+                # that already runs camera and socket threads can deadlock
+                # on locks they held
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=set_detection_settings,
+                                                     initargs=(get_detection_settings(),))
+            self._running.set()
+            self._thread = threading.Thread(target=self._collect_loop,
+                                            name='batch-detection', daemon=True)
+            self._thread.start()
+
+    def shutdown(self) -> None:
+        """Stop collecting, fail pending callers and close the private pool."""
+        with self._lock:
+            self._running.clear()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(1.0)
+        while True:
+            try:
+                _, _, future = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError('Batch detection engine stopped'))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, frame: np.ndarray) -> Future:
+        """
+        Queue a frame for the next batch.
+
+        Args:
+            frame: BGR or grayscale frame
+
+        Returns:
+            Future resolving to an array of (x, y, w, h) boxes
+        """
+        if not self._running.is_set():
+            self.start()
+        item, scale = _prepare(frame, get_detection_settings())
+        future: Future = Future()
+        self._pending.put((item, scale, future))
+        return future
+
+    def detect(self, frame: np.ndarray, timeout: Optional[float] = 5.0) -> np.ndarray:
+        """Submit a frame and wait for its face boxes, without blocking an eventlet hub."""
+        try:
+            return wait_result(self.submit(frame), timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def _collect_loop(self) -> None:
+        while self._running.is_set():
+            try:
+                batch = [self._pending.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[WorkItem, float, Future]]) -> None:
+        """Split a batch into one chunk per worker and submit the chunks."""
+        chunk_size = max(1, math.ceil(len(batch) / self.workers))
+        settings = get_detection_settings()
+        for start in range(0, len(batch), chunk_size):
+            chunk = batch[start:start + chunk_size]
+            items = [item for item, _, _ in chunk]
+            try:
+                if self._pool is not None:
+                    job = self._pool.submit(_detect_batch, items, settings)
+                else:
+                    job = self._executor.submit(_detect_batch, items, settings)
+            except PoolBusy as e:
+                with self._lock:
+                    self.rejected += len(chunk)
+                self._fail(chunk, e)
+                continue
+            except Exception as e:
+                self._fail(chunk, e)
+                continue
+            job.add_done_callback(lambda done, chunk=chunk: self._resolve(chunk, done))
+        with self._lock:
+            self.batches += 1
+            self.frames += len(batch)
+
+    def _resolve(self, chunk: List[Tuple[WorkItem, float, Future]], job: Future) -> None:
+        try:
+            results = job.result()
+        except Exception as e:
+            self._fail(chunk, e)
+            return
+        for (_, scale, future), faces in zip(chunk, results):
+            if scale < 1.0:
+                faces = np.rint(faces / scale).astype(np.int32)
+            future.set_result(faces)
+
+    def _fail(self, chunk: List[Tuple[WorkItem, float, Future]], error: Exception) -> None:
+        if not isinstance(error, PoolBusy):
+            with self._lock:
+                self.errors += len(chunk)
+        for _, _, future in chunk:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self._running.is_set(),
+                'workers': self.workers,
+                'batches': self.batches,
+                'frames': self.frames,
+                'avg_batch_size': round(self.frames / self.batches, 2) if self.batches else 0.0,
+                'pending': self._pending.qsize(),
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts
+            }
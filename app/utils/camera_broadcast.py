@@ -0,0 +1,126 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Generator, Hashable, List, Optional
+
+from app.utils.stream_pipeline import DropOldestQueue, FramePipeline
+
+# One broadcaster per camera source, shared by every viewer of that camera
+_broadcasters: Dict[Hashable, 'CameraBroadcaster'] = {}
+_registry_lock = threading.Lock()
+
+
+class CameraBroadcaster:
+    """
+    Reference-counted fan-out of one camera pipeline to many viewers.
+
+    The camera is opened, analysed and encoded once; each subscriber gets
+    its own small drop-oldest queue of JPEG bytes, so a slow viewer only
+    skips frames and never holds back the others. The pipeline, and with it
+    the capture device, is stopped when the last subscriber leaves.
+
+    Args:
+        source: Camera source identifier
+        create_pipeline: Callable building a FramePipeline for this source
+            that publishes encoded frames to the given sink
+        queue_size: Depth of each subscriber queue
+    """
+
+    def __init__(self, source: Hashable,
+                 create_pipeline: Callable[[Callable[[bytes], None]], FramePipeline],
+                 queue_size: int = 2):
+        self.source = source
+        self.create_pipeline = create_pipeline
+        self.queue_size = queue_size
+        self.pipeline: Optional[FramePipeline] = None
+        self._subscribers: List[DropOldestQueue] = []
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _publish(self, payload: bytes) -> None:
+        """Pipeline sink: hand an encoded frame to every subscriber."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(payload)
+
+    def _subscribe(self) -> DropOldestQueue:
+        """Add a subscriber, starting the pipeline for the first one."""
+        subscriber = DropOldestQueue(self.queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if self.pipeline is None:
+                self.pipeline = self.create_pipeline(self._publish)
+                self.pipeline.start()
+        return subscriber
+
+    def _unsubscribe(self, subscriber: DropOldestQueue) -> bool:
+        """
+        Remove a subscriber, stopping the pipeline after the last one.
+
+        Returns:
+            True if no subscribers remain
+        """
+        pipeline = None
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            idle = not self._subscribers
+            if idle:
+                pipeline, self.pipeline = self.pipeline, None
+        if pipeline is not None:
+            pipeline.stop()
+        return idle
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'source': str(self.source),
+                'subscribers': len(self._subscribers),
+                'dropped': [subscriber.dropped for subscriber in self._subscribers]
+            }
+
+
+def subscribe(source: Hashable,
+              create_pipeline: Callable[[Callable[[bytes], None]], FramePipeline],
+              timeout: float = 0.5) -> Generator[bytes, None, None]:
+    """
+    Stream encoded frames from the shared broadcaster of `source`.
+
+    The broadcaster is created on first use and discarded once its last
+    subscriber's generator is closed.
+
+    Args:
+        source: Camera source identifier
+        create_pipeline: Factory used when no broadcaster exists yet
+        timeout: Seconds to wait for a frame before checking again
+
+    Yields:
+        JPEG-encoded frames
+    """
+    with _registry_lock:
+        broadcaster = _broadcasters.get(source)
+        if broadcaster is None:
+            broadcaster = CameraBroadcaster(source, create_pipeline)
+            _broadcasters[source] = broadcaster
+        subscriber = broadcaster._subscribe()
+
+    try:
+        while True:
+            try:
+                yield subscriber.get(timeout=timeout)
+            except queue.Empty:
+                continue
+    finally:
+        with _registry_lock:
+            if broadcaster._unsubscribe(subscriber) and _broadcasters.get(source) is broadcaster:
+                del _broadcasters[source]
+
+
+def get_broadcast_stats() -> List[Dict[str, Any]]:
+    """Return subscriber counts for every active broadcaster."""
+    with _registry_lock:
+        return [broadcaster.stats() for broadcaster in _broadcasters.values()]
@@ -0,0 +1,134 @@
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+# Smallest window the frontal-face cascade was trained on
+CASCADE_WINDOW = 24
+
+
+class CascadeSettings:
+    """
+    How the Haar cascade scans a frame.
+
+    The frame is downscaled to `working_width` before scanning, and the
+    scanned face sizes are limited to what a webcam at exam distance can
+    see, as fractions of the frame height. The downscaling stops where the
+    smallest face would shrink below the cascade's 24 px window, which it
+    could not detect any more. Boxes are always returned in the
+    coordinates of the frame that was passed in.
+
+    Args:
+        working_width: Width frames are downscaled to before scanning, if
+            the smallest face stays detectable (None scans at full resolution)
+        scale_factor: Size step between scanned scales
+        min_neighbors: Overlapping detections needed to accept a face
+        min_face_ratio: Smallest face height as a fraction of the frame height
+        max_face_ratio: Largest face height as a fraction of the frame height
+            (None for no limit)
+    """
+
+    def __init__(self, working_width: Optional[int] = None,
+                 scale_factor: float = 1.1,
+                 min_neighbors: int = 5,
+                 min_face_ratio: float = 30 / 480,
+                 max_face_ratio: Optional[float] = None):
+        self.working_width = working_width
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face_ratio = min_face_ratio
+        self.max_face_ratio = max_face_ratio
+
+    @classmethod
+    def from_thresholds(cls, thresholds: Dict[str, Any]) -> 'CascadeSettings':
+        """Build the settings from the PROCTORING_THRESHOLDS config."""
+        defaults = cls()
+        return cls(
+            working_width=thresholds.get('DETECTION_WIDTH', defaults.working_width),
+            scale_factor=thresholds.get('DETECTION_SCALE_FACTOR', defaults.scale_factor),
+            min_neighbors=thresholds.get('DETECTION_MIN_NEIGHBORS', defaults.min_neighbors),
+            min_face_ratio=thresholds.get('MIN_FACE_RATIO', defaults.min_face_ratio),
+            max_face_ratio=thresholds.get('MAX_FACE_RATIO', defaults.max_face_ratio)
+        )
+
+    def scale_for(self, width: int, height: Optional[int] = None) -> float:
+        """
+        Downscaling factor applied to a frame of the given size (<= 1.0).
+
+        With the frame height, the factor is kept high enough for a face
+        of min_face_ratio of that height to fill the cascade window.
+        """
+        if not self.working_width or self.working_width >= width:
+            return 1.0
+        scale = self.working_width / width
+        if height and self.min_face_ratio:
+            scale = max(scale, CASCADE_WINDOW / (self.min_face_ratio * height))
+        return min(1.0, scale)
+
+    def scan(self, cascade: cv2.CascadeClassifier, gray: np.ndarray,
+             min_size: Optional[int] = None,
+             max_size: Optional[int] = None,
+             scale: Optional[float] = None) -> np.ndarray:
+        """
+        Detect faces in a grayscale image.
+
+        Args:
+            cascade: Haar cascade to run
+            gray: Grayscale frame or region of a frame
+            min_size: Smallest face side in gray's pixels (defaults to min_face_ratio)
+            max_size: Largest face side in gray's pixels (defaults to max_face_ratio)
+            scale: Downscaling factor (defaults to scale_for(gray size)); pass
+                the full frame's factor when scanning a region of it
+
+        Returns:
+            Array of face boxes as (x, y, w, h) in gray's coordinates
+        """
+        height = gray.shape[0]
+        if scale is None:
+            scale = self.scale_for(gray.shape[1], height)
+        if min_size is None:
+            min_size = self.min_face_ratio * height
+        if max_size is None and self.max_face_ratio:
+            max_size = self.max_face_ratio * height
+
+        image = gray
+        if scale < 1.0:
+            size = (max(1, round(gray.shape[1] * scale)), max(1, round(height * scale)))
+            image = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+        min_side = max(CASCADE_WINDOW, int(min_size * scale))
+        params = {'scaleFactor': self.scale_factor,
+                  'minNeighbors': self.min_neighbors,
+                  'minSize': (min_side, min_side)}
+        if max_size:
+            max_side = int(max_size * scale)
+            if max_side < min_side:
+                return np.empty((0, 4), dtype=np.int32)
+            params['maxSize'] = (max_side, max_side)
+
+        faces = np.asarray(cascade.detectMultiScale(image, **params), dtype=np.float64).reshape(-1, 4)
+        if scale < 1.0:
+            faces /= scale
+        return np.rint(faces).astype(np.int32)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'working_width': self.working_width,
+            'scale_factor': self.scale_factor,
+            'min_neighbors': self.min_neighbors,
+            'min_face_ratio': self.min_face_ratio,
+            'max_face_ratio': self.max_face_ratio
+        }
+
+
+# Settings used by every cascade scan in this process
+detection_settings = CascadeSettings()
+
+
+def set_detection_settings(settings: CascadeSettings) -> None:
+    global detection_settings
+    detection_settings = settings
+
+
+def get_detection_settings() -> CascadeSettings:
+    return detection_settings
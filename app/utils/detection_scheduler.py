@@ -0,0 +1,149 @@
+import math
+import threading
+from typing import Any, Dict, Optional, Set
+
+import cv2
+import numpy as np
+
+from app.utils.frame_context import FrameContext
+
+# Detectors the scheduler can switch on and off per frame
+FACE_DETECTOR = 'faces'
+NECK_DETECTOR = 'neck_movement'
+ALL_DETECTORS = frozenset({FACE_DETECTOR, NECK_DETECTOR})
+
+
+def motion_score(previous: np.ndarray, current: np.ndarray) -> float:
+    """
+    Mean absolute difference between two small grayscale frames.
+
+    Args:
+        previous: Earlier thumbnail
+        current: Current thumbnail of the same size
+
+    Returns:
+        Difference in the range 0.0 (identical) to 1.0
+    """
+    return float(cv2.absdiff(previous, current).mean()) / 255.0
+
+
+class DetectionScheduler:
+    """
+    Decide per frame which detectors run on a stream.
+
+    Three signals drive the decision:
+    - alert state: while any suspicious activity timer is running, every
+      detector runs on every frame so durations are measured precisely
+    - motion: frame differencing on a thumbnail; when the scene changes,
+      FaceMesh runs every frame and the cascade as often as the budget allows
+    - CPU budget: an exponential moving average of analysis latency against
+      the target frame latency stretches the refresh interval when the
+      stream falls behind
+
+    On frames where the cascade is skipped, the previous face boxes are
+    carried forward.
+
+    Args:
+        base_interval: Frames between full detections in a static scene
+        target_latency: Target analysis latency per frame in seconds
+        motion_threshold: Motion score above which the scene counts as moving
+        max_interval: Upper bound for the stretched refresh interval
+    """
+
+    def __init__(self, base_interval: int = 5,
+                 target_latency: float = 0.1,
+                 motion_threshold: float = 0.02,
+                 max_interval: int = 30):
+        self.base_interval = max(1, int(base_interval))
+        self.target_latency = target_latency
+        self.motion_threshold = motion_threshold
+        self.max_interval = max(self.base_interval, int(max_interval))
+
+        self._lock = threading.Lock()
+        self._previous_thumbnail: Optional[np.ndarray] = None
+        self._since_faces = math.inf
+        self._since_full = math.inf
+        self._latency_ewma = 0.0
+        self._last_motion = 0.0
+        self.frames = 0
+        self.runs = {FACE_DETECTOR: 0, NECK_DETECTOR: 0}
+        self.modes = {'alert': 0, 'motion': 0, 'refresh': 0, 'static': 0}
+
+    @property
+    def budget_factor(self) -> float:
+        """How far recent analysis latency exceeds the target (>= 1.0)."""
+        if self.target_latency <= 0:
+            return 1.0
+        return max(1.0, self._latency_ewma / self.target_latency)
+
+    @property
+    def interval(self) -> int:
+        """Current refresh interval for static scenes, in frames."""
+        return min(self.max_interval, math.ceil(self.base_interval * self.budget_factor))
+
+    def plan(self, context: FrameContext, alert_building: bool = False) -> Set[str]:
+        """
+        Choose the detectors to run on this frame.
+
+        Args:
+            context: Per-frame analysis context
+            alert_building: Whether any suspicious activity timer is running
+
+        Returns:
+            Set of detector names to run
+        """
+        thumbnail = context.thumbnail
+        with self._lock:
+            self.frames += 1
+            if self._previous_thumbnail is not None and self._previous_thumbnail.shape == thumbnail.shape:
+                self._last_motion = motion_score(self._previous_thumbnail, thumbnail)
+            else:
+                self._last_motion = math.inf
+            self._previous_thumbnail = thumbnail
+
+            if alert_building:
+                mode, detectors = 'alert', set(ALL_DETECTORS)
+            elif self._last_motion >= self.motion_threshold:
+                mode, detectors = 'motion', {NECK_DETECTOR}
+                if self._since_faces + 1 >= self.budget_factor:
+                    detectors.add(FACE_DETECTOR)
+            elif self._since_full + 1 >= self.interval:
+                mode, detectors = 'refresh', set(ALL_DETECTORS)
+            else:
+                mode, detectors = 'static', set()
+
+            self.modes[mode] += 1
+            self._since_faces = 0 if FACE_DETECTOR in detectors else self._since_faces + 1
+            self._since_full = 0 if detectors == ALL_DETECTORS else self._since_full + 1
+            for name in detectors:
+                self.runs[name] += 1
+            return detectors
+
+    def record(self, latency: float, alpha: float = 0.2) -> None:
+        """
+        Feed back the analysis latency of the last frame.
+
+        Args:
+            latency: Seconds spent analysing the frame
+            alpha: Smoothing factor of the moving average
+        """
+        with self._lock:
+            if self._latency_ewma == 0.0:
+                self._latency_ewma = latency
+            else:
+                self._latency_ewma += alpha * (latency - self._latency_ewma)
+
+    def stats(self) -> Dict[str, Any]:
+        """Scheduler decisions and latency against the target."""
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'runs': dict(self.runs),
+                'modes': dict(self.modes),
+                'latency_ms': round(1000 * self._latency_ewma, 2),
+                'target_latency_ms': round(1000 * self.target_latency, 2),
+                'within_budget': self._latency_ewma <= self.target_latency,
+                'interval': self.interval,
+                'skip_ratio': round(self.modes['static'] / self.frames, 4) if self.frames else 0.0,
+                'motion': None if math.isinf(self._last_motion) else round(self._last_motion, 4)
+            }
@@ -0,0 +1,112 @@
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from flask import request
+from flask_login import current_user
+from flask_socketio import Namespace, join_room
+
+from app.utils.procrastination import check_violations, clean_poll_result, record_reported_violation
+
+logger = logging.getLogger(__name__)
+
+EXAM_NAMESPACE = '/exam'
+
+
+def exam_room(user_id: Any, exam_id: Any) -> str:
+    """Room holding every connection of one student in one exam."""
+    return f"exam:{user_id}:{exam_id}"
+
+
+def push_auto_submit(user_id: Any, exam_id: Any, warning_count: int,
+                     message: str = 'Maximum violations reached. Exam will be auto-submitted.') -> None:
+    """
+    Tell every open exam page of the student to submit the exam now.
+
+    The emit goes to the student's room on this server process. Pages
+    connected to another process only receive it through the Socket.IO
+    message queue (SOCKETIO_MESSAGE_QUEUE), which every process must share
+    when the app runs in more than one; without it this reaches the
+    student only if they are connected to this process.
+    """
+    # Import socketio here to avoid circular imports
+    from app import socketio
+    socketio.emit('auto_submit', {
+        'examId': str(exam_id),
+        'warningCount': warning_count,
+        'message': message
+    }, to=exam_room(user_id, exam_id), namespace=EXAM_NAMESPACE)
+
+
+class ExamNamespace(Namespace):
+    """
+    Socket.IO channel of students taking an exam.
+
+    The exam page connects once, with the exam ID in the auth payload or
+    query string. The student is authenticated from the session cookie at
+    connect and remembered for the connection, so each event is only a
+    message dispatch: no session load, user lookup or HTTP request.
+
+    Events, answered through the Socket.IO acknowledgement:
+        poll: procrastination-check payload; replies with the same
+            response as the HTTP route
+        violation: advanced proctoring report; replies like the HTTP
+            /violation route
+
+    Pushed to the client:
+        auto_submit: the warning limit was reached, submit the exam
+    """
+
+    def __init__(self, namespace: str = EXAM_NAMESPACE):
+        super().__init__(namespace)
+        # Connection sid -> (user_id, exam_id), fixed at connect
+        self.clients: Dict[str, Tuple[Any, str]] = {}
+
+    def on_connect(self, auth: Optional[Dict[str, Any]] = None):
+        exam_id = (auth or {}).get('exam_id') or request.args.get('exam_id')
+        if not exam_id:
+            raise ConnectionRefusedError('exam_id required')
+        if not current_user.is_authenticated or current_user.role != 'student':
+            raise ConnectionRefusedError('Students only')
+        user_id = current_user.id
+        self.clients[request.sid] = (user_id, str(exam_id))
+        join_room(exam_room(user_id, exam_id))
+
+    def on_disconnect(self, reason: Optional[str] = None):
+        self.clients.pop(request.sid, None)
+
+    def on_poll(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        client = self.clients.get(request.sid)
+        if client is None:
+            return {'success': False, 'message': 'Not connected to an exam'}
+        if not isinstance(data, dict) or not data:
+            return {'success': False, 'message': 'No data provided'}
+        user_id, exam_id = client
+        try:
+            result = clean_poll_result(user_id, exam_id, data)
+            if result is not None:
+                return result
+            result = check_violations(user_id, exam_id, data)
+        except Exception as e:
+            logger.error(f"Error in procrastination check: {str(e)}")
+            return {'success': False, 'message': 'Error processing procrastination check'}
+        if result['autoSubmit']:
+            push_auto_submit(user_id, exam_id, result['warningCount'], result['autoSubmitMessage'])
+        return result
+
+    def on_violation(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        client = self.clients.get(request.sid)
+        if client is None:
+            return {'success': False, 'message': 'Not connected to an exam'}
+        if not isinstance(data, dict) or not data:
+            return {'success': False, 'message': 'No data provided'}
+        user_id, exam_id = client
+        try:
+            entry = record_reported_violation(user_id, exam_id, data)
+        except Exception as e:
+            logger.error(f"Error reporting violation for exam {exam_id}: {str(e)}")
+            return {'success': False, 'message': 'Failed to record violation'}
+        return {
+            'success': True,
+            'message': 'Violation recorded',
+            'current_warnings': entry['warning_count']
+        }
@@ -1,55 +1,100 @@
 import cv2
 import numpy as np
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
+
+from app.utils.frame_context import FrameContext, ensure_context
+from app.utils.batch_engine import BatchDetectionEngine, CASCADE_FILE
+from app.utils.cascade_settings import get_detection_settings
+from app.utils.face_tracker import FaceTracker
 
 # Using OpenCV's face detection instead of face_recognition
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE)
+
+# Optional engine that batches detection for many streams in a process pool
+batch_engine: Optional[BatchDetectionEngine] = None
+
+def set_batch_engine(engine: Optional[BatchDetectionEngine]) -> None:
+    """
+    Route cascade detection through a batching engine, or back in-process.
+    
+    Args:
+        engine: Engine to use, or None for in-process detection
+    """
+    global batch_engine
+    previous, batch_engine = batch_engine, engine
+    if previous is not None and previous is not engine:
+        previous.shutdown()
 
-def detect_multiple_persons(frame: np.ndarray) -> Tuple[bool, int]:
+def detect_faces(frame: np.ndarray,
+                 context: Optional[FrameContext] = None,
+                 tracker: Optional[FaceTracker] = None) -> np.ndarray:
+    """
+    Run the Haar cascade once per frame and cache the boxes on the context.
+    
+    When a batch engine is configured, the frame joins the next batch and
+    the calling thread waits for its result. If the engine fails or times
+    out, the frame is scanned in-process instead. With a tracker, the
+    stream's known faces are followed between full scans and the full
+    scan only runs when the tracker asks for it.
+
+    Args:
+        frame: Input camera frame
+        context: Shared per-frame analysis context (optional)
+        tracker: Face tracker of the stream the frame belongs to (optional)
+
+    Returns:
+        Array of face boxes as (x, y, w, h)
+    """
+    context = ensure_context(frame, context)
+    if tracker is not None:
+        return context.cached('faces', lambda: tracker.update(context, lambda: _run_cascade(context)))
+    return context.cached('faces', lambda: _run_cascade(context))
+
+def _run_cascade(context: FrameContext) -> np.ndarray:
+    engine = batch_engine
+    if engine is not None:
+        try:
+            return engine.detect(context.gray)
+        except Exception as e:
+            print(f"Batch face detection failed, detecting in-process: {e}")
+    return get_detection_settings().scan(face_cascade, context.gray)
+
+def detect_multiple_persons(frame: np.ndarray,
+                            context: Optional[FrameContext] = None,
+                            tracker: Optional[FaceTracker] = None) -> Tuple[bool, int]:
     """
     Detect if multiple persons are present in the frame using OpenCV.
     
     Args:
         frame: Input camera frame
+        context: Shared per-frame analysis context (optional)
+        tracker: Face tracker of the stream the frame belongs to (optional)
         
     Returns:
         Tuple containing (multiple_detected, face_count)
     """
-    # Convert to grayscale for faster processing
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Detect faces
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30)
-    )
+    faces = detect_faces(frame, context, tracker)
     
     face_count = len(faces)
     
     # Return True if more than one face is detected
     return face_count > 1, face_count
 
-def extract_face_encodings(frame: np.ndarray) -> Tuple[List, List]:
+def extract_face_encodings(frame: np.ndarray,
+                           context: Optional[FrameContext] = None,
+                           tracker: Optional[FaceTracker] = None) -> Tuple[List, List]:
     """
     Extract face locations using OpenCV.
     
     Args:
         frame: Input camera frame
+        context: Shared per-frame analysis context (optional)
+        tracker: Face tracker of the stream the frame belongs to (optional)
         
     Returns:
         Tuple containing (face_locations, empty_list)
     """
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Detect faces
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30)
-    )
+    faces = detect_faces(frame, context, tracker)
     
     # Convert to the format expected by other functions (top, right, bottom, left)
     face_locations = []
@@ -69,7 +114,8 @@ def track_person_consistency(current_encoding: np.ndarray,
 
 def draw_face_boxes(frame: np.ndarray, 
                    face_locations: List[Tuple[int, int, int, int]],
-                   is_multiple: bool = False) -> np.ndarray:
+                   is_multiple: bool = False,
+                   in_place: bool = False) -> np.ndarray:
     """
     Draw boxes around detected faces with labels.
     
@@ -77,11 +123,12 @@ def draw_face_boxes(frame: np.ndarray,
         frame: Input camera frame
         face_locations: List of face locations
         is_multiple: Flag indicating if multiple people were detected
+        in_place: Draw on `frame` itself instead of a copy
         
     Returns:
         Frame with annotated face boxes
     """
-    annotated_frame = frame.copy()
+    annotated_frame = frame if in_place else frame.copy()
     
     for i, (top, right, bottom, left) in enumerate(face_locations):
         # Draw a box around the face
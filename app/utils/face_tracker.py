@@ -0,0 +1,143 @@
+import threading
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from app.utils.batch_engine import CASCADE_FILE
+from app.utils.cascade_settings import get_detection_settings
+from app.utils.frame_context import FrameContext
+
+# Default for PROCTORING_THRESHOLDS['FACE_TRACK_REFRESH']
+FACE_TRACK_REFRESH = 10      # frames between full-frame scans
+FACE_TRACK_MARGIN = 0.25     # search window padding, as a fraction of the box size
+FACE_TRACK_SCALE_RANGE = (0.8, 1.25)  # face size change allowed between frames
+# Share of the thumbnail outside the tracked faces that must change to
+# trigger a full scan, e.g. when someone walks into the frame
+FACE_TRACK_NEW_FACE_CHANGE = 0.02
+PIXEL_CHANGE_LEVEL = 25      # grey levels
+
+# Cascade for the windowed re-detection; full scans go through face_detection
+_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE)
+
+
+class FaceTracker:
+    """
+    Detect-then-track face boxes for one stream.
+
+    A full-frame Haar scan finds the faces; on the following frames each
+    known face is re-detected only inside a window around its last box and
+    only at scales close to its last size, which is a small fraction of the
+    full scan's work. A full scan runs again when a face is lost, when no
+    face is being tracked, when the thumbnail changes outside the tracked
+    faces since the last scan (someone may have entered the frame), and
+    every `refresh_interval` frames as a safety net.
+
+    Args:
+        refresh_interval: Frames between scheduled full scans
+        margin: Search window padding around a box, as a fraction of its size
+    """
+
+    def __init__(self, refresh_interval: int = FACE_TRACK_REFRESH,
+                 margin: float = FACE_TRACK_MARGIN):
+        self.refresh_interval = max(1, int(refresh_interval))
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._boxes = np.empty((0, 4), dtype=np.int32)
+        self._since_scan = 0
+        self.frames = 0
+        self._scan_thumbnail: Optional[np.ndarray] = None
+        self.scans = {'scheduled': 0, 'lost': 0, 'empty': 0, 'change': 0}
+
+    def update(self, context: FrameContext, full_scan) -> np.ndarray:
+        """
+        Face boxes for the next frame of the stream.
+
+        Args:
+            context: Per-frame analysis context
+            full_scan: Callable returning the boxes of a full-frame scan
+
+        Returns:
+            Array of face boxes as (x, y, w, h)
+        """
+        gray = context.gray
+        with self._lock:
+            self.frames += 1
+            reason = None
+            if len(self._boxes) == 0:
+                reason = 'empty'
+            elif self._since_scan + 1 >= self.refresh_interval:
+                reason = 'scheduled'
+            elif self._changed_outside_faces(context):
+                reason = 'change'
+            else:
+                tracked = [self._redetect(gray, box) for box in self._boxes]
+                if any(box is None for box in tracked):
+                    reason = 'lost'
+                else:
+                    self._boxes = np.array(tracked, dtype=np.int32).reshape(-1, 4)
+                    self._since_scan += 1
+
+            if reason is not None:
+                self.scans[reason] += 1
+                self._boxes = np.asarray(full_scan(), dtype=np.int32).reshape(-1, 4)
+                self._since_scan = 0
+                self._scan_thumbnail = context.thumbnail
+            return self._boxes.copy()
+
+    def _changed_outside_faces(self, context: FrameContext) -> bool:
+        """Whether the scene away from the tracked faces changed since the last full scan."""
+        thumbnail = context.thumbnail
+        if self._scan_thumbnail is None or self._scan_thumbnail.shape != thumbnail.shape:
+            return True
+
+        # Tracked faces move on their own; only look at the rest of the scene
+        outside = np.ones(thumbnail.shape, dtype=bool)
+        scale_x = thumbnail.shape[1] / context.frame.shape[1]
+        scale_y = thumbnail.shape[0] / context.frame.shape[0]
+        for x, y, w, h in self._boxes:
+            pad_x, pad_y = w * self.margin, h * self.margin
+            outside[max(0, int((y - pad_y) * scale_y)):int((y + h + pad_y) * scale_y) + 1,
+                    max(0, int((x - pad_x) * scale_x)):int((x + w + pad_x) * scale_x) + 1] = False
+
+        area = np.count_nonzero(outside)
+        changed = (cv2.absdiff(self._scan_thumbnail, thumbnail) > PIXEL_CHANGE_LEVEL) & outside
+        return area > 0 and np.count_nonzero(changed) > FACE_TRACK_NEW_FACE_CHANGE * area
+
+    def _redetect(self, gray: np.ndarray, box: np.ndarray) -> Optional[np.ndarray]:
+        """Find the face near `box`, or None if it is gone."""
+        x, y, w, h = (int(v) for v in box)
+        pad_x, pad_y = int(w * self.margin), int(h * self.margin)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(gray.shape[1], x + w + pad_x), min(gray.shape[0], y + h + pad_y)
+
+        # Same working resolution as the full scan, only nearby face sizes
+        settings = get_detection_settings()
+        low, high = FACE_TRACK_SCALE_RANGE
+        min_side = max(settings.min_face_ratio * gray.shape[0], w * low)
+        max_side = min(x1 - x0, y1 - y0, w * high)
+        found = settings.scan(_cascade, gray[y0:y1, x0:x1], min_side, max_side,
+                              scale=settings.scale_for(gray.shape[1], gray.shape[0]))
+        if len(found) == 0:
+            return None
+
+        # The candidate whose centre is closest to the previous box
+        centres = found[:, :2] + found[:, 2:] / 2 - (x - x0 + w / 2, y - y0 + h / 2)
+        best = found[int(np.argmin((centres * centres).sum(axis=1)))]
+        return best + (x0, y0, 0, 0)
+
+    def reset(self) -> None:
+        """Drop the tracked boxes, so the next frame gets a full scan."""
+        with self._lock:
+            self._boxes = np.empty((0, 4), dtype=np.int32)
+            self._since_scan = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            full = sum(self.scans.values())
+            return {
+                'frames': self.frames,
+                'tracking': len(self._boxes),
+                'full_scans': dict(self.scans),
+                'tracked_ratio': round(1 - full / self.frames, 4) if self.frames else 0.0
+            }
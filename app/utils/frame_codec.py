@@ -0,0 +1,57 @@
+import base64
+import io
+from typing import Optional, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Uploads smaller than this cannot hold a decodable image
+MIN_FRAME_BYTES = 16
+
+
+def decode_base64_frame(image_data: str) -> np.ndarray:
+    """
+    Decode a base64 image or data URL into a BGR frame.
+
+    This is the JSON upload path: base64 decoding, PIL, a NumPy copy and
+    a colour conversion.
+
+    Args:
+        image_data: Base64 string, optionally with a data:image prefix
+
+    Returns:
+        BGR frame
+    """
+    if image_data.startswith('data:image'):
+        # Remove data URL prefix if present
+        image_data = image_data.split(',')[1]
+
+    image_bytes = base64.b64decode(image_data)
+    image = Image.open(io.BytesIO(image_bytes))
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def decode_frame_buffer(buffer: Union[bytes, bytearray, memoryview]) -> Optional[np.ndarray]:
+    """
+    Decode an encoded image (JPEG, PNG, ...) straight from a byte buffer.
+
+    The buffer is wrapped, not copied, and OpenCV decodes it into the
+    frame in one step. Grayscale images stay single-channel, which the
+    detectors accept as is; colour images are decoded as BGR.
+
+    Args:
+        buffer: Encoded image bytes
+
+    Returns:
+        Grayscale or BGR frame, or None if the buffer is not a decodable image
+    """
+    if buffer is None or len(buffer) < MIN_FRAME_BYTES:
+        return None
+    data = np.frombuffer(memoryview(buffer), dtype=np.uint8)
+    frame = cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+    if frame is None:
+        return None
+    if frame.ndim == 3 and frame.shape[2] == 4:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return frame
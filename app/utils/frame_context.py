@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+from typing import Any, Callable, Dict, Optional
+
+
+class FrameContext:
+    """
+    Per-frame analysis context shared by every detection stage.
+
+    Colour conversions are computed on first use and detector results are
+    cached by name, so each frame is converted and scanned only once no
+    matter how many stages consume it.
+
+    Args:
+        frame: Input BGR camera frame, or a single-channel grayscale frame
+    """
+
+    # Size of the downscaled grayscale view used for cheap frame statistics
+    THUMBNAIL_SIZE = (160, 120)
+
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+        self._gray: Optional[np.ndarray] = None
+        self._rgb: Optional[np.ndarray] = None
+        self._thumbnail: Optional[np.ndarray] = None
+        self.results: Dict[str, Any] = {}
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale version of the frame."""
+        if self._gray is None:
+            if self.frame.ndim == 2:
+                self._gray = self.frame
+            else:
+                self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """RGB version of the frame, as expected by MediaPipe."""
+        if self._rgb is None:
+            code = cv2.COLOR_GRAY2RGB if self.frame.ndim == 2 else cv2.COLOR_BGR2RGB
+            self._rgb = cv2.cvtColor(self.frame, code)
+        return self._rgb
+
+    @property
+    def thumbnail(self) -> np.ndarray:
+        """Small grayscale view of the frame for motion and brightness checks."""
+        if self._thumbnail is None:
+            self._thumbnail = cv2.resize(self.gray, self.THUMBNAIL_SIZE,
+                                         interpolation=cv2.INTER_AREA)
+        return self._thumbnail
+
+    def cached(self, name: str, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for `name`, computing it on first use.
+
+        Args:
+            name: Detector result name
+            compute: Callable producing the result
+
+        Returns:
+            The detector result
+        """
+        if name not in self.results:
+            self.results[name] = compute()
+        return self.results[name]
+
+
+def ensure_context(frame: np.ndarray, context: Optional[FrameContext]) -> FrameContext:
+    """Return `context` if given, otherwise a fresh context for `frame`."""
+    return context if context is not None else FrameContext(frame)
@@ -1,73 +1,139 @@
 import cv2
 import numpy as np
-from typing import Tuple, Dict, Any, List
+from typing import Tuple, Dict, Any, List, Hashable, Optional, Set
 
 from app.utils.pose_analysis import detect_neck_movement, visualize_landmarks
 from app.utils.face_detection import detect_multiple_persons, draw_face_boxes, extract_face_encodings
-from app.utils.alerts import continuous_tracking
+from app.utils.frame_context import FrameContext, ensure_context
+from app.utils.detection_scheduler import FACE_DETECTOR, NECK_DETECTOR
+from app.utils.proctor_session import ProctorSession, get_session
 
-def process_frame(frame: np.ndarray) -> Tuple[np.ndarray, Dict[str, Any]]:
+def process_frame(frame: np.ndarray,
+                  stream_key: Hashable = 'default',
+                  context: Optional[FrameContext] = None,
+                  detectors: Optional[Set[str]] = None,
+                  previous: Optional[Dict[str, Any]] = None,
+                  session: Optional[ProctorSession] = None,
+                  annotate: bool = True) -> Tuple[Optional[np.ndarray], Dict[str, Any]]:
     """
     Process a single frame from the video feed with all detection algorithms.
     
     This function follows the RORO pattern (Receive Object, Return Object)
-    for clean data passing between pipeline stages.
+    for clean data passing between pipeline stages. A single FrameContext is
+    shared by every detector, so the frame is converted to gray/RGB once and
+    the Haar cascade runs once. Face boxes come from the session's face
+    tracker, which runs the full-frame cascade only when it has to.
     
     Args:
         frame: Input camera frame as numpy array
+        stream_key: Identifier of the video stream the frame belongs to
+        context: Shared per-frame analysis context (optional)
+        detectors: Detectors to run, as chosen by a DetectionScheduler;
+            None runs all of them
+        previous: Metadata of the last analysed frame, whose results are
+            carried forward for detectors that do not run
+        session: Proctoring state of the stream (defaults to the session
+            registered under stream_key)
+        annotate: Draw the overlay on a copy of the frame. Callers that only
+            need the metadata pass False and get None instead of a frame,
+            which saves the copy and all drawing; annotate_frame can draw
+            the overlay later on the buffer that is actually streamed.
         
     Returns:
-        Tuple of (processed_frame, metadata_dict)
+        Tuple of (processed_frame or None, metadata_dict)
     """
     if frame is None or frame.size == 0:
         return np.zeros((480, 640, 3), dtype=np.uint8), {}
     
-    # Create a copy for annotation
-    processed_frame = frame.copy()
+    # Only annotated output needs its own buffer
+    processed_frame = frame.copy() if annotate else None
     metadata = {}
+    context = ensure_context(frame, context)
+    session = get_session(session, stream_key)
+    previous = previous or {}
+    reused = []
     
     try:
-        # Detect multiple persons
-        multiple_detected, face_count = detect_multiple_persons(frame)
-        metadata['multiple_people'] = (multiple_detected, face_count)
-        
-        # Get face locations for drawing
-        face_locations, _ = extract_face_encodings(frame)
+        if detectors is None or FACE_DETECTOR in detectors:
+            # Detect multiple persons
+            multiple_detected, face_count = detect_multiple_persons(frame, context, session.face_tracker)
+            metadata['multiple_people'] = (multiple_detected, face_count)
+            
+            # Get face locations for drawing (reuses the cascade result)
+            face_locations, _ = extract_face_encodings(frame, context, session.face_tracker)
+            metadata['face_locations'] = face_locations
+        else:
+            # Keep following the last known face boxes
+            metadata['multiple_people'] = previous.get('multiple_people', (False, 0))
+            metadata['face_locations'] = previous.get('face_locations', [])
+            reused.append(FACE_DETECTOR)
         
-        # Draw face boxes
-        processed_frame = draw_face_boxes(
-            processed_frame, 
-            face_locations, 
-            is_multiple=multiple_detected
-        )
+        if detectors is None or NECK_DETECTOR in detectors:
+            # Detect neck movement
+            neck_moved, movement_ratio = detect_neck_movement(frame, stream_key=stream_key,
+                                                              context=context, session=session)
+            metadata['neck_movement'] = (neck_moved, movement_ratio)
+        else:
+            metadata['neck_movement'] = previous.get('neck_movement', (False, 0.0))
+            reused.append(NECK_DETECTOR)
         
-        # Detect neck movement
-        neck_moved, movement_ratio = detect_neck_movement(frame)
-        metadata['neck_movement'] = (neck_moved, movement_ratio)
+        metadata['reused'] = reused
         
-        # Add status indicators and metrics on the frame
-        add_status_indicators(processed_frame, metadata)
+        if annotate:
+            # Draw face boxes, status indicators and metrics on the frame
+            processed_frame = annotate_frame(processed_frame, metadata, session)
         
     except Exception as e:
         # On error, return original frame with error message
-        cv2.putText(processed_frame, f"Error: {str(e)}", 
-                   (10, processed_frame.shape[0] - 10),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+        if annotate:
+            cv2.putText(processed_frame, f"Error: {str(e)}", 
+                       (10, processed_frame.shape[0] - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
         metadata['error'] = str(e)
     
     return processed_frame, metadata
 
-def add_status_indicators(frame: np.ndarray, metadata: Dict[str, Any]) -> np.ndarray:
+def annotate_frame(frame: np.ndarray, metadata: Dict[str, Any],
+                   session: Optional[ProctorSession] = None) -> np.ndarray:
+    """
+    Draw face boxes and status indicators for previously computed metadata.
+    
+    The metadata may come from an earlier frame, which lets a stream keep
+    its overlay while detection runs at a lower rate than capture. Drawing
+    happens in place, so pass a buffer the caller owns.
+    
+    Args:
+        frame: Frame to annotate, modified in place
+        metadata: Detection metadata from process_frame
+        session: Proctoring state whose activity timers are displayed
+        
+    Returns:
+        Annotated frame
+    """
+    multiple_detected, _ = metadata.get('multiple_people', (False, 0))
+    frame = draw_face_boxes(
+        frame,
+        metadata.get('face_locations', []),
+        is_multiple=multiple_detected,
+        in_place=True
+    )
+    return add_status_indicators(frame, metadata, session)
+
+def add_status_indicators(frame: np.ndarray, metadata: Dict[str, Any],
+                          session: Optional[ProctorSession] = None) -> np.ndarray:
     """
     Add status indicators and metrics to the frame.
     
     Args:
         frame: Input frame to annotate
         metadata: Detection metadata
+        session: Proctoring state whose activity timers are displayed
+            (defaults to the shared default session)
         
     Returns:
         Annotated frame
     """
+    continuous_tracking = get_session(session).continuous_tracking
     height, width = frame.shape[:2]
     
     # Draw rectangle for status area
@@ -0,0 +1,204 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+
+class _PoolEntry:
+    """A pooled graph together with its bookkeeping; graph is None until built."""
+
+    __slots__ = ('graph', 'lock', 'last_used', 'checkouts')
+
+    def __init__(self, graph: Any = None):
+        self.graph = graph
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.checkouts = 0
+
+
+def _close_graph(graph: Any) -> None:
+    """Release the native resources held by a MediaPipe graph."""
+    if graph is None:
+        return
+    try:
+        graph.close()
+    except Exception as e:
+        print(f"Error closing pooled graph: {e}")
+
+
+class GraphPool:
+    """
+    Long-lived pool of MediaPipe graphs keyed per stream/session.
+
+    Building a graph loads its TFLite model and discards any tracking state,
+    so graphs are created once per key and reused across frames. Each key
+    owns at most one graph and concurrent callers for the same key are
+    serialised, since MediaPipe graphs do not support concurrent process()
+    calls. A new key only reserves its slot under the pool lock; the graph
+    is built outside it, by the first caller holding the key's own lock,
+    so a slow build never stalls checkouts of other keys.
+
+    Args:
+        factory: Callable returning a new graph instance
+        max_size: Maximum number of pooled graphs
+        idle_timeout: Seconds after which an unused graph is closed
+    """
+
+    def __init__(self, factory: Callable[[], Any],
+                 max_size: int = 8,
+                 idle_timeout: float = 300.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[Hashable, _PoolEntry] = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._evicted = 0
+        self._overflow = 0
+
+    @contextmanager
+    def checkout(self, key: Hashable = 'default') -> Iterator[Any]:
+        """
+        Check out the graph owned by `key` for the duration of a call.
+
+        When the pool is full and every graph is busy, a temporary graph
+        is built for this call and closed afterwards.
+
+        Args:
+            key: Stream or session identifier
+
+        Yields:
+            Graph instance ready for process()
+        """
+        entry = self._acquire_entry(key)
+
+        if entry is None:
+            with self.scratch() as graph:
+                yield graph
+            return
+
+        try:
+            with entry.lock:
+                if entry.graph is None:
+                    # Reserved slot, or a build that failed: build it now
+                    entry.graph = self.factory()
+                    with self._lock:
+                        self._created += 1
+                yield entry.graph
+        finally:
+            with self._lock:
+                entry.checkouts -= 1
+                entry.last_used = time.monotonic()
+
+    @contextmanager
+    def scratch(self) -> Iterator[Any]:
+        """
+        Build a graph for a single call and close it afterwards.
+
+        For callers without a stream to own a pooled graph: the graph
+        starts without tracking state and is never shared.
+
+        Yields:
+            Graph instance ready for process()
+        """
+        graph = self.factory()
+        try:
+            yield graph
+        finally:
+            _close_graph(graph)
+
+    def _acquire_entry(self, key: Hashable) -> Optional[_PoolEntry]:
+        """Find or reserve the entry for `key` and mark it as checked out."""
+        expired = []
+        with self._lock:
+            expired.extend(self._pop_idle(time.monotonic()))
+
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_size:
+                    victim = self._pop_least_recently_used()
+                    if victim is None:
+                        self._overflow += 1
+                    else:
+                        expired.append(victim)
+                if len(self._entries) < self.max_size:
+                    entry = self._entries[key] = _PoolEntry()
+
+            if entry is not None:
+                entry.checkouts += 1
+
+        for graph in expired:
+            _close_graph(graph)
+
+        return entry
+
+    def _pop_idle(self, now: float) -> list:
+        """Remove entries idle for longer than idle_timeout. Caller holds the lock."""
+        expired = []
+        for key, entry in list(self._entries.items()):
+            if entry.checkouts == 0 and now - entry.last_used > self.idle_timeout:
+                expired.append(self._entries.pop(key).graph)
+                self._evicted += 1
+        return expired
+
+    def _pop_least_recently_used(self) -> Optional[Any]:
+        """Remove the least recently used idle entry. Caller holds the lock."""
+        idle = [(entry.last_used, key) for key, entry in self._entries.items()
+                if entry.checkouts == 0]
+        if not idle:
+            return None
+        _, key = min(idle, key=lambda item: item[0])
+        self._evicted += 1
+        return self._entries.pop(key).graph
+
+    def evict_idle(self) -> int:
+        """
+        Close graphs that have been idle for longer than idle_timeout.
+
+        Returns:
+            Number of graphs closed
+        """
+        with self._lock:
+            expired = self._pop_idle(time.monotonic())
+        for graph in expired:
+            _close_graph(graph)
+        return len(expired)
+
+    def release(self, key: Hashable) -> bool:
+        """
+        Close the graph owned by `key` if it is not in use.
+
+        Args:
+            key: Stream or session identifier
+
+        Returns:
+            True if a graph was closed
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.checkouts:
+                return False
+            del self._entries[key]
+            self._evicted += 1
+        _close_graph(entry.graph)
+        return True
+
+    def close(self) -> None:
+        """Close every idle graph in the pool."""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry.checkouts == 0]
+            graphs = [self._entries.pop(key).graph for key in keys]
+        for graph in graphs:
+            _close_graph(graph)
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool size and lifetime counters."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'in_use': sum(1 for entry in self._entries.values() if entry.checkouts),
+                'max_size': self.max_size,
+                'created': self._created,
+                'evicted': self._evicted,
+                'overflow': self._overflow
+            }
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Multipart framing of the MJPEG stream (boundary=frame)
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+PART_TRAILER = b'\r\n'
+
+
+class JpegEncoder:
+    """
+    JPEG encoding stage of the MJPEG stream.
+
+    The encode parameters are built once, and frames wider than
+    `max_width` are downscaled into a buffer that is reused for every
+    frame of the same size. One encoder serves one pipeline, so the
+    buffer is never shared between threads.
+
+    Args:
+        quality: JPEG quality (0-100); OpenCV's default is 95
+        max_width: Frames wider than this are downscaled before encoding
+            (None streams at capture resolution)
+        optimize: Optimise the Huffman tables (smaller files, slower encode)
+    """
+
+    def __init__(self, quality: int = 80,
+                 max_width: Optional[int] = None,
+                 optimize: bool = False):
+        self.quality = quality
+        self.max_width = max_width
+        self.optimize = optimize
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, int(quality),
+                        cv2.IMWRITE_JPEG_OPTIMIZE, int(optimize)]
+        self._resized: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'JpegEncoder':
+        """Build the encoder from the STREAM_* app config."""
+        defaults = cls()
+        return cls(
+            quality=config.get('STREAM_JPEG_QUALITY', defaults.quality),
+            max_width=config.get('STREAM_MAX_WIDTH', defaults.max_width),
+            optimize=config.get('STREAM_JPEG_OPTIMIZE', defaults.optimize)
+        )
+
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        if not self.max_width or width <= self.max_width:
+            return frame
+        size = (self.max_width, max(1, round(height * self.max_width / width)))
+        shape = (size[1], size[0]) + frame.shape[2:]
+        if self._resized is None or self._resized.shape != shape or self._resized.dtype != frame.dtype:
+            self._resized = np.empty(shape, dtype=frame.dtype)
+        # INTER_AREA is much slower for non-integer ratios and only needed
+        # against aliasing below half size
+        interpolation = cv2.INTER_AREA if size[0] * 2 <= width else cv2.INTER_LINEAR
+        return cv2.resize(frame, size, dst=self._resized, interpolation=interpolation)
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        """Encode a frame as JPEG bytes, or None on failure."""
+        start = time.perf_counter()
+        ret, buffer = cv2.imencode('.jpg', self._downscale(frame), self._params)
+        if not ret:
+            return None
+        # The single copy of the frame; every viewer shares these bytes
+        payload = buffer.tobytes()
+        with self._lock:
+            self.frames += 1
+            self.bytes += len(payload)
+            self.seconds += time.perf_counter() - start
+        return payload
+
+    __call__ = encode
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'quality': self.quality,
+                'max_width': self.max_width,
+                'frames': self.frames,
+                'avg_kb': round(self.bytes / self.frames / 1024, 1) if self.frames else 0.0,
+                'avg_ms': round(1000 * self.seconds / self.frames, 2) if self.frames else 0.0
+            }
+
+
+class BitrateLimiter:
+    """
+    Token bucket capping the bandwidth of one viewer.
+
+    Frames that do not fit in the budget are skipped rather than delayed,
+    so a viewer on a slow link sees a lower frame rate but never falls
+    behind the camera.
+
+    Args:
+        max_kbps: Bandwidth cap in kilobits per second (None or 0: unlimited)
+        burst: Seconds of budget that may be spent at once
+    """
+
+    def __init__(self, max_kbps: Optional[float] = None, burst: float = 1.0):
+        self.rate = max_kbps * 1000 / 8 if max_kbps else None  # bytes per second
+        self.capacity = self.rate * burst if self.rate else 0.0
+        self.tokens = self.capacity
+        self.updated: Optional[float] = None
+        self.sent = 0
+        self.skipped = 0
+
+    def allow(self, size: int, now: Optional[float] = None) -> bool:
+        """Whether a frame of `size` bytes may be sent now; spends the budget if so."""
+        if self.rate is None:
+            self.sent += 1
+            return True
+        now = time.monotonic() if now is None else now
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A frame larger than the whole bucket still goes out once it is full
+        if self.tokens >= size or self.tokens >= self.capacity:
+            self.tokens -= size
+            self.sent += 1
+            return True
+        self.skipped += 1
+        return False
+
+
+def multipart_parts(jpeg: bytes) -> Tuple[bytes, bytes, bytes]:
+    """
+    The chunks of one multipart/x-mixed-replace part.
+
+    Yielded separately so the JPEG bytes are written as they are instead
+    of being copied into a concatenated part for every viewer.
+    """
+    return PART_HEADER, jpeg, PART_TRAILER
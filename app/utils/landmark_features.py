@@ -0,0 +1,219 @@
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# FaceMesh landmark indices used by the student-side detectors
+NOSE_TIP = 1
+CHIN = 175
+LEFT_EYE_OUTER = 33
+RIGHT_EYE_OUTER = 263
+LEFT_MOUTH = 61
+RIGHT_MOUTH = 291
+LEFT_PUPIL = 159
+RIGHT_PUPIL = 386
+
+# Six points per eye for the eye aspect ratio, left eye first
+EAR_POINTS = ((33, 160, 158, 133, 153, 144),
+              (362, 385, 387, 263, 373, 380))
+
+# Sixteen contour points per eye for the eye centre, left eye first
+EYE_CONTOURS = ((33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246),
+                (362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398))
+
+# Image points for head pose, in the order of HEAD_MODEL_POINTS
+HEAD_POSE_POINTS = (NOSE_TIP, CHIN, LEFT_EYE_OUTER, RIGHT_EYE_OUTER, LEFT_MOUTH, RIGHT_MOUTH)
+
+# 3D model points for head pose
+HEAD_MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),             # Nose tip
+    (0.0, -330.0, -65.0),        # Chin
+    (-225.0, 170.0, -135.0),     # Left eye left corner
+    (225.0, 170.0, -135.0),      # Right eye right corner
+    (-150.0, -150.0, -125.0),    # Left Mouth corner
+    (150.0, -150.0, -125.0)      # Right mouth corner
+])
+
+# Only these landmarks are read from MediaPipe; the index tables below
+# address rows of the compact array built from them
+FEATURE_LANDMARKS = tuple(sorted(
+    {NOSE_TIP, CHIN, LEFT_EYE_OUTER, RIGHT_EYE_OUTER, LEFT_MOUTH, RIGHT_MOUTH,
+     LEFT_PUPIL, RIGHT_PUPIL}
+    | {i for eye in EAR_POINTS for i in eye}
+    | {i for eye in EYE_CONTOURS for i in eye}))
+_ROW = {landmark: row for row, landmark in enumerate(FEATURE_LANDMARKS)}
+
+
+def _build_projection() -> np.ndarray:
+    """
+    Linear map from the feature landmarks to every linear feature.
+
+    Eye centres, gaze, the EAR point differences, face asymmetry and the
+    head-pose points are all weighted sums of landmark coordinates, so one
+    matrix product computes them together.
+    """
+    rows = []
+
+    def row(weights):
+        r = np.zeros(len(FEATURE_LANDMARKS))
+        for landmark, weight in weights.items():
+            r[_ROW[landmark]] += weight
+        rows.append(r)
+
+    # EAR differences per eye: two vertical pairs, then the horizontal pair
+    for eye in EAR_POINTS:
+        for a, b in ((eye[1], eye[5]), (eye[2], eye[4]), (eye[0], eye[3])):
+            row({a: 1.0, b: -1.0})
+    # Eye contour centres
+    for contour in EYE_CONTOURS:
+        row({i: 1.0 / len(contour) for i in contour})
+    # Gaze: mean offset of the pupils from their eye centres
+    gaze = {LEFT_PUPIL: 0.5, RIGHT_PUPIL: 0.5}
+    for contour in EYE_CONTOURS:
+        for i in contour:
+            gaze[i] = gaze.get(i, 0.0) - 0.5 / len(contour)
+    row(gaze)
+    # Asymmetry: (nose - left eye) - (right eye - nose)
+    row({NOSE_TIP: 2.0, LEFT_EYE_OUTER: -1.0, RIGHT_EYE_OUTER: -1.0})
+    # Head-pose image points
+    for landmark in HEAD_POSE_POINTS:
+        row({landmark: 1.0})
+    return np.array(rows)
+
+
+_PROJECTION = _build_projection()
+_EAR_DIFFS = slice(0, 6)
+_EYE_CENTERS = slice(6, 8)
+_GAZE = 8
+_ASYMMETRY = 9
+_POSE_POINTS = slice(10, 16)
+
+
+def landmarks_to_array(landmarks: Sequence, indices: Optional[Sequence[int]] = None,
+                       with_z: bool = True) -> np.ndarray:
+    """
+    Convert MediaPipe landmarks into an (N, 3) float32 array of x, y, z.
+
+    Reading a landmark from MediaPipe's protobuf costs far more than any
+    arithmetic on it, so each landmark is read once here and all further
+    work runs on array slices.
+
+    Args:
+        landmarks: MediaPipe landmark sequence (e.g. face_landmarks.landmark)
+        indices: Landmarks to convert, in this order (defaults to all)
+        with_z: Include the depth column; without it the array is (N, 2)
+
+    Returns:
+        Array with one row per landmark
+    """
+    selected = landmarks if indices is None else [landmarks[i] for i in indices]
+    if with_z:
+        return np.array([(lm.x, lm.y, lm.z) for lm in selected], dtype=np.float32)
+    return np.array([(lm.x, lm.y) for lm in selected], dtype=np.float32)
+
+
+def eye_aspect_ratio(eye_points: np.ndarray) -> np.ndarray:
+    """
+    Eye Aspect Ratio for one or more eyes.
+
+    Args:
+        eye_points: (..., 6, 2) array of the six EAR points per eye
+
+    Returns:
+        Array of EAR values with the leading shape of eye_points
+    """
+    distances = _pair_distances(eye_points[..., [1, 2, 0], :], eye_points[..., [5, 4, 3], :])
+    return _ear_from_distances(distances)
+
+
+def _pair_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    d = a - b
+    return np.sqrt((d * d).sum(axis=-1))
+
+
+def _ear_from_distances(distances: np.ndarray) -> np.ndarray:
+    # Two vertical eye distances over twice the horizontal eye width
+    return (distances[..., 0] + distances[..., 1]) / (2.0 * distances[..., 2])
+
+
+class LandmarkFeatures:
+    """
+    Facial features of one frame, derived from a single landmark extraction.
+
+    Built once per frame and shared by the neck-movement and looking-away
+    detectors. All linear features come out of one matrix product over the
+    landmark array; the rest are small operations on its rows.
+
+    Args:
+        points: (len(FEATURE_LANDMARKS), 2) array of normalised x, y
+        image_size: Frame (width, height) in pixels
+    """
+
+    def __init__(self, points: np.ndarray, image_size: Tuple[int, int]):
+        self.points = points
+        self.image_size = image_size
+        self._linear = _PROJECTION @ points[:, :2]
+        self._head_pose: Optional[Tuple[float, float, float]] = None
+
+    @classmethod
+    def from_landmarks(cls, landmarks: Sequence, image_size: Tuple[int, int]) -> 'LandmarkFeatures':
+        """Read the feature landmarks from a MediaPipe face."""
+        return cls(landmarks_to_array(landmarks, FEATURE_LANDMARKS, with_z=False), image_size)
+
+    def point(self, landmark: int) -> np.ndarray:
+        """Normalised (x, y) of a FaceMesh landmark index."""
+        return self.points[_ROW[landmark], :2]
+
+    @property
+    def nose(self) -> np.ndarray:
+        return self.points[_ROW[NOSE_TIP], :2]
+
+    @property
+    def ear(self) -> np.ndarray:
+        """Eye aspect ratio of the left and right eye."""
+        diffs = self._linear[_EAR_DIFFS]
+        distances = np.sqrt((diffs * diffs).sum(axis=1)).reshape(2, 3)
+        return _ear_from_distances(distances)
+
+    @property
+    def eye_centers(self) -> np.ndarray:
+        """(2, 2) centres of the left and right eye contours."""
+        return self._linear[_EYE_CENTERS]
+
+    @property
+    def gaze(self) -> np.ndarray:
+        """Mean offset of the pupils from their eye centres, as (x, y)."""
+        return self._linear[_GAZE]
+
+    @property
+    def face_asymmetry(self) -> float:
+        """Difference between the nose-to-eye distances, grows with a head turn."""
+        return abs(float(self._linear[_ASYMMETRY, 0]))
+
+    @property
+    def head_pose_image_points(self) -> np.ndarray:
+        """(6, 2) pixel coordinates matching HEAD_MODEL_POINTS."""
+        return self._linear[_POSE_POINTS] * self.image_size
+
+    def head_pose(self) -> Tuple[float, float, float]:
+        """
+        Head rotation around the x, y and z axes from solvePnP.
+
+        Returns:
+            Tuple of (x_angle, y_angle, z_angle)
+        """
+        if self._head_pose is None:
+            img_w, img_h = self.image_size
+            # Camera parameters (estimated)
+            focal_length = 1 * img_w
+            cam_matrix = np.array([[focal_length, 0, img_h / 2],
+                                   [0, focal_length, img_w / 2],
+                                   [0, 0, 1]])
+            dist_matrix = np.zeros((4, 1), dtype=np.float64)
+
+            _, rot_vec, _ = cv2.solvePnP(HEAD_MODEL_POINTS, self.head_pose_image_points,
+                                         cam_matrix, dist_matrix)
+            rmat, _ = cv2.Rodrigues(rot_vec)
+            angles = cv2.RQDecomp3x3(rmat)[0]
+            self._head_pose = (angles[0] * 360, angles[1] * 360, angles[2] * 360)
+        return self._head_pose
@@ -0,0 +1,114 @@
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.utils.detection_scheduler import motion_score
+from app.utils.frame_context import FrameContext
+
+# Defaults for PROCTORING_THRESHOLDS['STATIC_FRAME_THRESHOLD'] / ['MAX_SKIPPED_FRAMES']
+STATIC_FRAME_THRESHOLD = 0.005
+MAX_SKIPPED_FRAMES = 30
+
+# Totals over every gate, for the pipeline stats
+_totals = {'frames': 0, 'skipped': 0}
+_totals_lock = threading.Lock()
+
+
+class MotionGate:
+    """
+    Skip the detectors on frames that have not changed since the last analysis.
+
+    Each frame's thumbnail is compared with the thumbnail of the last
+    *analysed* frame rather than the previous one, so slow drift still
+    adds up to a change and triggers analysis. While the difference stays
+    below the threshold the caller reuses the stored result. Analysis is
+    forced after max_skip skipped frames in a row, so a stored result
+    never gets older than that.
+
+    Args:
+        threshold: Motion score (0-1) below which a frame counts as unchanged
+        max_skip: Consecutive frames that may be skipped before a refresh
+    """
+
+    def __init__(self, threshold: float = STATIC_FRAME_THRESHOLD,
+                 max_skip: int = MAX_SKIPPED_FRAMES):
+        self.threshold = threshold
+        self.max_skip = max(0, int(max_skip))
+        self.result: Any = None
+        self._lock = threading.Lock()
+        self._reference: Optional[np.ndarray] = None
+        self._pending: Optional[np.ndarray] = None
+        self._skipped_in_row = 0
+        self.frames = 0
+        self.skipped = 0
+
+    def should_analyze(self, context: FrameContext) -> bool:
+        """
+        Decide whether the frame needs a fresh analysis.
+
+        Returns False only when a stored result exists and the frame is
+        within the threshold of the frame that produced it.
+
+        Args:
+            context: Per-frame analysis context
+
+        Returns:
+            True if the detectors should run on this frame
+        """
+        thumbnail = context.thumbnail
+        with self._lock:
+            self.frames += 1
+            unchanged = (self.result is not None
+                         and self._reference is not None
+                         and self._reference.shape == thumbnail.shape
+                         and self._skipped_in_row < self.max_skip
+                         and motion_score(self._reference, thumbnail) < self.threshold)
+            if unchanged:
+                self._skipped_in_row += 1
+                self.skipped += 1
+            else:
+                # Becomes the reference once store() has its result
+                self._skipped_in_row = 0
+                self._pending = thumbnail
+        with _totals_lock:
+            _totals['frames'] += 1
+            _totals['skipped'] += unchanged
+        return not unchanged
+
+    def store(self, result: Any) -> None:
+        """Keep the result of the frame just analysed for reuse."""
+        with self._lock:
+            self._reference = self._pending
+            self.result = result
+
+    def reset(self) -> None:
+        """Forget the stored result, so the next frame is analysed."""
+        with self._lock:
+            self._reference = self._pending = None
+            self.result = None
+            self._skipped_in_row = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'skipped': self.skipped,
+                'skip_ratio': round(self.skip_ratio, 4),
+                'threshold': self.threshold
+            }
+
+
+def gate_stats() -> Dict[str, Any]:
+    """Frames seen and skipped by all motion gates together."""
+    with _totals_lock:
+        frames, skipped = _totals['frames'], _totals['skipped']
+    return {
+        'frames': frames,
+        'skipped': skipped,
+        'skip_ratio': round(skipped / frames, 4) if frames else 0.0
+    }
@@ -0,0 +1,81 @@
+import math
+from typing import Optional
+
+import numpy as np
+
+
+class MovementHistory:
+    """
+    Fixed-size ring buffer of head positions with a running movement average.
+
+    Positions live in a preallocated (capacity, 2) array, and the distance
+    between consecutive positions is stored alongside. The sum of the
+    distances in the window is updated incrementally: the newest distance
+    is added and the one leaving the window subtracted, so recording a
+    position costs the same for any history length. The sum is recomputed
+    from the buffer once per wrap to keep floating-point drift bounded.
+
+    Args:
+        capacity: Number of positions kept (at least 1)
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self._positions = np.zeros((self.capacity, 2), dtype=np.float64)
+        # One distance per pair of consecutive positions in the window
+        self._deltas = np.zeros(max(1, self.capacity - 1), dtype=np.float64)
+        self._count = 0
+        self._head = 0          # index of the next position slot
+        self._delta_count = 0
+        self._delta_head = 0
+        self._delta_sum = 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last(self) -> Optional[np.ndarray]:
+        """Most recent position, or None if the history is empty."""
+        if self._count == 0:
+            return None
+        return self._positions[(self._head - 1) % self.capacity]
+
+    def append(self, x: float, y: float) -> None:
+        """Record a position, evicting the oldest one when full."""
+        if self._count > 0 and self.capacity > 1:
+            last = self._positions[(self._head - 1) % self.capacity]
+            self._push_delta(math.hypot(x - last[0], y - last[1]))
+
+        self._positions[self._head, 0] = x
+        self._positions[self._head, 1] = y
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _push_delta(self, delta: float) -> None:
+        size = len(self._deltas)
+        if self._delta_count == size:
+            self._delta_sum -= self._deltas[self._delta_head]
+        else:
+            self._delta_count += 1
+        self._deltas[self._delta_head] = delta
+        self._delta_sum += delta
+        self._delta_head = (self._delta_head + 1) % size
+        if self._delta_head == 0:
+            self._delta_sum = float(self._deltas[:self._delta_count].sum())
+
+    def mean_movement(self) -> Optional[float]:
+        """Mean distance between consecutive positions, or None with fewer than two."""
+        if self._delta_count == 0:
+            return None
+        return max(0.0, self._delta_sum) / self._delta_count
+
+    def positions(self) -> np.ndarray:
+        """Positions in the window, oldest first (a copy)."""
+        if self._count < self.capacity:
+            return self._positions[:self._count].copy()
+        return np.roll(self._positions, -self._head, axis=0)
+
+    def clear(self) -> None:
+        self._count = self._head = 0
+        self._delta_count = self._delta_head = 0
+        self._delta_sum = 0.0
@@ -1,118 +1,190 @@
+import math
 import mediapipe as mp
 import cv2
 import numpy as np
-from typing import Tuple, Dict, Any, Optional, List
+from typing import Tuple, Dict, Any, Optional, List, Hashable
+
+from app.utils.frame_context import FrameContext, ensure_context
+from app.utils.graph_pool import GraphPool
+from app.utils.proctor_session import DEFAULT_SESSION_KEY, ProctorSession, get_session
 
 mp_face_mesh = mp.solutions.face_mesh
 mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 
-# Store the last known landmarks for movement detection
-last_landmarks = None
-previous_positions = []
-MAX_POSITION_HISTORY = 5  # Store last 5 positions for smoother movement detection
+
+# FaceMesh graphs are kept alive per stream so the model is loaded once and
+# MediaPipe can track the face between frames instead of re-detecting it
+FACE_MESH_POOL_SIZE = 8
+FACE_MESH_IDLE_TIMEOUT = 300.0  # seconds
+
+def _create_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=1,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5)
+
+face_mesh_pool = GraphPool(_create_face_mesh,
+                           max_size=FACE_MESH_POOL_SIZE,
+                           idle_timeout=FACE_MESH_IDLE_TIMEOUT)
+
+# Frames of no particular stream share a graph in static-image mode, which
+# detects the face anew every time and keeps no tracking state between them
+STATIC_FACE_MESH_KEY = 'static'
+
+def _create_static_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        static_image_mode=True,
+        max_num_faces=1,
+        min_detection_confidence=0.5)
+
+static_face_mesh_pool = GraphPool(_create_static_face_mesh,
+                                  max_size=1,
+                                  idle_timeout=FACE_MESH_IDLE_TIMEOUT)
 
 def detect_neck_movement(frame: np.ndarray, 
-                         threshold: float = 0.35) -> Tuple[bool, float]:
+                         threshold: float = 0.35,
+                         stream_key: Optional[Hashable] = None,
+                         context: Optional[FrameContext] = None,
+                         session: Optional[ProctorSession] = None) -> Tuple[bool, float]:
     """
     Detect excessive neck/head movement using facial landmarks.
     
     Args:
         frame: Input camera frame as numpy array
         threshold: Movement threshold value
+        stream_key: Identifier of the video stream, selects the pooled FaceMesh
+            (defaults to the key of `session`, or the default session's)
+        context: Shared per-frame analysis context (optional)
+        session: Proctoring state holding the position history (defaults
+            to the session registered under stream_key)
         
     Returns:
         Tuple containing (movement_detected, movement_ratio)
     """
-    global last_landmarks, previous_positions
+    context = ensure_context(frame, context)
+    if stream_key is None:
+        # The FaceMesh tracks the same stream as the position history
+        stream_key = session.key if session is not None else DEFAULT_SESSION_KEY
+    session = get_session(session, stream_key)
     
-    with mp_face_mesh.FaceMesh(
-        static_image_mode=False,
-        max_num_faces=1,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5) as face_mesh:
-        
-        # Convert to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
-        
-        if not results.multi_face_landmarks:
-            return False, 0.0
-        
-        landmarks = results.multi_face_landmarks[0].landmark
-        
-        # Get key facial landmarks for movement detection
-        # Nose tip
-        nose = landmarks[4]
-        # Left and right ear
-        left_ear = landmarks[127]
-        right_ear = landmarks[356]
-        # Chin
-        chin = landmarks[152]
-        
-        # Calculate horizontal movement ratio
-        horizontal_ratio = abs(left_ear.x - right_ear.x)
+    # Landmarks may already be on the context, e.g. from an analysis worker
+    current_pos = context.cached('head_position',
+                                 lambda: extract_head_position(frame, stream_key, context))
+    if current_pos is None:
+        return False, 0.0
+    
+    return update_neck_movement(current_pos, threshold, session)
+
+def extract_head_position(frame: np.ndarray,
+                          stream_key: Optional[Hashable] = None,
+                          context: Optional[FrameContext] = None) -> Optional[Dict[str, float]]:
+    """
+    Run FaceMesh and extract the landmark positions used for movement detection.
+    
+    This step holds no proctoring state, so it can run in a worker process.
+    
+    Args:
+        frame: Input camera frame as numpy array
+        stream_key: Identifier of the video stream, selects the pooled FaceMesh;
+            None uses the shared static-image graph
+        context: Shared per-frame analysis context (optional)
         
-        # Calculate vertical movement (head tilt)
-        vertical_ratio = abs(nose.y - chin.y)
+    Returns:
+        Dictionary of landmark coordinates and ratios, or None if no face was found
+    """
+    context = ensure_context(frame, context)
+    
+    if stream_key is None:
+        checkout = static_face_mesh_pool.checkout(STATIC_FACE_MESH_KEY)
+    else:
+        checkout = face_mesh_pool.checkout(stream_key)
+    with checkout as face_mesh:
+        # RGB conversion is shared with any other stage that needs it
+        results = face_mesh.process(context.rgb)
+    
+    if not results.multi_face_landmarks:
+        return None
+    
+    landmarks = results.multi_face_landmarks[0].landmark
+    
+    # Get key facial landmarks for movement detection
+    # Nose tip
+    nose = landmarks[4]
+    # Left and right ear
+    left_ear = landmarks[127]
+    right_ear = landmarks[356]
+    # Chin
+    chin = landmarks[152]
+    
+    return {
+        'nose_x': nose.x,
+        'nose_y': nose.y,
+        'left_ear_x': left_ear.x,
+        'right_ear_x': right_ear.x,
+        'chin_y': chin.y,
+        # Horizontal movement ratio
+        'horizontal_ratio': abs(left_ear.x - right_ear.x),
+        # Vertical movement (head tilt)
+        'vertical_ratio': abs(nose.y - chin.y)
+    }
+
+def update_neck_movement(current_pos: Dict[str, float],
+                         threshold: float,
+                         session: ProctorSession) -> Tuple[bool, float]:
+    """
+    Compare a head position with the session's history and record it.
+    
+    Args:
+        current_pos: Head position from extract_head_position
+        threshold: Movement threshold value
+        session: Proctoring state holding the position history
         
-        # Get current position data
-        current_pos = {
-            'nose_x': nose.x,
-            'nose_y': nose.y,
-            'left_ear_x': left_ear.x,
-            'right_ear_x': right_ear.x,
-            'chin_y': chin.y,
-            'horizontal_ratio': horizontal_ratio,
-            'vertical_ratio': vertical_ratio
-        }
+    Returns:
+        Tuple containing (movement_detected, movement_ratio)
+    """
+    with session.lock:
+        last_landmarks = session.last_landmarks
         
         # Check for movement based on position history
         movement_ratio = 0.0
         if last_landmarks is not None:
             # Calculate movement from last position
             nose_movement = calculate_distance(
-                (nose.x, nose.y), 
+                (current_pos['nose_x'], current_pos['nose_y']), 
                 (last_landmarks['nose_x'], last_landmarks['nose_y'])
             )
             
             # Ear position change (side-to-side movement)
-            ear_distance_change = abs(horizontal_ratio - last_landmarks['horizontal_ratio'])
+            ear_distance_change = abs(current_pos['horizontal_ratio'] - last_landmarks['horizontal_ratio'])
             
             # Vertical position change (up-down movement)
-            vertical_change = abs(vertical_ratio - last_landmarks['vertical_ratio'])
+            vertical_change = abs(current_pos['vertical_ratio'] - last_landmarks['vertical_ratio'])
             
             # Combined movement score - weighted for different types of movement
             movement_ratio = (nose_movement * 3.0 + ear_distance_change * 2.0 + vertical_change * 2.0) / 7.0
         
-        # Update position history
-        previous_positions.append(current_pos)
-        if len(previous_positions) > MAX_POSITION_HISTORY:
-            previous_positions.pop(0)
-            
-        # Use the average of recent positions for smoother detection
-        last_landmarks = current_pos
+        # Update the nose position ring buffer, which keeps the mean
+        # frame-to-frame movement over the window up to date
+        session.previous_positions.append(current_pos['nose_x'], current_pos['nose_y'])
+        session.last_landmarks = current_pos
         
-        # Calculate average movement over the last few frames
+        # Use the average movement over the last few frames for smoother detection
         avg_movement = movement_ratio
-        if len(previous_positions) > 1:
-            movements = []
-            for i in range(1, len(previous_positions)):
-                prev = previous_positions[i-1]
-                curr = previous_positions[i]
-                m = calculate_distance((curr['nose_x'], curr['nose_y']), (prev['nose_x'], prev['nose_y']))
-                movements.append(m)
-            if movements:
-                avg_movement = (sum(movements) / len(movements) + movement_ratio) / 2
-        
-        # Detect movement based on threshold
-        movement_detected = avg_movement > threshold
-        
-        return movement_detected, avg_movement
+        mean_movement = session.previous_positions.mean_movement()
+        if mean_movement is not None:
+            avg_movement = (mean_movement + movement_ratio) / 2
+    
+    # Detect movement based on threshold; plain Python types so callers
+    # can serialise the result
+    movement_detected = bool(avg_movement > threshold)
+    
+    return movement_detected, float(avg_movement)
 
 def calculate_distance(point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
     """Calculate Euclidean distance between two 2D points."""
-    return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+    return math.hypot(point1[0] - point2[0], point1[1] - point2[1])
 
 def estimate_head_pose(landmarks: List) -> Tuple[float, float, float]:
     """
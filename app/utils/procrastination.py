@@ -0,0 +1,329 @@
+import json
+import logging
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from app.utils.violation_buffer import get_violation_buffer
+from app.utils.violation_timeline import VIOLATION_TYPES
+from app.utils.warning_counter import get_warning_counter
+
+logger = logging.getLogger(__name__)
+
+# Warnings after which the exam is auto-submitted
+MAX_WARNINGS = 20
+
+# Client flags that are violations whenever they are set
+BROWSER_FLAGS = ('tabSwitched', 'windowFocusLost')
+INPUT_FLAGS = ('copyAttempt', 'pasteAttempt', 'textSelectionAttempt', 'suspiciousKeys')
+
+
+def has_violation_flags(data: Dict[str, Any]) -> bool:
+    """
+    Whether a procrastination poll reports anything check_violations would flag.
+
+    Mirrors the conditions of check_violations: no face, a blocked camera,
+    several faces, looking left or right, or any browser or input flag.
+    Payloads it cannot read are treated as flagged, so the full check
+    handles them.
+    """
+    try:
+        face_data = data.get('faceData') or {}
+        num_faces = face_data.get('numFaces', 0)
+        if (num_faces == 0 or num_faces > 1 or face_data.get('cameraBlocked', False)
+                or face_data.get('poseDirection', 'unknown') in ('left', 'right')):
+            return True
+        browser_data = data.get('browserData') or {}
+        input_data = data.get('inputData') or {}
+        return (any(browser_data.get(flag, False) for flag in BROWSER_FLAGS)
+                or any(input_data.get(flag, False) for flag in INPUT_FLAGS))
+    except (AttributeError, TypeError):
+        return True
+
+
+@lru_cache(maxsize=MAX_WARNINGS)
+def _clean_result(warning_count: int) -> Dict[str, Any]:
+    return {
+        'autoSubmit': False,
+        'maxWarnings': MAX_WARNINGS,
+        'message': 'No violations detected',
+        'success': True,
+        'violations': [],
+        'warningCount': warning_count
+    }
+
+
+@lru_cache(maxsize=MAX_WARNINGS)
+def _clean_response_body(warning_count: int) -> bytes:
+    return json.dumps(_clean_result(warning_count), separators=(',', ':')).encode()
+
+
+def clean_poll_result(user_id: Any, exam_id: Any, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Fast path for a poll without violations.
+
+    Most polls are clean, and their response differs only in the warning
+    count. It comes from the warning counter's cache, so the database is
+    read at most once per student and cache_ttl, and the response is built
+    once per count. Nothing is logged or stored.
+
+    Args:
+        user_id: Student's user ID
+        exam_id: Exam ID
+        data: Poll payload
+
+    Returns:
+        Shared response dictionary, not to be modified, or None when the
+        poll needs check_violations
+    """
+    if has_violation_flags(data):
+        return None
+    try:
+        warning_count = get_warning_counter().get(user_id, exam_id)
+    except Exception as e:
+        logger.error(f"Error getting warning count: {str(e)}")
+        return None
+    if warning_count >= MAX_WARNINGS:
+        # Every poll past the limit repeats the auto-submit command
+        return None
+    return _clean_result(warning_count)
+
+
+def clean_poll_response(user_id: Any, exam_id: Any, data: Dict[str, Any]) -> Optional[bytes]:
+    """clean_poll_result as a prebuilt JSON response body."""
+    result = clean_poll_result(user_id, exam_id, data)
+    return None if result is None else _clean_response_body(result['warningCount'])
+
+
+def record_reported_violation(user_id: Any, exam_id: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queue a violation reported by the advanced proctoring client.
+
+    The client has already counted it, so only its report is stored, with
+    the server time for the timeline.
+
+    Args:
+        user_id: Student's user ID
+        exam_id: Exam ID
+        data: Report with violation_type, message, timestamp and warning_count
+
+    Returns:
+        History entry for the report, as the client sent it
+    """
+    entry = {
+        'type': data.get('violation_type'),
+        'message': data.get('message'),
+        'timestamp': data.get('timestamp'),
+        'warning_count': data.get('warning_count', 0)
+    }
+    get_violation_buffer().add({
+        'user_id': user_id,
+        'exam_id': exam_id,
+        'violations': [{'type': entry['type'], 'message': entry['message'] or '',
+                        'severity': data.get('severity') or VIOLATION_TYPES.get(entry['type'], (None, 'MEDIUM'))[1],
+                        'timestamp': time.time()}],
+        'warning_count': entry['warning_count'],
+        'timestamp': datetime.utcnow(),
+        'auto_submit_triggered': False
+    })
+    return entry
+
+
+def _warning_count(user_id: Any, exam_id: Any) -> int:
+    try:
+        return get_warning_counter().get(user_id, exam_id)
+    except Exception as e:
+        logger.error(f"Error getting warning count: {str(e)}")
+        return 0
+
+
+def check_violations(user_id: Any, exam_id: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evaluate a procrastination poll: flag violations, count a warning,
+    queue the record and build the response.
+
+    Args:
+        user_id: Student's user ID
+        exam_id: Exam ID
+        data: Poll payload with faceData, browserData and inputData
+
+    Returns:
+        Response dictionary for the client
+    """
+    current_time = time.time()
+
+    # Get current warning count
+    current_warnings = _warning_count(user_id, exam_id)
+
+    # Log incoming violation data for debugging
+    total_violations_reported = data.get('totalViolations', 0)
+    logger.info(f"🚨 Procrastination Check - User: {user_id}, Exam: {exam_id}")
+    logger.info(f"📊 Current warnings: {current_warnings}/20")
+    logger.info(f"📊 Total violations reported: {total_violations_reported}")
+    logger.info(f"📊 Face data: {data.get('faceData', {})}")
+    logger.info(f"📊 Browser data: {data.get('browserData', {})}")
+    logger.info(f"📊 Input data: {data.get('inputData', {})}")
+
+    # Initialize violation flags
+    violations = []
+    should_increment_warning = False
+    auto_submit = False
+
+    # 1. FACE DETECTION VIOLATIONS
+    face_data = data.get('faceData', {})
+    num_faces = face_data.get('numFaces', 0)
+    pose_direction = face_data.get('poseDirection', 'unknown')
+    camera_blocked = face_data.get('cameraBlocked', False)
+
+    logger.info(f"🔍 Face Detection Check: faces={num_faces}, pose={pose_direction}, blocked={camera_blocked}")
+
+    # No face detected
+    if num_faces == 0 or camera_blocked:
+        violations.append({
+            'type': 'CAMERA_ISSUE',
+            'message': 'No face detected or camera blocked',
+            'severity': 'HIGH',
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+        logger.info("⚠️ VIOLATION: No face detected - incrementing warning")
+
+    # Multiple faces detected
+    elif num_faces > 1:
+        violations.append({
+            'type': 'MULTIPLE_FACES',
+            'message': f'{num_faces} faces detected - only one person allowed',
+            'severity': 'HIGH',
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+        logger.info(f"⚠️ VIOLATION: {num_faces} faces detected - incrementing warning")
+
+    # Looking away detection (only left/right) - MOST COMMON VIOLATION
+    elif pose_direction in ['left', 'right']:
+        violations.append({
+            'type': 'LOOKING_AWAY',
+            'message': f'Looking {pose_direction} - please focus on exam',
+            'severity': 'HIGH',  # Changed to HIGH for better counting
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+        logger.info(f"⚠️ VIOLATION: Looking {pose_direction} - incrementing warning")
+
+    # 2. BROWSER ACTIVITY VIOLATIONS
+    browser_data = data.get('browserData', {})
+
+    # Tab switching detection
+    if browser_data.get('tabSwitched', False):
+        violations.append({
+            'type': 'TAB_SWITCH',
+            'message': 'Tab switching detected',
+            'severity': 'HIGH',
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+
+    # Window focus lost
+    if browser_data.get('windowFocusLost', False):
+        violations.append({
+            'type': 'WINDOW_FOCUS',
+            'message': 'Window focus lost',
+            'severity': 'MEDIUM',
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+
+    # 3. INPUT ACTIVITY VIOLATIONS
+    input_data = data.get('inputData', {})
+
+    # Copy/paste detection
+    if input_data.get('copyAttempt', False):
+        violations.append({
+            'type': 'COPY_ATTEMPT',
+            'message': 'Copy operation blocked',
+            'severity': 'HIGH',
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+
+    if input_data.get('pasteAttempt', False):
+        violations.append({
+            'type': 'PASTE_ATTEMPT',
+            'message': 'Paste operation blocked',
+            'severity': 'HIGH',
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+
+    # Text selection blocking
+    if input_data.get('textSelectionAttempt', False):
+        violations.append({
+            'type': 'TEXT_SELECTION',
+            'message': 'Text selection blocked',
+            'severity': 'MEDIUM',
+            'timestamp': current_time
+        })
+        should_increment_warning = True  # NOW COUNT text selection as violation
+
+    # Suspicious key combinations
+    if input_data.get('suspiciousKeys', False):
+        violations.append({
+            'type': 'SUSPICIOUS_KEYS',
+            'message': 'Suspicious key combination detected',
+            'severity': 'MEDIUM',
+            'timestamp': current_time
+        })
+        should_increment_warning = True
+
+    # 4. WARNING MANAGEMENT
+    new_warning_count = current_warnings
+    if should_increment_warning:
+        logger.info(f"🚨 INCREMENTING WARNING: Current={current_warnings}, Violations={len(violations)}")
+        new_warning_count = get_warning_counter().increment(user_id, exam_id)
+        logger.info(f"🚨 NEW WARNING COUNT: {new_warning_count}/20")
+
+    # 5. AUTO-SUBMIT CHECK (20 warnings threshold)
+    if new_warning_count >= MAX_WARNINGS:
+        auto_submit = True
+        violations.append({
+            'type': 'AUTO_SUBMIT',
+            'message': f'Maximum warnings reached ({new_warning_count}/20) - Auto-submitting exam',
+            'severity': 'CRITICAL',
+            'timestamp': current_time
+        })
+
+    # 6. STORE VIOLATIONS IN DATABASE (batched in the background)
+    if violations:
+        violation_record = {
+            'user_id': user_id,
+            'exam_id': exam_id,
+            'violations': violations,
+            'warning_count': new_warning_count,
+            'timestamp': datetime.utcnow(),
+            'auto_submit_triggered': auto_submit
+        }
+        get_violation_buffer().add(violation_record)
+
+    # 7. PREPARE RESPONSE
+    response_data = {
+        'success': True,
+        'violations': violations,
+        'warningCount': new_warning_count,
+        'maxWarnings': MAX_WARNINGS,
+        'autoSubmit': auto_submit,
+        'message': f'Violations detected: {len(violations)}' if violations else 'No violations detected'
+    }
+
+    logger.info(f"📤 RESPONSE DATA: {response_data}")
+    logger.info(f"📊 Final Warning Count: {new_warning_count}/20")
+
+    # Add specific messages for different violation types
+    if auto_submit:
+        response_data['autoSubmitMessage'] = 'Maximum violations reached. Exam will be auto-submitted.'
+    elif violations:
+        high_severity_violations = [v for v in violations if v['severity'] == 'HIGH']
+        if high_severity_violations:
+            response_data['alertMessage'] = f"Warning {new_warning_count}/20: {high_severity_violations[0]['message']}"
+
+    return response_data
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Optional
+
+from app.utils.face_tracker import FACE_TRACK_REFRESH, FaceTracker
+from app.utils.motion_gate import MAX_SKIPPED_FRAMES, STATIC_FRAME_THRESHOLD, MotionGate
+from app.utils.movement_history import MovementHistory
+
+# Activity types tracked for every proctored stream
+ACTIVITY_TYPES = ('neck_movement', 'multiple_people', 'absence')
+
+# Ring buffer sizes, so memory stays flat over a long exam
+ACTIVITY_LOG_SIZE = 1024       # warning timestamps kept per activity type
+POSITION_HISTORY_SIZE = 5      # head positions kept for movement smoothing
+
+DEFAULT_SESSION_KEY = 'default'
+
+
+def session_key(student_id: Any, exam_id: Any) -> str:
+    """Build the registry key of a student's session in an exam."""
+    return f"{student_id}:{exam_id}"
+
+
+class ProctorSession:
+    """
+    Proctoring state of one stream: one student in one exam, or one camera.
+
+    Holds the continuous activity timers, a bounded log of warning
+    timestamps, the head-position history used for movement detection, the
+    face tracker that follows face boxes between full scans and the motion
+    gate that lets unchanged frames reuse the last analysis.
+    Every stream gets its own instance, so concurrent streams never share
+    a state machine.
+
+    Args:
+        key: Registry key of the session
+        log_size: Warning timestamps kept per activity type
+        position_history: Head positions kept for movement smoothing
+        static_threshold: Motion score below which a frame reuses the last analysis
+        max_skipped_frames: Unchanged frames in a row that may skip analysis
+        face_track_refresh: Frames between full-frame face scans
+    """
+
+    def __init__(self, key: Hashable,
+                 log_size: int = ACTIVITY_LOG_SIZE,
+                 position_history: int = POSITION_HISTORY_SIZE,
+                 static_threshold: float = STATIC_FRAME_THRESHOLD,
+                 max_skipped_frames: int = MAX_SKIPPED_FRAMES,
+                 face_track_refresh: int = FACE_TRACK_REFRESH):
+        self.key = key
+        self.lock = threading.RLock()
+        self.created_at = time.time()
+        self.last_seen = time.monotonic()
+
+        self.continuous_tracking = {
+            activity: {'start_time': None, 'duration': 0, 'is_active': False}
+            for activity in ACTIVITY_TYPES
+        }
+        self.activity_log = {activity: deque(maxlen=log_size) for activity in ACTIVITY_TYPES}
+        self.last_detection_time = time.time()
+
+        self.last_landmarks: Optional[Dict[str, float]] = None
+        self.previous_positions = MovementHistory(position_history)
+        self.motion_gate = MotionGate(static_threshold, max_skipped_frames)
+        self.face_tracker = FaceTracker(face_track_refresh)
+
+    def touch(self) -> None:
+        self.last_seen = time.monotonic()
+
+    def is_alert_building(self) -> bool:
+        """True if any activity has started, whether or not it reached its threshold."""
+        return any(tracking['start_time'] is not None
+                   for tracking in self.continuous_tracking.values())
+
+
+class SessionRegistry:
+    """
+    Thread-safe registry of ProctorSession objects with TTL eviction.
+
+    Sessions not used for `ttl` seconds are dropped on the next lookup, and
+    the least recently used session is dropped when `max_sessions` is
+    reached.
+
+    Args:
+        ttl: Seconds of inactivity before a session is evicted
+        max_sessions: Maximum number of live sessions
+        sweep_interval: Minimum seconds between expiry sweeps
+        position_history: Head positions kept per new session
+        static_threshold: Motion gate threshold of new sessions
+        max_skipped_frames: Motion gate skip limit of new sessions
+        face_track_refresh: Full face scan interval of new sessions
+    """
+
+    def __init__(self, ttl: float = 3 * 60 * 60,
+                 max_sessions: int = 1000,
+                 sweep_interval: float = 30.0,
+                 position_history: int = POSITION_HISTORY_SIZE,
+                 static_threshold: float = STATIC_FRAME_THRESHOLD,
+                 max_skipped_frames: int = MAX_SKIPPED_FRAMES,
+                 face_track_refresh: int = FACE_TRACK_REFRESH):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.position_history = position_history
+        self.static_threshold = static_threshold
+        self.max_skipped_frames = max_skipped_frames
+        self.face_track_refresh = face_track_refresh
+        self._sessions: 'OrderedDict[Hashable, ProctorSession]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.evicted = 0
+
+    def get(self, key: Hashable = DEFAULT_SESSION_KEY) -> ProctorSession:
+        """Return the session for `key`, creating it on first use."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+
+            session = self._sessions.get(key)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+                session = ProctorSession(key, position_history=self.position_history,
+                                         static_threshold=self.static_threshold,
+                                         max_skipped_frames=self.max_skipped_frames,
+                                         face_track_refresh=self.face_track_refresh)
+                self._sessions[key] = session
+            else:
+                self._sessions.move_to_end(key)
+            session.touch()
+            return session
+
+    def peek(self, key: Hashable) -> Optional[ProctorSession]:
+        """Return the session for `key` without creating or refreshing it."""
+        with self._lock:
+            return self._sessions.get(key)
+
+    def drop(self, key: Hashable) -> bool:
+        """Forget the session for `key`, e.g. after the exam is submitted."""
+        with self._lock:
+            return self._sessions.pop(key, None) is not None
+
+    def _sweep(self, now: float) -> None:
+        """Evict expired sessions. Caller holds the lock."""
+        self._last_sweep = now
+        for key, session in list(self._sessions.items()):
+            if now - session.last_seen > self.ttl:
+                del self._sessions[key]
+                self.evicted += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'ttl': self.ttl,
+                'evicted': self.evicted
+            }
+
+
+# Shared registry used by the proctoring utilities and routes
+proctor_sessions = SessionRegistry()
+
+
+def get_session(session: Optional[ProctorSession] = None,
+                key: Hashable = DEFAULT_SESSION_KEY) -> ProctorSession:
+    """Return `session` if given, otherwise the registry session for `key`."""
+    return session if session is not None else proctor_sessions.get(key)
@@ -0,0 +1,256 @@
+import queue
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Generator, List, Optional
+
+import cv2
+import numpy as np
+
+# Pipelines currently streaming, for the stats endpoint
+_active_pipelines = weakref.WeakSet()
+
+
+class DropOldestQueue:
+    """
+    Bounded queue that discards its oldest item instead of blocking the producer.
+
+    Args:
+        maxsize: Maximum number of queued items
+    """
+
+    def __init__(self, maxsize: int = 1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.maxsize = maxsize
+        self.dropped = 0
+
+    def put(self, item: Any) -> None:
+        """Enqueue `item`, dropping the oldest entry when full."""
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Dequeue an item, raising queue.Empty after `timeout` seconds."""
+        return self._queue.get(timeout=timeout)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+class StageStats:
+    """Thread-safe latency counters for one pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'count': self.count,
+                'avg_ms': round(1000 * self.total / self.count, 2) if self.count else 0.0,
+                'last_ms': round(1000 * self.last, 2),
+                'max_ms': round(1000 * self.max, 2)
+            }
+
+
+def encode_jpeg(frame: np.ndarray) -> Optional[bytes]:
+    """Encode a frame as JPEG bytes, or None on failure."""
+    ret, buffer = cv2.imencode('.jpg', frame)
+    return buffer.tobytes() if ret else None
+
+
+class FramePipeline:
+    """
+    Threaded capture -> analysis -> encode pipeline for MJPEG streaming.
+
+    The capture thread reads frames at camera rate and feeds two bounded
+    queues. The analysis worker always takes the latest frame (older ones are
+    dropped) and publishes its metadata; the encoder annotates every captured
+    frame with the most recent metadata and JPEG-encodes it. A slow analysis
+    step therefore lowers detection rate, not stream FPS.
+
+    Args:
+        camera: cv2.VideoCapture-like object with read() and release()
+        analyze: Callable returning detection metadata for a frame
+        render: Callable drawing metadata onto a frame and returning it
+        on_read_error: Callable returning a placeholder frame when reads fail
+        encode: Callable turning a frame into JPEG bytes
+        sink: Callable receiving each encoded frame; defaults to the
+            pipeline's own output queue read by frames()
+        queue_size: Depth of the encode and output queues
+        retry_delay: Seconds to wait after a failed camera read
+        name: Label used in stats
+        extra_stats: Callable adding analysis-specific fields to stats()
+    """
+
+    def __init__(self, camera: Any,
+                 analyze: Callable[[np.ndarray], Dict[str, Any]],
+                 render: Callable[[np.ndarray, Dict[str, Any]], np.ndarray],
+                 on_read_error: Optional[Callable[[], np.ndarray]] = None,
+                 encode: Callable[[np.ndarray], Optional[bytes]] = encode_jpeg,
+                 sink: Optional[Callable[[bytes], None]] = None,
+                 queue_size: int = 2,
+                 retry_delay: float = 1.0,
+                 name: str = 'camera',
+                 extra_stats: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.camera = camera
+        self.analyze = analyze
+        self.render = render
+        self.on_read_error = on_read_error
+        self.encode = encode
+        self.retry_delay = retry_delay
+        self.name = name
+        self.extra_stats = extra_stats
+
+        self.analysis_queue = DropOldestQueue(1)
+        self.encode_queue = DropOldestQueue(queue_size)
+        self.output_queue = DropOldestQueue(queue_size)
+        self.sink = sink if sink is not None else self.output_queue.put
+
+        self.capture_stats = StageStats()
+        self.analysis_stats = StageStats()
+        self.encode_stats = StageStats()
+
+        self._metadata: Dict[str, Any] = {}
+        self._metadata_lock = threading.Lock()
+        self._running = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Most recent analysis metadata."""
+        with self._metadata_lock:
+            return self._metadata
+
+    def start(self) -> None:
+        """Start the capture, analysis and encoder threads."""
+        if self._running.is_set():
+            return
+        self._running.set()
+        for target, label in ((self._capture_loop, 'capture'),
+                              (self._analysis_loop, 'analysis'),
+                              (self._encode_loop, 'encode')):
+            thread = threading.Thread(target=target, name=f"{self.name}-{label}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        _active_pipelines.add(self)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop all stages and release the camera."""
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        _active_pipelines.discard(self)
+        try:
+            self.camera.release()
+        except Exception as e:
+            print(f"Error releasing camera: {e}")
+
+    def _capture_loop(self) -> None:
+        while self._running.is_set():
+            start = time.perf_counter()
+            success, frame = self.camera.read()
+            if not success:
+                if self.on_read_error is not None:
+                    self.encode_queue.put((self.on_read_error(), False))
+                time.sleep(self.retry_delay)
+                continue
+            self.capture_stats.record(time.perf_counter() - start)
+            self.analysis_queue.put(frame)
+            self.encode_queue.put((frame, True))
+
+    def _analysis_loop(self) -> None:
+        while self._running.is_set():
+            try:
+                frame = self.analysis_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                metadata = self.analyze(frame)
+            except Exception as e:
+                print(f"Error in frame analysis: {e}")
+                metadata = {'error': str(e)}
+            self.analysis_stats.record(time.perf_counter() - start)
+            with self._metadata_lock:
+                self._metadata = metadata
+
+    def _encode_loop(self) -> None:
+        while self._running.is_set():
+            try:
+                frame, annotate = self.encode_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                if annotate:
+                    frame = self.render(frame.copy(), self.metadata)
+                payload = self.encode(frame)
+            except Exception as e:
+                print(f"Error encoding frame: {e}")
+                continue
+            self.encode_stats.record(time.perf_counter() - start)
+            if payload is not None:
+                self.sink(payload)
+
+    def frames(self, timeout: float = 0.5) -> Generator[bytes, None, None]:
+        """
+        Yield encoded frames as they become available.
+
+        Starts the pipeline on first use and stops it when the consumer
+        goes away.
+        """
+        self.start()
+        try:
+            while self._running.is_set():
+                try:
+                    yield self.output_queue.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+        finally:
+            self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depths, drop counts and per-stage latency."""
+        stats = {
+            'name': self.name,
+            'running': self._running.is_set(),
+            'queues': {
+                'analysis': {'depth': self.analysis_queue.qsize(), 'dropped': self.analysis_queue.dropped},
+                'encode': {'depth': self.encode_queue.qsize(), 'dropped': self.encode_queue.dropped},
+                'output': {'depth': self.output_queue.qsize(), 'dropped': self.output_queue.dropped}
+            },
+            'latency': {
+                'capture': self.capture_stats.snapshot(),
+                'analysis': self.analysis_stats.snapshot(),
+                'encode': self.encode_stats.snapshot()
+            }
+        }
+        if self.extra_stats is not None:
+            stats.update(self.extra_stats())
+        return stats
+
+
+def get_pipeline_stats() -> List[Dict[str, Any]]:
+    """Return stats for every pipeline that is currently streaming."""
+    return [pipeline.stats() for pipeline in list(_active_pipelines)]
@@ -0,0 +1,477 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from app.utils.frame_context import FrameContext, ensure_context
+from app.utils.graph_pool import GraphPool
+from app.utils.motion_gate import MotionGate
+from app.utils.landmark_features import LandmarkFeatures
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Global variables for MediaPipe
+mp_face_detection = mp.solutions.face_detection
+mp_face_mesh = mp.solutions.face_mesh
+mp_drawing = mp.solutions.drawing_utils
+
+# MediaPipe graphs are not safe for concurrent process() calls and, with
+# static_image_mode=False, carry tracking state from one frame to the next.
+# Each stream (exam session) therefore gets its own graphs from a bounded
+# pool. Calls without a stream key share graphs that keep no state between
+# frames: Face Mesh in static-image mode, and Face Detection, which never tracks.
+STUDENT_GRAPH_POOL_SIZE = 16
+STUDENT_GRAPH_IDLE_TIMEOUT = 300.0  # seconds
+STATIC_GRAPH_KEY = 'static'
+
+def _create_face_detection():
+    return mp_face_detection.FaceDetection(
+        model_selection=0, min_detection_confidence=0.5)
+
+def _create_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=1,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+def _create_static_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        static_image_mode=True,
+        max_num_faces=1,
+        min_detection_confidence=0.5
+    )
+
+face_detection_pool = GraphPool(_create_face_detection,
+                                max_size=STUDENT_GRAPH_POOL_SIZE,
+                                idle_timeout=STUDENT_GRAPH_IDLE_TIMEOUT)
+face_mesh_pool = GraphPool(_create_face_mesh,
+                           max_size=STUDENT_GRAPH_POOL_SIZE,
+                           idle_timeout=STUDENT_GRAPH_IDLE_TIMEOUT)
+static_face_mesh_pool = GraphPool(_create_static_face_mesh,
+                                  max_size=1,
+                                  idle_timeout=STUDENT_GRAPH_IDLE_TIMEOUT)
+
+def checkout_graph(pool, stream_key=None):
+    """The stream's pooled graph, or the shared stateless one when no stream is given"""
+    if stream_key is None:
+        if pool is face_mesh_pool:
+            pool = static_face_mesh_pool
+        return pool.checkout(STATIC_GRAPH_KEY)
+    return pool.checkout(stream_key)
+
+def release_graphs(stream_key):
+    """Close the graphs and drop the state of a finished stream, e.g. after the exam is submitted"""
+    face_detection_pool.release(stream_key)
+    face_mesh_pool.release(stream_key)
+    with _stream_lock:
+        _stream_states.pop(stream_key, None)
+
+def graph_stats():
+    return {'face_detection': face_detection_pool.stats(), 'face_mesh': face_mesh_pool.stats(),
+            'static_face_mesh': static_face_mesh_pool.stats()}
+
+NECK_MOVEMENT_THRESHOLD = 0.08  # More sensitive
+
+# Neck movement and motion gate state per stream key, least recently used
+# dropped first; calls without a stream key start from a blank state
+MAX_POSITION_HISTORY = 10
+MAX_TRACKED_STREAMS = 1000
+_stream_states = OrderedDict()
+_stream_lock = threading.Lock()
+
+def _new_stream_state():
+    return {
+        'last_landmarks': None,
+        'positions': deque(maxlen=MAX_POSITION_HISTORY),
+        'gate': MotionGate()
+    }
+
+def _stream_state(key):
+    """Previous landmarks, position history and motion gate of a stream, blank without a key"""
+    if key is None:
+        return _new_stream_state()
+    with _stream_lock:
+        state = _stream_states.get(key)
+        if state is None:
+            while len(_stream_states) >= MAX_TRACKED_STREAMS:
+                _stream_states.popitem(last=False)
+            state = _stream_states[key] = _new_stream_state()
+        else:
+            _stream_states.move_to_end(key)
+        return state
+
+def extract_face_features(frame, context=None, stream_key=None):
+    """Run Face Mesh once per frame and return the shared LandmarkFeatures, or None without a face
+    
+    stream_key selects the pooled Face Mesh graph (see checkout_graph).
+    """
+    context = ensure_context(frame, context)
+    return context.cached('face_features', lambda: _extract_face_features(context, stream_key))
+
+def _extract_face_features(context, stream_key):
+    with checkout_graph(face_mesh_pool, stream_key) as face_mesh:
+        results = face_mesh.process(context.rgb)
+    
+    if not results.multi_face_landmarks:
+        return None
+    
+    img_h, img_w = context.frame.shape[:2]
+    return LandmarkFeatures.from_landmarks(results.multi_face_landmarks[0].landmark, (img_w, img_h))
+
+def run_face_detection(frame, context=None, stream_key=None):
+    """Run Face Detection once per frame and return its detections (possibly empty)"""
+    context = ensure_context(frame, context)
+    return context.cached('face_detections', lambda: _run_face_detection(context, stream_key))
+
+def _run_face_detection(context, stream_key):
+    with checkout_graph(face_detection_pool, stream_key) as face_detection:
+        return face_detection.process(context.rgb).detections or []
+
+def detect_neck_movement(frame, threshold=NECK_MOVEMENT_THRESHOLD, features=None, context=None,
+                         stream_key=None):
+    """Enhanced neck movement detection using MediaPipe Face Mesh with EAR and head pose
+    
+    Pass the frame's LandmarkFeatures or FrameContext to share one Face Mesh run with detect_looking_away.
+    Movement is measured against the stream's previous frame: without a stream_key there is none,
+    and the movement type is "no_history" instead of a measurement.
+    """
+    if stream_key is None:
+        return False, 0.0, "no_history"
+    
+    try:
+        state = _stream_state(stream_key)
+        last_landmarks = state['last_landmarks']
+        
+        if features is None:
+            features = extract_face_features(frame, context, stream_key)
+        
+        if features is None:
+            return False, 0.0, "No face detected"
+        
+        nose_x, nose_y = (float(v) for v in features.nose)
+        
+        # Average EAR of both eyes
+        avg_ear = float(features.ear.mean())
+        
+        # Head pose estimation from the key points
+        x_angle, y_angle, z_angle = features.head_pose()
+        
+        # Calculate movement metrics
+        current_pos = {
+            'nose_x': nose_x,
+            'nose_y': nose_y,
+            'ear': avg_ear,
+            'x_angle': x_angle,
+            'y_angle': y_angle,
+            'z_angle': z_angle,
+            'timestamp': time.time()
+        }
+        
+        movement_ratio = 0.0
+        movement_type = "normal"
+        
+        if last_landmarks is not None:
+            # Calculate position change
+            nose_movement = calculate_distance(
+                (nose_x, nose_y), 
+                (last_landmarks['nose_x'], last_landmarks['nose_y'])
+            )
+            
+            # Calculate angle changes
+            angle_change_x = abs(x_angle - last_landmarks['x_angle'])
+            angle_change_y = abs(y_angle - last_landmarks['y_angle'])
+            angle_change_z = abs(z_angle - last_landmarks['z_angle'])
+            
+            # EAR change (indicates blinking/eye movement)
+            ear_change = abs(avg_ear - last_landmarks['ear'])
+            
+            # Combined movement score
+            movement_ratio = (nose_movement * 2.0 + 
+                            angle_change_x * 0.02 + 
+                            angle_change_y * 0.02 + 
+                            angle_change_z * 0.02 + 
+                            ear_change * 0.5)
+            
+            # Determine movement type based on dominant change
+            if angle_change_y > 15:  # Looking left/right
+                movement_type = "head_turn"
+            elif angle_change_x > 10:  # Looking up/down
+                movement_type = "head_tilt"
+            elif nose_movement > 0.03:
+                movement_type = "head_movement"
+            elif ear_change > 0.1:
+                movement_type = "eye_movement"
+        
+        # Store position history
+        state['positions'].append(current_pos)
+        state['last_landmarks'] = current_pos
+        
+        # Enhanced movement detection
+        movement_detected = movement_ratio > threshold
+        
+        return movement_detected, movement_ratio, movement_type
+        
+    except Exception as e:
+        logger.error(f"Error in neck movement detection: {str(e)}")
+        return False, 0.0, "detection_error"
+
+def calculate_distance(point1, point2):
+    """Calculate Euclidean distance between two points"""
+    return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+
+def detect_multiple_persons(frame, context=None, stream_key=None):
+    """Enhanced multiple person detection with better face counting"""
+    try:
+        detections = run_face_detection(frame, context, stream_key)
+        
+        face_count = 0
+        confidence_scores = []
+        
+        if detections:
+            for detection in detections:
+                confidence = detection.score[0]
+                if confidence > 0.4:  # Lower threshold for better detection
+                    face_count += 1
+                    confidence_scores.append(confidence)
+        
+        avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0
+        
+        # Return multiple people detection AND if NO person is detected
+        multiple_people_detected = face_count > 1
+        no_person_detected = face_count == 0
+        
+        return multiple_people_detected, face_count, avg_confidence, no_person_detected
+        
+    except Exception as e:
+        logger.error(f"Error in multiple person detection: {str(e)}")
+        return False, 0, 0.0, False
+
+def detect_looking_away(frame, features=None, context=None, stream_key=None):
+    """Enhanced looking away detection using iris tracking and gaze estimation
+    
+    Pass the frame's LandmarkFeatures or FrameContext to share one Face Mesh run with detect_neck_movement.
+    """
+    try:
+        if features is None:
+            features = extract_face_features(frame, context, stream_key)
+        
+        if features is None:
+            return False, 0.0, "no_face"
+        
+        # Gaze direction: pupil position relative to the eye centre, averaged over both eyes
+        avg_gaze_x, avg_gaze_y = (float(v) for v in features.gaze)
+        
+        # Calculate gaze intensity (distance from center)
+        gaze_intensity = np.hypot(avg_gaze_x, avg_gaze_y)
+        
+        # Determine gaze direction
+        direction = "center"
+        if abs(avg_gaze_x) > abs(avg_gaze_y):
+            if avg_gaze_x > 0.015:  # Looking right
+                direction = "right"
+            elif avg_gaze_x < -0.015:  # Looking left
+                direction = "left"
+        else:
+            if avg_gaze_y > 0.01:  # Looking down
+                direction = "down"
+            elif avg_gaze_y < -0.01:  # Looking up
+                direction = "up"
+        
+        # Face asymmetry (indicates head turn)
+        face_asymmetry = features.face_asymmetry
+        
+        # Combined looking away score
+        looking_away_score = gaze_intensity + face_asymmetry * 0.5
+        
+        # Threshold for looking away (more sensitive)
+        looking_away_threshold = 0.025
+        looking_away = looking_away_score > looking_away_threshold and direction != "center"
+        
+        return looking_away, looking_away_score, direction
+        
+    except Exception as e:
+        logger.error(f"Error in looking away detection: {str(e)}")
+        return False, 0.0, "detection_error"
+
+def detect_camera_blocked(frame, context=None):
+    """Enhanced camera blocking detection with multiple metrics
+    
+    A probe decides colour frames from the cheap statistics first and
+    only computes the colour and edge statistics the result depends on.
+    """
+    try:
+        result = _camera_blocked_probe(frame, context)
+        if result is not None:
+            return result
+        
+        # Convert to different color spaces for analysis
+        gray = ensure_context(frame, context).gray
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        
+        # Multiple brightness metrics
+        mean_brightness = np.mean(gray)
+        std_brightness = np.std(gray)
+        min_brightness = np.min(gray)
+        max_brightness = np.max(gray)
+        
+        # HSV analysis
+        mean_saturation = np.mean(hsv[:,:,1])
+        mean_value = np.mean(hsv[:,:,2])
+        
+        # Edge detection for texture analysis
+        edges = cv2.Canny(gray, 50, 150)
+        edge_density = np.sum(edges > 0) / (frame.shape[0] * frame.shape[1])
+        
+        # Multiple blocking conditions (more sensitive)
+        conditions = {
+            'very_dark': mean_brightness < 25,
+            'uniform_dark': std_brightness < 10 and mean_brightness < 30,
+            'completely_black': max_brightness < 20,
+            'very_bright': mean_brightness > 230,
+            'uniform_bright': std_brightness < 15 and mean_brightness > 220,
+            'low_saturation': mean_saturation < 20,
+            'no_texture': edge_density < 0.01,
+            'extreme_values': mean_value < 30 or mean_value > 240
+        }
+        
+        is_blocked, blocking_type = _blocking_outcome(conditions)
+        return is_blocked, mean_brightness, blocking_type
+        
+    except Exception as e:
+        logger.error(f"Error in camera blocking detection: {str(e)}")
+        return False, 0.0, "detection_error"
+
+def _blocking_outcome(conditions):
+    """Blocked flag and blocking type for a set of condition results"""
+    # Camera is blocked if multiple conditions are met
+    is_blocked = sum(conditions.values()) >= 2
+    
+    # Determine blocking type
+    blocking_type = "none"
+    if conditions['completely_black'] or conditions['very_dark']:
+        blocking_type = "dark_blocking"
+    elif conditions['very_bright'] or conditions['uniform_bright']:
+        blocking_type = "bright_blocking"
+    elif conditions['no_texture']:
+        blocking_type = "covered"
+    elif conditions['low_saturation']:
+        blocking_type = "partial_block"
+    
+    return is_blocked, blocking_type
+
+def _camera_blocked_probe(frame, context=None):
+    """
+    Decide detect_camera_blocked computing only the statistics it needs.
+    
+    Every statistic is the exact full-resolution value, so the result is
+    the full analysis' result. The brightness conditions come from one
+    cv2.meanStdDev and minMaxLoc pass over the grey image. The HSV means
+    and then the Canny edge density, the costly parts, are only computed
+    while the blocked flag or blocking type still depends on them.
+    
+    Returns:
+        Same tuple as detect_camera_blocked, or None for a grayscale frame
+    """
+    if frame.ndim != 3:
+        return None
+    
+    gray = ensure_context(frame, context).gray
+    mean, std = (float(v[0][0]) for v in cv2.meanStdDev(gray))
+    conditions = {
+        'very_dark': mean < 25,
+        'uniform_dark': std < 10 and mean < 30,
+        'completely_black': cv2.minMaxLoc(gray)[1] < 20,
+        'very_bright': mean > 230,
+        'uniform_bright': std < 15 and mean > 220,
+        'low_saturation': None,
+        'no_texture': None,
+        'extreme_values': None
+    }
+    
+    outcome = _settled_outcome(conditions)
+    if outcome is None:
+        _, mean_saturation, mean_value, _ = cv2.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV))
+        conditions['low_saturation'] = mean_saturation < 20
+        conditions['extreme_values'] = mean_value < 30 or mean_value > 240
+        outcome = _settled_outcome(conditions)
+    if outcome is None:
+        edge_density = cv2.countNonZero(cv2.Canny(gray, 50, 150)) / gray.size
+        conditions['no_texture'] = edge_density < 0.01
+        outcome = _blocking_outcome(conditions)
+    
+    is_blocked, blocking_type = outcome
+    return is_blocked, mean, blocking_type
+
+def _settled_outcome(conditions):
+    """Outcome shared by every completion of the undecided (None) conditions, else None"""
+    undecided = [name for name, verdict in conditions.items() if verdict is None]
+    outcome = None
+    for values in itertools.product((False, True), repeat=len(undecided)):
+        candidate = _blocking_outcome({**conditions, **dict(zip(undecided, values))})
+        if outcome is not None and candidate != outcome:
+            return None
+        outcome = candidate
+    return outcome
+
+def analyze_frame(frame, stream_key=None):
+    """
+    Run every student-side detector on a frame, each MediaPipe graph at most once.
+    
+    Face Detection and Face Mesh each process the frame once; their results
+    and the RGB/gray conversions are shared through a FrameContext, and the
+    landmark features are extracted once for both landmark-based detectors.
+    A frame that is unchanged since the stream's last analysed frame gets
+    that frame's analysis back without running any detector.
+    
+    Args:
+        frame: Input BGR camera frame
+        stream_key: Exam session the frame belongs to; selects its pooled
+            graphs so tracking state never crosses students. Without it
+            the frame is analysed on its own, with the shared stateless
+            graphs, and neck movement reports "no_history"
+        
+    Returns:
+        Dictionary with faces, landmarks, pose, gaze, EAR, camera blocking,
+        neck movement and looking away results, and whether it was reused
+    """
+    context = FrameContext(frame)
+    gate = _stream_state(stream_key)['gate']
+    if not gate.should_analyze(context):
+        return dict(gate.result, reused=True)
+    
+    features = extract_face_features(frame, context, stream_key)
+    
+    multiple_people, face_count, confidence, no_person = detect_multiple_persons(frame, context, stream_key)
+    analysis = {
+        'faces': {
+            'count': face_count,
+            'multiple': multiple_people,
+            'none': no_person,
+            'confidence': confidence
+        },
+        'landmarks': features,
+        'pose': None,
+        'gaze': None,
+        'ear': None,
+        'camera_blocked': detect_camera_blocked(frame, context),
+        'neck_movement': detect_neck_movement(frame, features=features, context=context,
+                                              stream_key=stream_key),
+        'looking_away': detect_looking_away(frame, features=features, context=context),
+        'reused': False
+    }
+    
+    if features is not None:
+        analysis['pose'] = features.head_pose()
+        analysis['gaze'] = tuple(float(v) for v in features.gaze)
+        analysis['ear'] = float(features.ear.mean())
+    
+    gate.store(analysis)
+    return analysis
@@ -0,0 +1,323 @@
+import atexit
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from app.utils.violation_timeline import write_timeline
+
+
+class ViolationBuffer:
+    """
+    Write-behind buffer for procrastination violation records.
+
+    Requests only append to an in-memory batch. A background thread writes
+    it in one bulk write when `max_batch` records are queued or
+    every `flush_interval` seconds, and once more at shutdown. By default
+    the records go to the bucketed violation timeline. Records get their
+    _id when queued, so a batch that is written twice (after a connection
+    drops mid-write) is recognised: the timeline skips events it already
+    holds, and plain inserts only raise duplicate key errors, which are
+    ignored.
+
+    When the database is unreachable, or refuses records for any reason
+    but a duplicate key, the batch is appended to the spool file and
+    written again, as the same batch and before newer records, on the next
+    flush. Without a spool file it stays in memory until then. Spool files
+    left claimed by a worker that died are picked up again when a buffer
+    starts.
+
+    Args:
+        write: Callable writing a list of records in one bulk write
+        max_batch: Queued records that trigger a flush
+        flush_interval: Seconds between flushes of a partial batch
+        spool_path: JSON lines file for records the database refused
+    """
+
+    def __init__(self, write: Callable[[List[Dict[str, Any]]], Any] = write_timeline,
+                 max_batch: int = 100,
+                 flush_interval: float = 1.0,
+                 spool_path: Optional[str] = None):
+        self.write = write
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self._records: List[Dict[str, Any]] = []
+        # Failed batches waiting to be written again, without a spool file
+        self._retry: List[List[Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        # Serialises flushes from the background thread, close() and callers
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.spooled = 0
+        self.failures = 0
+        self.last_flush = 0.0
+        self._recover_spools()
+        atexit.register(self.close)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Queue a record for the next batch; never waits for the database."""
+        record.setdefault('_id', ObjectId())
+        with self._lock:
+            self._records.append(record)
+            self.queued += 1
+            full = len(self._records) >= self.max_batch
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._records) + sum(len(batch) for batch in self._retry)
+
+    def flush(self) -> int:
+        """
+        Write spooled, retried and queued records.
+
+        Returns:
+            Number of records written in this flush
+        """
+        with self._flush_lock:
+            start = time.perf_counter()
+            with self._lock:
+                batches, self._retry = self._retry, []
+                if self._records:
+                    batches.append(self._records)
+                    self._records = []
+            replayed = self._replay_spool()
+            reachable = replayed is not None
+            written = replayed or 0
+            for batch in batches:
+                # Don't wait on an unreachable database more than once per flush
+                result = self._write(batch) if reachable else None
+                if result:
+                    written += len(batch)
+                else:
+                    reachable = reachable and result is not None
+                    self._keep(batch)
+            if batches or written:
+                self.last_flush = time.perf_counter() - start
+            return written
+
+    def _write(self, records: List[Dict[str, Any]]) -> Optional[bool]:
+        """
+        Write one batch.
+
+        Returns:
+            True when written, False when the database refused records
+            other than duplicates, None when it could not be reached; the
+            batch is kept for later in both cases
+        """
+        try:
+            self.write(records)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            duplicates = sum(1 for error in errors if error.get('code') == 11000)
+            if len(errors) > duplicates:
+                # Written again as a whole: records that made it are duplicates then
+                self.rejected += 1
+                print(f"Violation write refused, keeping {len(records)} records for retry: "
+                      f"{next(error for error in errors if error.get('code') != 11000).get('errmsg')}")
+                return False
+            self.duplicates += duplicates
+            self.written += len(records)
+        except Exception as e:
+            self.failures += 1
+            print(f"Error writing {len(records)} violation records: {e}")
+            return None
+        else:
+            self.written += len(records)
+        self.batches += 1
+        return True
+
+    def _keep(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Hold a failed batch in the spool file, or in memory without one.
+
+        The batch is kept whole and retried on its own, so a write that
+        did reach the database is recognised as a duplicate.
+        """
+        if self._append_spool([batch]):
+            self.spooled += len(batch)
+            return
+        with self._lock:
+            self._retry.append(batch)
+
+    def _append_spool(self, batches: List[List[Dict[str, Any]]]) -> bool:
+        if not self.spool_path:
+            return False
+        try:
+            with open(self.spool_path, 'a') as spool:
+                spool.write(''.join(json_util.dumps(batch) + '\n' for batch in batches))
+            return True
+        except OSError as e:
+            print(f"Error spooling violation records: {e}")
+            return False
+
+    def _replay_spool(self) -> Optional[int]:
+        """Write the spooled batches; None if the database is still unreachable."""
+        if not self.spool_path:
+            return 0
+        # Workers share the spool file: claim it by renaming, so batches
+        # spooled meanwhile by another worker go to a fresh file
+        claimed = f"{self.spool_path}.{os.getpid()}"
+        if not os.path.exists(claimed):
+            try:
+                os.replace(self.spool_path, claimed)
+            except FileNotFoundError:
+                return 0
+            except OSError as e:
+                print(f"Error claiming violation spool: {e}")
+                return 0
+
+        batches = []
+        try:
+            with open(claimed) as spool:
+                for line in spool:
+                    if not line.strip():
+                        continue
+                    try:
+                        batches.append(json_util.loads(line))
+                    except ValueError:
+                        print(f"Skipped a corrupt violation spool line: {line[:80]!r}")
+        except OSError as e:
+            print(f"Error reading violation spool: {e}")
+            return 0
+
+        written, refused = 0, []
+        for i, batch in enumerate(batches):
+            result = self._write(batch)
+            if result is None:
+                # Hand the rest back to the shared spool; if that fails too,
+                # the claimed file is retried on the next flush
+                if self._append_spool(refused + batches[i:]):
+                    os.remove(claimed)
+                return None
+            if result:
+                written += len(batch)
+            else:
+                refused.append(batch)
+        if refused and not self._append_spool(refused):
+            return written
+        os.remove(claimed)
+        return written
+
+    def _recover_spools(self) -> None:
+        """
+        Hand spool files claimed by workers that died back to the shared spool.
+
+        A worker claims the spool by renaming it to `<spool>.<pid>`; if it
+        dies before replaying it, no one else would.
+        """
+        if not self.spool_path:
+            return
+        directory, name = os.path.split(os.path.abspath(self.spool_path))
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        for entry in names:
+            owner = entry[len(name) + 1:]
+            if not entry.startswith(name + '.') or not owner.isdigit() or int(owner) == os.getpid():
+                continue
+            try:
+                os.kill(int(owner), 0)
+                continue  # owner still running
+            except ProcessLookupError:
+                pass
+            except OSError:
+                continue  # running under another user
+            stale = os.path.join(directory, entry)
+            # Rename first, so two workers don't both recover the same file
+            recovering = f"{stale}.recovering.{os.getpid()}"
+            try:
+                os.replace(stale, recovering)
+                with open(recovering) as spool:
+                    lines = spool.read()
+                with open(self.spool_path, 'a') as spool:
+                    spool.write(lines)
+                os.remove(recovering)
+                print(f"Recovered violation spool of stopped worker {owner}")
+            except OSError as e:
+                print(f"Error recovering violation spool {entry}: {e}")
+
+    def _ensure_flusher(self) -> None:
+        # Started lazily, and again in a worker forked after it was started
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._recover_spools()
+            self._flusher = threading.Thread(target=self._flush_loop, name='violation-flush', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing violation records: {e}")
+
+    def close(self) -> None:
+        """Stop the flusher and write out, or spool, everything still queued."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            self._flusher.join(timeout=self.flush_interval + 5)
+        self._flusher = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': self.pending(),
+            'queued': self.queued,
+            'written': self.written,
+            'batches': self.batches,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'spooled': self.spooled,
+            'spool_exists': bool(self.spool_path) and os.path.exists(self.spool_path),
+            'failures': self.failures,
+            'last_flush_ms': round(1000 * self.last_flush, 2)
+        }
+
+
+# Buffer used by the exam routes
+_violation_buffer = ViolationBuffer()
+
+
+def set_violation_buffer(buffer: ViolationBuffer) -> None:
+    """Replace the process-wide buffer, flushing the previous one."""
+    global _violation_buffer
+    previous, _violation_buffer = _violation_buffer, buffer
+    if previous is not buffer:
+        previous.close()
+
+
+def get_violation_buffer() -> ViolationBuffer:
+    return _violation_buffer
+
+
+def create_violation_buffer(config: Dict[str, Any], instance_path: str = '.') -> ViolationBuffer:
+    """Build the buffer described by the VIOLATION_BUFFER_* app config."""
+    return ViolationBuffer(
+        max_batch=config.get('VIOLATION_BUFFER_MAX_BATCH', 100),
+        flush_interval=config.get('VIOLATION_BUFFER_FLUSH_INTERVAL', 1.0),
+        spool_path=config.get('VIOLATION_SPOOL_PATH') or os.path.join(instance_path, 'violation_spool.jsonl')
+    )
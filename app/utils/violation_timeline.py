@@ -0,0 +1,252 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# Violations of one student in one exam are stored in time buckets of this
+# many seconds: one document per bucket instead of one per poll
+BUCKET_SECONDS = 300
+
+# Attempts at a batch whose bucket upserts lose a race for a new bucket
+# to another worker (duplicate key on the unique bucket index)
+UPSERT_ATTEMPTS = 3
+
+# Records of the old procrastination_violations collection (one document
+# per flagged poll) moved into the timeline per bulk write
+MIGRATION_BATCH = 500
+
+# Violation types as (code, severity, message). Events store the code; a
+# '{}' in the message is filled with the event's detail.
+VIOLATION_TYPES = {
+    'CAMERA_ISSUE': (1, 'HIGH', 'No face detected or camera blocked'),
+    'MULTIPLE_FACES': (2, 'HIGH', '{} faces detected - only one person allowed'),
+    'LOOKING_AWAY': (3, 'HIGH', 'Looking {} - please focus on exam'),
+    'TAB_SWITCH': (4, 'HIGH', 'Tab switching detected'),
+    'WINDOW_FOCUS': (5, 'MEDIUM', 'Window focus lost'),
+    'COPY_ATTEMPT': (6, 'HIGH', 'Copy operation blocked'),
+    'PASTE_ATTEMPT': (7, 'HIGH', 'Paste operation blocked'),
+    'TEXT_SELECTION': (8, 'MEDIUM', 'Text selection blocked'),
+    'SUSPICIOUS_KEYS': (9, 'MEDIUM', 'Suspicious key combination detected'),
+    'AUTO_SUBMIT': (10, 'CRITICAL', 'Maximum warnings reached ({}/20) - Auto-submitting exam'),
+}
+_TYPES_BY_CODE = {code: (name, severity, message) for name, (code, severity, message) in VIOLATION_TYPES.items()}
+# Anything else keeps its type, severity and message in the detail
+OTHER_CODE = 0
+
+
+def bucket_start(timestamp: float, bucket_seconds: int = BUCKET_SECONDS) -> datetime:
+    """Start of the bucket holding an epoch timestamp, as a naive UTC datetime."""
+    start = timestamp - timestamp % bucket_seconds
+    return datetime.fromtimestamp(start, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _encode(violation: Dict[str, Any]) -> Tuple[int, Any]:
+    """Type code and detail of a violation; the detail is None for stock messages."""
+    name = violation.get('type')
+    message = violation.get('message', '')
+    if name in VIOLATION_TYPES:
+        code, severity, template = VIOLATION_TYPES[name]
+        if violation.get('severity', severity) == severity:
+            if message == template:
+                return code, None
+            prefix, placeholder, suffix = template.partition('{}')
+            if placeholder and message.startswith(prefix) and message.endswith(suffix):
+                return code, message[len(prefix):len(message) - len(suffix)]
+    return OTHER_CODE, {'type': name, 'severity': violation.get('severity'), 'message': message}
+
+
+def _decode(code: int, detail: Any) -> Tuple[str, str, str]:
+    """Type, severity and message of a stored event."""
+    if code == OTHER_CODE or code not in _TYPES_BY_CODE:
+        detail = detail or {}
+        return detail.get('type', 'UNKNOWN'), detail.get('severity', 'MEDIUM'), detail.get('message', '')
+    name, severity, template = _TYPES_BY_CODE[code]
+    return name, severity, template.format(detail) if '{}' in template else template
+
+
+def bucket_updates(records: Iterable[Dict[str, Any]],
+                   bucket_seconds: int = BUCKET_SECONDS) -> List[UpdateOne]:
+    """
+    Turn procrastination violation records into updates of their buckets.
+
+    Records are the per-poll documents built by procrastination_check. All
+    events of a batch that fall into the same bucket become one update:
+    their offsets, codes, details and warning counts are appended with
+    $push, and the per-type counters are raised with $inc. Each event
+    also keeps the _id of its record in `applied`, and the update only
+    matches a bucket holding none of them, so a batch written again after
+    a dropped connection is not applied twice.
+
+    The buckets are created first by separate upserts that only set
+    defaults, so the event updates themselves never upsert: they either
+    apply to the existing bucket or match nothing.
+
+    Args:
+        records: Violation records (user_id, exam_id, violations, warning_count, ...)
+        bucket_seconds: Bucket length
+
+    Returns:
+        Bucket upserts followed by one event update per touched bucket,
+        for an ordered bulk_write
+    """
+    buckets: Dict[Tuple[str, str, datetime], Dict[str, Any]] = {}
+    for record in records:
+        student_id, exam_id = str(record['user_id']), str(record['exam_id'])
+        record_id = record.get('_id')
+        fallback = record.get('timestamp')
+        fallback = fallback.replace(tzinfo=timezone.utc).timestamp() if isinstance(fallback, datetime) else None
+        for violation in record.get('violations', []):
+            timestamp = violation.get('timestamp') or fallback
+            start = bucket_start(timestamp, bucket_seconds)
+            key = (student_id, exam_id, start)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {'t': [], 'c': [], 'd': [], 'w': [], 'applied': [],
+                                         'counts': defaultdict(int), 'first': timestamp, 'last': timestamp,
+                                         'warning_count': 0, 'auto_submit': False}
+            code, detail = _encode(violation)
+            offset = int(round(1000 * (timestamp - start.replace(tzinfo=timezone.utc).timestamp())))
+            bucket['t'].append(offset)
+            bucket['c'].append(code)
+            bucket['d'].append(detail)
+            bucket['w'].append(record.get('warning_count', 0))
+            bucket['applied'].append(record_id)
+            bucket['counts'][violation.get('type', 'UNKNOWN')] += 1
+            bucket['first'] = min(bucket['first'], timestamp)
+            bucket['last'] = max(bucket['last'], timestamp)
+            bucket['warning_count'] = max(bucket['warning_count'], record.get('warning_count', 0))
+            bucket['auto_submit'] = bucket['auto_submit'] or bool(record.get('auto_submit_triggered'))
+
+    creates, updates = [], []
+    for (student_id, exam_id, start), bucket in buckets.items():
+        key = {'student_id': student_id, 'exam_id': exam_id, 'bucket': start}
+        creates.append(UpdateOne(key, {'$setOnInsert': {'count': 0}}, upsert=True))
+        increments = {'count': len(bucket['t'])}
+        increments.update({f"counts.{name}": n for name, n in bucket['counts'].items()})
+        updates.append(UpdateOne(
+            dict(key, applied={'$nin': sorted(set(bucket['applied']), key=str)}),
+            {
+                '$push': {
+                    't': {'$each': bucket['t']},
+                    'c': {'$each': bucket['c']},
+                    'd': {'$each': bucket['d']},
+                    'w': {'$each': bucket['w']},
+                    'applied': {'$each': bucket['applied']}
+                },
+                '$inc': increments,
+                '$min': {'first': datetime.fromtimestamp(bucket['first'], tz=timezone.utc).replace(tzinfo=None)},
+                '$max': {'last': datetime.fromtimestamp(bucket['last'], tz=timezone.utc).replace(tzinfo=None),
+                         'warning_count': bucket['warning_count'],
+                         'auto_submit': bucket['auto_submit']}
+            }
+        ))
+    return creates + updates
+
+
+def write_timeline(records: List[Dict[str, Any]]) -> None:
+    """
+    ViolationBuffer writer: apply a batch of records to the timeline buckets.
+
+    Two workers creating the same bucket at once make one upsert fail with
+    a duplicate key error; the batch is then written again, which finds
+    the bucket and skips events already applied. A conflict that persists
+    is raised as a plain PyMongoError, so the buffer keeps the batch
+    instead of taking it for a duplicate insert.
+    """
+    from app.mongodb import mongo
+    updates = bucket_updates(records)
+    if not updates:
+        return
+    for attempt in range(UPSERT_ATTEMPTS):
+        try:
+            mongo.db.violation_timeline.bulk_write(updates, ordered=True)
+            return
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if not errors or any(error.get('code') != 11000 for error in errors):
+                raise
+    raise PyMongoError(f"Violation bucket upserts still conflicting after {UPSERT_ATTEMPTS} attempts")
+
+
+def migrate_legacy_records(batch_size: int = MIGRATION_BATCH) -> int:
+    """
+    Move the per-poll records of procrastination_violations into the timeline.
+
+    One-off migration for records written before the timeline existed;
+    nothing writes that collection any more. Records are read in _id order
+    and written in fixed batches like a ViolationBuffer flush, so running
+    it again after an interruption groups them the same way and the
+    buckets skip every batch they already hold. The old documents are
+    left in place.
+
+    Args:
+        batch_size: Records per bulk write
+
+    Returns:
+        Number of records read
+    """
+    from app.mongodb import mongo
+    migrated, batch = 0, []
+    for record in mongo.db.procrastination_violations.find().sort('_id', 1):
+        batch.append(record)
+        if len(batch) == batch_size:
+            write_timeline(batch)
+            migrated, batch = migrated + len(batch), []
+    if batch:
+        write_timeline(batch)
+        migrated += len(batch)
+    return migrated
+
+
+def expand_buckets(buckets: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Events of the given bucket documents, oldest first."""
+    events = []
+    for bucket in buckets:
+        start = bucket['bucket']
+        for offset, code, detail, warning_count in zip(bucket.get('t', []), bucket.get('c', []),
+                                                       bucket.get('d', []), bucket.get('w', [])):
+            name, severity, message = _decode(code, detail)
+            events.append({
+                'timestamp': start + timedelta(milliseconds=offset),
+                'type': name,
+                'severity': severity,
+                'message': message,
+                'warning_count': warning_count
+            })
+    events.sort(key=lambda event: event['timestamp'])
+    return events
+
+
+def summarise_buckets(buckets: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Totals of the given bucket documents; only their counters are needed.
+
+    Returns:
+        Dictionary with the event count, counts by type and severity, the
+        first and last event, the highest warning count and whether an
+        auto-submit was triggered
+    """
+    summary = {'total': 0, 'by_type': defaultdict(int), 'by_severity': defaultdict(int),
+               'first': None, 'last': None, 'max_warning_count': 0, 'auto_submit': False}
+    for bucket in buckets:
+        summary['total'] += bucket.get('count', 0)
+        for name, n in bucket.get('counts', {}).items():
+            summary['by_type'][name] += n
+            severity = VIOLATION_TYPES[name][1] if name in VIOLATION_TYPES else 'OTHER'
+            summary['by_severity'][severity] += n
+        if bucket.get('first') and (summary['first'] is None or bucket['first'] < summary['first']):
+            summary['first'] = bucket['first']
+        if bucket.get('last') and (summary['last'] is None or bucket['last'] > summary['last']):
+            summary['last'] = bucket['last']
+        summary['max_warning_count'] = max(summary['max_warning_count'], bucket.get('warning_count', 0))
+        summary['auto_submit'] = summary['auto_submit'] or bool(bucket.get('auto_submit'))
+    summary['by_type'] = dict(summary['by_type'])
+    summary['by_severity'] = dict(summary['by_severity'])
+    return summary
+
+
+# Bucket fields a summary needs; the event arrays are left on the server
+SUMMARY_PROJECTION = {'student_id': True, 'count': True, 'counts': True, 'first': True,
+                      'last': True, 'warning_count': True, 'auto_submit': True}
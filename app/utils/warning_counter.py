@@ -0,0 +1,353 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class MongoCounterStore:
+    """
+    Warning counters in MongoDB, one document per student and exam.
+
+    Increments are a single find_one_and_update with $inc on the unique
+    (student_id, exam_id) index, so they are atomic across every worker
+    and return the new total.
+    """
+
+    def increment(self, student_id: Any, exam_id: Any, amount: int = 1) -> Optional[int]:
+        from app.mongodb import MongoManager
+        return MongoManager.increment_warning_count(student_id, exam_id, amount)
+
+    def get(self, student_id: Any, exam_id: Any) -> Optional[int]:
+        from app.mongodb import MongoManager
+        return MongoManager.get_warning_count(student_id, exam_id, default=None)
+
+    def reset(self, student_id: Any, exam_id: Any) -> bool:
+        from app.mongodb import MongoManager
+        return MongoManager.reset_warning_count(student_id, exam_id)
+
+
+class SQLiteCounterStore:
+    """
+    Local stand-in for MongoCounterStore: counters in an SQLite file.
+
+    Every process opening the same file shares the counters, and an
+    increment is one upsert statement, so it is atomic across workers on
+    one machine. SQLite before 3.35 has no RETURNING: there the increment
+    is an UPDATE (or INSERT) and a SELECT of the new total inside one
+    BEGIN IMMEDIATE transaction, which holds the write lock throughout.
+
+    Args:
+        path: Database file
+        timeout: Seconds to wait for another process' write lock
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        # Upserts need SQLite 3.24, RETURNING 3.35
+        self.returning = sqlite3.sqlite_version_info >= (3, 35, 0)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS warning_counters ('
+                ' student_id TEXT NOT NULL, exam_id TEXT NOT NULL,'
+                ' count INTEGER NOT NULL, updated_at REAL NOT NULL,'
+                ' PRIMARY KEY (student_id, exam_id))'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process; sqlite3 objects must not cross either
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def increment(self, student_id: Any, exam_id: Any, amount: int = 1) -> Optional[int]:
+        try:
+            if not self.returning:
+                return self._write_locked(str(student_id), str(exam_id), amount, add=True)
+            with self._connection() as connection:
+                row = connection.execute(
+                    'INSERT INTO warning_counters (student_id, exam_id, count, updated_at)'
+                    ' VALUES (?, ?, ?, ?)'
+                    ' ON CONFLICT (student_id, exam_id) DO UPDATE'
+                    ' SET count = count + excluded.count, updated_at = excluded.updated_at'
+                    ' RETURNING count',
+                    (str(student_id), str(exam_id), amount, time.time())
+                ).fetchone()
+            return row[0]
+        except sqlite3.Error as e:
+            print(f"Error incrementing warning count: {e}")
+            return None
+
+    def _write_locked(self, student_id: str, exam_id: str, value: int, add: bool) -> int:
+        """Add to or set a counter and read it back in one write transaction."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            updated = connection.execute(
+                'UPDATE warning_counters SET count = ' + ('count + ?' if add else '?') + ', updated_at = ?'
+                ' WHERE student_id = ? AND exam_id = ?',
+                (value, now, student_id, exam_id)
+            ).rowcount
+            if not updated:
+                connection.execute(
+                    'INSERT INTO warning_counters (student_id, exam_id, count, updated_at) VALUES (?, ?, ?, ?)',
+                    (student_id, exam_id, value, now)
+                )
+            count = connection.execute(
+                'SELECT count FROM warning_counters WHERE student_id = ? AND exam_id = ?',
+                (student_id, exam_id)
+            ).fetchone()[0]
+            connection.commit()
+            return count
+        except BaseException:
+            connection.rollback()
+            raise
+
+    def get(self, student_id: Any, exam_id: Any) -> Optional[int]:
+        try:
+            row = self._connection().execute(
+                'SELECT count FROM warning_counters WHERE student_id = ? AND exam_id = ?',
+                (str(student_id), str(exam_id))
+            ).fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            print(f"Error getting warning count: {e}")
+            return None
+
+    def reset(self, student_id: Any, exam_id: Any) -> bool:
+        try:
+            if not self.returning:
+                self._write_locked(str(student_id), str(exam_id), 0, add=False)
+                return True
+            with self._connection() as connection:
+                connection.execute(
+                    'INSERT INTO warning_counters (student_id, exam_id, count, updated_at)'
+                    ' VALUES (?, ?, 0, ?)'
+                    ' ON CONFLICT (student_id, exam_id) DO UPDATE'
+                    ' SET count = 0, updated_at = excluded.updated_at',
+                    (str(student_id), str(exam_id), time.time())
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error resetting warning count: {e}")
+            return False
+
+
+class WarningCounter:
+    """
+    Per-student, per-exam warning counts on top of a shared counter store.
+
+    Reads are served from an in-process cache for `cache_ttl` seconds, so
+    the per-frame checks do not query the database. Increments normally go
+    straight to the store, whose atomic increment returns the total across
+    all workers. With `write_behind`, increments are only added to the
+    cache and flushed to the store as deltas every `flush_interval`
+    seconds and at exit; totals stay exact, but other workers see them up
+    to one interval late. Increments that fail to reach the store are kept
+    and retried the same way.
+
+    Args:
+        store: MongoCounterStore or SQLiteCounterStore
+        cache_ttl: Seconds a count read from the store is reused
+        write_behind: Buffer increments instead of writing each one
+        flush_interval: Seconds between flushes of buffered increments
+    """
+
+    def __init__(self, store: Any, cache_ttl: float = 1.0,
+                 write_behind: bool = False, flush_interval: float = 1.0):
+        self.store = store
+        self.cache_ttl = cache_ttl
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        # Store totals as last seen, with the time they were read
+        self._cache: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        # Increments not yet written to the store
+        self._pending: Dict[Tuple[str, str], int] = {}
+        # Resets per key, so a flush can tell which of its increments were dropped
+        self._resets: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        # Held while a reset or a flushed increment is written to the store
+        self._write_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.store_errors = 0
+        atexit.register(self.close)
+
+    @staticmethod
+    def _key(student_id: Any, exam_id: Any) -> Tuple[str, str]:
+        return str(student_id), str(exam_id)
+
+    def get(self, student_id: Any, exam_id: Any) -> int:
+        """Current warning count, including increments not flushed yet."""
+        key = self._key(student_id, exam_id)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[1] < self.cache_ttl:
+                self.hits += 1
+                return cached[0] + self._pending.get(key, 0)
+            self.misses += 1
+
+        count = self.store.get(student_id, exam_id)
+        with self._lock:
+            if count is None:
+                self.store_errors += 1
+                count = cached[0] if cached is not None else 0
+            else:
+                self._cache[key] = (count, now)
+            return count + self._pending.get(key, 0)
+
+    def increment(self, student_id: Any, exam_id: Any, amount: int = 1) -> int:
+        """Add to the warning count and return the new total."""
+        key = self._key(student_id, exam_id)
+        if not self.write_behind:
+            count = self.store.increment(student_id, exam_id, amount)
+            if count is not None:
+                with self._lock:
+                    self._cache[key] = (count, time.monotonic())
+                    return count + self._pending.get(key, 0)
+            with self._lock:
+                self.store_errors += 1
+
+        # Buffered: count on top of the last known total, flush later
+        self.get(student_id, exam_id)  # refreshes a stale total
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+            cached = self._cache.get(key)
+            total = (cached[0] if cached is not None else 0) + self._pending[key]
+        self._ensure_flusher()
+        return total
+
+    def reset(self, student_id: Any, exam_id: Any) -> int:
+        """
+        Set the warning count back to zero, dropping buffered increments.
+
+        Increments a running flush has already taken from the buffer are
+        dropped too: the flush skips keys reset after it took them, and a
+        write already in progress lands before the reset.
+        """
+        key = self._key(student_id, exam_id)
+        with self._write_lock:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._resets[key] = self._resets.get(key, 0) + 1
+                self._cache[key] = (0, time.monotonic())
+            reset = self.store.reset(student_id, exam_id)
+        if not reset:
+            with self._lock:
+                self.store_errors += 1
+        return 0
+
+    def flush(self) -> int:
+        """
+        Write buffered increments to the store.
+
+        Returns:
+            Number of counters written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            resets = {key: self._resets.get(key, 0) for key in pending}
+        written = 0
+        for key, delta in pending.items():
+            with self._write_lock:
+                with self._lock:
+                    if self._resets.get(key, 0) != resets[key]:
+                        # Reset since the buffer was taken: the delta is void
+                        continue
+                count = self.store.increment(key[0], key[1], delta)
+                with self._lock:
+                    if count is None:
+                        # Keep the delta for the next flush
+                        self.store_errors += 1
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                    else:
+                        self._cache[key] = (count, time.monotonic())
+                        written += 1
+        if written:
+            with self._lock:
+                self.flushes += 1
+        return written
+
+    def _ensure_flusher(self) -> None:
+        # Started lazily, and again in a worker forked after it was started
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name='warning-counter-flush', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing warning counts: {e}")
+
+    def close(self) -> None:
+        """Stop the flusher and write out everything still buffered."""
+        self._stop.set()
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            self._flusher.join(timeout=self.flush_interval + 1)
+        self._flusher = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'store': type(self.store).__name__,
+                'write_behind': self.write_behind,
+                'cached': len(self._cache),
+                'pending': sum(self._pending.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'flushes': self.flushes,
+                'store_errors': self.store_errors
+            }
+
+
+# Counter used by the exam routes
+_warning_counter = WarningCounter(MongoCounterStore())
+
+
+def set_warning_counter(counter: WarningCounter) -> None:
+    """Replace the process-wide counter, flushing the previous one."""
+    global _warning_counter
+    previous, _warning_counter = _warning_counter, counter
+    if previous is not counter:
+        previous.close()
+
+
+def get_warning_counter() -> WarningCounter:
+    return _warning_counter
+
+
+def create_warning_counter(config: Dict[str, Any], instance_path: str = '.') -> WarningCounter:
+    """Build the counter described by the WARNING_COUNTER_* app config."""
+    if config.get('WARNING_COUNTER_BACKEND', 'mongo') == 'local':
+        path = config.get('WARNING_COUNTER_PATH') or os.path.join(instance_path, 'warning_counters.sqlite3')
+        store = SQLiteCounterStore(path)
+    else:
+        store = MongoCounterStore()
+    return WarningCounter(
+        store,
+        cache_ttl=config.get('WARNING_COUNTER_CACHE_TTL', 1.0),
+        write_behind=config.get('WARNING_COUNTER_WRITE_BEHIND', False),
+        flush_interval=config.get('WARNING_COUNTER_FLUSH_INTERVAL', 1.0)
+    )
@@ -0,0 +1,2 @@
+# Offline performance benchmarks for the proctoring pipeline.
+# Run from the project root, e.g. `python -m benchmarks.face_mesh_pool clip.mp4`
@@ -0,0 +1,83 @@
+"""
+Load benchmark for face detection with many concurrent exam streams.
+
+Each simulated stream is a thread submitting frames at a fixed rate for a
+fixed duration, first with in-process detection per request and then via
+the BatchDetectionEngine process pool.
+
+Usage: python -m benchmarks.batch_detection [streams=50,200] [seconds=10] [fps=2]
+"""
+import contextlib
+import io
+import sys
+import threading
+import time
+
+import numpy as np
+
+from app.utils import face_detection
+from app.utils.batch_engine import BatchDetectionEngine
+from benchmarks.common import load_frames
+
+
+def run_streams(streams, seconds, fps, frames):
+    """Drive `streams` concurrent senders and collect per-frame latency."""
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def sender(index):
+        interval = 1.0 / fps
+        next_send = time.perf_counter() + (index % 10) * interval / 10
+        i = index
+        local = []
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            if now < next_send:
+                time.sleep(next_send - now)
+            start = time.perf_counter()
+            face_detection.detect_multiple_persons(frames[i % len(frames)])
+            local.append(time.perf_counter() - start)
+            i += 1
+            next_send += interval
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=sender, args=(i,)) for i in range(streams)]
+    start = time.perf_counter()
+    # Engine timeouts fall back to in-process detection and print a notice
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(latencies, [50, 95]) * 1000
+
+
+def main():
+    stream_counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else '50,200').split(',')]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    fps = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+    frames = load_frames(None, 30)
+
+    print(f"{'mode':10s} {'streams':>8s} {'offered':>9s} {'frames/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s}")
+    for streams in stream_counts:
+        face_detection.set_batch_engine(None)
+        throughput, (p50, p95) = run_streams(streams, seconds, fps, frames)
+        print(f"{'direct':10s} {streams:8d} {streams * fps:9.0f} {throughput:9.1f} {p50:8.1f} {p95:8.1f}")
+
+        engine = BatchDetectionEngine()
+        engine.start()
+        engine.detect(frames[0])  # spin up the workers before measuring
+        face_detection.set_batch_engine(engine)
+        throughput, (p50, p95) = run_streams(streams, seconds, fps, frames)
+        print(f"{'batched':10s} {streams:8d} {streams * fps:9.0f} {throughput:9.1f} {p50:8.1f} {p95:8.1f}"
+              f"   {engine.stats()}")
+        face_detection.set_batch_engine(None)
+
+
+if __name__ == '__main__':
+    main()
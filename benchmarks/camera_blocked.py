@@ -0,0 +1,93 @@
+"""
+Throughput of student-side camera blocking detection: every statistic
+computed with NumPy against the probe that now answers first, computing
+only the statistics the result depends on, plus a parity check of both
+over normal, dark, bright, flat, noisy and striped frames.
+
+Usage: python -m benchmarks.camera_blocked [clip.mp4] [max_frames]
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.utils import student_analysis
+from app.utils.frame_context import FrameContext
+from benchmarks.common import load_frames
+
+
+def full_analysis(frame):
+    """detect_camera_blocked with the probe disabled."""
+    probe = student_analysis._camera_blocked_probe
+    student_analysis._camera_blocked_probe = lambda frame, context=None: None
+    try:
+        return student_analysis.detect_camera_blocked(frame, FrameContext(frame))
+    finally:
+        student_analysis._camera_blocked_probe = probe
+
+
+def parity_frames(frames, seed=0):
+    """The clip plus frames at and around every blocking threshold."""
+    rng = np.random.default_rng(seed)
+    h, w = frames[0].shape[:2]
+    cases = list(frames)
+    for level in list(range(0, 50, 2)) + list(range(200, 256, 3)):
+        flat = np.full((h, w, 3), level, np.uint8)
+        cases.append(flat)
+        noise = rng.normal(level, 6, size=(h, w, 3))
+        cases.append(np.clip(noise, 0, 255).astype(np.uint8))
+    for frame in frames[:10]:
+        # Hand over the lens, lights off, overexposed, washed out
+        cases.append(cv2.GaussianBlur(frame, (0, 0), 25))
+        cases.append((frame * 0.1).astype(np.uint8))
+        cases.append(cv2.convertScaleAbs(frame, alpha=0.3, beta=190))
+        cases.append(cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR))
+    # A dark frame with a few bright pixels, which the probe may not see
+    speckled = np.full((h, w, 3), 10, np.uint8)
+    speckled[1::7, 3::11] = 255
+    cases.append(speckled)
+    # Periodic content that a strided sample sees as all bright
+    striped = np.full((h, w, 3), 10, np.uint8)
+    striped[::4] = 255
+    cases.append(striped)
+    cases.append(rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8))
+    return cases
+
+
+def check_parity(cases):
+    """Assert identical results on every case."""
+    for frame in cases:
+        expected = full_analysis(frame)
+        actual = student_analysis.detect_camera_blocked(frame, FrameContext(frame))
+        assert actual[0] == expected[0] and actual[2] == expected[2], (expected, actual)
+        assert abs(actual[1] - expected[1]) < 1e-6, (expected, actual)
+
+
+def fps(fn, frames, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            fn(frame)
+    return repeat * len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    frames = load_frames(source, limit)
+
+    cases = parity_frames(frames)
+    check_parity(cases)
+    print(f"parity: {len(cases)} frames identical")
+
+    probed = lambda frame: student_analysis.detect_camera_blocked(frame, FrameContext(frame))
+    print(f"frames: {len(frames)} ({source or 'synthetic'}) {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'':12s} {'full fps':>10s} {'probe fps':>10s} {'speedup':>8s}")
+    for label, sample in (('clip', frames), ('all cases', cases)):
+        before, after = fps(full_analysis, sample), fps(probed, sample)
+        print(f"{label:12s} {before:10.0f} {after:10.0f} {after / before:7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
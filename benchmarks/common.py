@@ -0,0 +1,114 @@
+import importlib
+import os
+import sys
+import time
+from types import ModuleType
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def load_route_module(name: str) -> ModuleType:
+    """
+    Import app.routes.<name> without running app/routes/__init__.py.
+
+    The package __init__ imports every blueprint, so one route module that
+    fails to import would stop benchmarks of the others.
+    """
+    if 'app.routes' not in sys.modules:
+        import app
+        package = ModuleType('app.routes')
+        package.__path__ = [os.path.join(os.path.dirname(app.__file__), 'routes')]
+        sys.modules['app.routes'] = package
+    return importlib.import_module(f'app.routes.{name}')
+
+
+def load_frames(source: Optional[str] = None, limit: int = 120,
+                width: int = 640, height: int = 480) -> List[np.ndarray]:
+    """
+    Load frames from a recorded clip, or synthesise a moving scene.
+
+    Args:
+        source: Path to a video file, or None for synthetic frames
+        limit: Maximum number of frames to load
+        width: Frame width for synthetic frames
+        height: Frame height for synthetic frames
+
+    Returns:
+        List of BGR frames
+    """
+    if source:
+        capture = cv2.VideoCapture(source)
+        frames = []
+        try:
+            while len(frames) < limit:
+                success, frame = capture.read()
+                if not success:
+                    break
+                frames.append(frame)
+        finally:
+            capture.release()
+        if not frames:
+            raise SystemExit(f"Could not read any frames from {source}")
+        return frames
+
+    rng = np.random.default_rng(0)
+    background = rng.integers(40, 200, (height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (0, 0), 8)
+    frames = []
+    for i in range(limit):
+        frame = background.copy()
+        cx = width // 2 + int(20 * np.sin(i / 10.0))
+        cv2.ellipse(frame, (cx, height // 2), (80, 110), 0, 0, 360, (150, 180, 220), -1)
+        cv2.circle(frame, (cx - 30, height // 2 - 25), 10, (40, 40, 40), -1)
+        cv2.circle(frame, (cx + 30, height // 2 - 25), 10, (40, 40, 40), -1)
+        frames.append(frame)
+    return frames
+
+
+def measure_fps(fn: Callable[[np.ndarray], object], frames: List[np.ndarray]) -> float:
+    """Run `fn` over every frame and return the achieved frames per second."""
+    start = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed if elapsed > 0 else float('inf')
+
+
+class ReplayCamera:
+    """
+    cv2.VideoCapture stand-in that plays a list of frames, so a
+    FramePipeline can run without a camera.
+
+    Args:
+        frames: Frames to play, once
+        fps: Playback rate; 0 returns frames as fast as they are read
+    """
+
+    def __init__(self, frames: List[np.ndarray], fps: float = 24):
+        self.frames = frames
+        self.interval = 1.0 / fps if fps else 0.0
+        self.position = 0
+        self._next = None
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= len(self.frames)
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.finished:
+            return False, None
+        now = time.perf_counter()
+        if self._next is not None and now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next or now) + self.interval
+        frame = self.frames[self.position]
+        self.position += 1
+        return True, frame
+
+    def set(self, prop: int, value: float) -> bool:
+        return False
+
+    def release(self) -> None:
+        self.position = len(self.frames)
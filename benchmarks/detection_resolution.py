@@ -0,0 +1,82 @@
+"""
+Sweep the Haar cascade working resolution, scale step and minimum face
+size against detection time and agreement with the previous full
+resolution scan (scaleFactor 1.1, minSize 30x30).
+
+Agreement is measured per frame as an equal face count, and per face as
+a box from the reference scan matched by one with IoU >= 0.5. Without a
+clip, the samples are the synthetic frames, the same frames with a second
+person, faces at a larger distance, and empty frames.
+
+Usage: python -m benchmarks.detection_resolution [clip.mp4] [max_frames]
+"""
+import itertools
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.cascade_settings import CascadeSettings
+from app.utils.face_detection import face_cascade
+from benchmarks.common import load_frames
+from benchmarks.face_tracking import with_visitor
+
+
+def sample_frames(source, limit):
+    frames = load_frames(source, limit)
+    if source:
+        return frames
+    samples = list(frames[::2]) + with_visitor(frames)[len(frames) // 3::3]
+    # The student sitting further back: the whole scene at 60%, padded
+    for frame in frames[::6]:
+        small = cv2.resize(frame, None, fx=0.6, fy=0.6, interpolation=cv2.INTER_AREA)
+        far = np.full_like(frame, int(frame.mean()))
+        y, x = (frame.shape[0] - small.shape[0]) // 2, (frame.shape[1] - small.shape[1]) // 2
+        far[y:y + small.shape[0], x:x + small.shape[1]] = small
+        samples.append(far)
+    empty = cv2.GaussianBlur(frames[0], (0, 0), 30)
+    samples.extend([empty] * 5)
+    return samples
+
+
+def iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    return inter / float(a[2] * a[3] + b[2] * b[3] - inter)
+
+
+def run(settings, grays):
+    start = time.perf_counter()
+    boxes = [settings.scan(face_cascade, gray) for gray in grays]
+    return 1e3 * (time.perf_counter() - start) / len(grays), boxes
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in sample_frames(source, limit)]
+    height = grays[0].shape[0]
+
+    run(CascadeSettings(), grays[:5])  # warm up
+    reference_ms, reference = run(CascadeSettings(), grays)
+    faces = sum(len(boxes) for boxes in reference)
+    print(f"samples: {len(grays)} frames, {faces} reference faces, {reference_ms:.1f} ms/frame at full resolution")
+    print(f"{'width':>6s} {'scale':>6s} {'min face':>9s} {'ms':>7s} {'speedup':>8s} {'counts':>7s} {'boxes':>7s}")
+
+    widths = (640, 480, 320, 240, 160)
+    steps = (1.1, 1.2, 1.3)
+    min_faces = (30 / 480, 0.15, 0.25)
+    for width, step, min_face in itertools.product(widths, steps, min_faces):
+        settings = CascadeSettings(working_width=width, scale_factor=step, min_face_ratio=min_face)
+        ms, boxes = run(settings, grays)
+        counts = np.mean([len(a) == len(b) for a, b in zip(reference, boxes)])
+        matched = sum(any(iou(r, b) >= 0.5 for b in found)
+                      for expected, found in zip(reference, boxes) for r in expected)
+        print(f"{width:6d} {step:6.2f} {int(min_face * height):6d} px {ms:7.2f} {reference_ms / ms:7.1f}x "
+              f"{100 * counts:6.1f}% {100 * matched / max(1, faces):6.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Per-event cost of violation reports: a POST to the procrastination-check
+route (before) against a message on the exam Socket.IO namespace.
+
+Each POST loads the filesystem session and the logged-in user; the
+user lookup is simulated with a fixed delay standing in for the MongoDB
+query. The socket connection does both once, at connect. Both run
+in-process through the Flask and Socket.IO test clients, so network
+time is left out on both sides.
+
+The socket replies must match the HTTP responses, and reaching the
+warning limit must push an auto_submit command to the student's room.
+
+Usage: python -m benchmarks.exam_channel [events] [lookup_ms]
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+from flask import Flask, abort, jsonify, request
+from flask_login import LoginManager, UserMixin, current_user, login_required, login_user
+from flask_session import Session
+
+from app import socketio
+from app.utils.exam_channel import EXAM_NAMESPACE, ExamNamespace
+from app.utils.procrastination import MAX_WARNINGS, check_violations, clean_poll_response
+from app.utils.violation_buffer import ViolationBuffer, set_violation_buffer
+from app.utils.warning_counter import SQLiteCounterStore, WarningCounter, get_warning_counter, set_warning_counter
+
+from benchmarks.procrastination_check import CLEAN, VIOLATING
+
+EXAM = 'exam-1'
+
+
+class Student(UserMixin):
+    role = 'student'
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+def create_app(directory, lookup):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='benchmark', SESSION_TYPE='filesystem', SESSION_FILE_DIR=directory)
+    Session(app)
+    login_manager = LoginManager(app)
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        time.sleep(lookup)
+        return Student(user_id)
+
+    @app.route('/login/<user_id>')
+    def login(user_id):
+        login_user(Student(user_id))
+        return 'ok'
+
+    @app.route('/student/exam/<exam_id>/procrastination-check', methods=['POST'])
+    @login_required
+    def procrastination_check(exam_id):
+        if current_user.role != 'student':
+            abort(403)
+        data = request.get_json()
+        body = clean_poll_response(current_user.id, exam_id, data)
+        if body is not None:
+            return app.response_class(body, mimetype='application/json')
+        return jsonify(check_violations(current_user.id, exam_id, data))
+
+    socketio.init_app(app, async_mode='threading')
+    socketio.on_namespace(ExamNamespace())
+    return app
+
+
+def connect(app, user_id):
+    client = app.test_client()
+    client.get(f"/login/{user_id}")
+    channel = socketio.test_client(app, namespace=EXAM_NAMESPACE, flask_test_client=client,
+                                   auth={'exam_id': EXAM})
+    assert channel.is_connected(EXAM_NAMESPACE)
+    return client, channel
+
+
+def events_per_second(send, payload, events, user_id):
+    seconds = []
+    for i in range(events):
+        if i % (MAX_WARNINGS // 2) == 0:
+            # Stay below the auto-submit limit; not timed
+            get_warning_counter().reset(user_id, EXAM)
+        start = time.perf_counter()
+        send(payload)
+        seconds.append(time.perf_counter() - start)
+    seconds = np.asarray(seconds)
+    return 1 / seconds.mean(), 1e3 * np.percentile(seconds, 50)
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    lookup = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 1.0 / 1e3
+
+    with tempfile.TemporaryDirectory() as directory:
+        set_warning_counter(WarningCounter(SQLiteCounterStore(f"{directory}/counters.sqlite3")))
+        set_violation_buffer(ViolationBuffer(write=lambda records: None))
+        app = create_app(f"{directory}/sessions", lookup)
+        client, channel = connect(app, 'student-1')
+        url = f"/student/exam/{EXAM}/procrastination-check"
+
+        def post(payload):
+            response = client.post(url, json=payload)
+            assert response.status_code == 200
+            return response.get_json()
+
+        def emit(payload):
+            return channel.emit('poll', payload, namespace=EXAM_NAMESPACE, callback=True)
+
+        # Same replies on both channels
+        for payload in (CLEAN, VIOLATING):
+            get_warning_counter().reset('student-1', EXAM)
+            over_http = post(payload)
+            get_warning_counter().reset('student-1', EXAM)
+            over_socket = emit(payload)
+            for violation in over_http['violations'] + over_socket['violations']:
+                violation.pop('timestamp')
+            assert over_socket == over_http, (over_socket, over_http)
+
+        # The warning limit pushes auto_submit to every page of the student
+        _, other_page = connect(app, 'student-1')
+        get_warning_counter().reset('student-1', EXAM)
+        while not emit(VIOLATING)['autoSubmit']:
+            pass
+        pushed = [message for message in other_page.get_received(EXAM_NAMESPACE) if message['name'] == 'auto_submit']
+        assert pushed and pushed[0]['args'][0]['warningCount'] == MAX_WARNINGS, pushed
+        other_page.disconnect(EXAM_NAMESPACE)
+        print(f"socket replies match HTTP; auto_submit pushed at {MAX_WARNINGS} warnings")
+
+        print(f"\n{events} events, {1e3 * lookup:.1f} ms user lookup")
+        print(f"{'poll':10s} {'channel':10s} {'events/s':>9s} {'p50 ms':>8s}")
+        for label, payload in (('clean', CLEAN), ('violating', VIOLATING)):
+            for channel_label, send in (('HTTP', post), ('Socket.IO', emit)):
+                rate, p50 = events_per_second(send, payload, events, 'student-1')
+                print(f"{label:10s} {channel_label:10s} {rate:9.0f} {p50:8.3f}")
+        channel.disconnect(EXAM_NAMESPACE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Compare detect_neck_movement throughput with a FaceMesh graph built per frame
+against the pooled, long-lived graph.
+
+Usage: python -m benchmarks.face_mesh_pool [clip.mp4] [max_frames]
+"""
+import sys
+
+import cv2
+
+from app.utils import pose_analysis
+from benchmarks.common import load_frames, measure_fps
+
+
+def per_frame_graph(frame):
+    """The previous behaviour: a fresh FaceMesh for every frame."""
+    with pose_analysis._create_face_mesh() as face_mesh:
+        return face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    frames = load_frames(source, limit)
+
+    before = measure_fps(per_frame_graph, frames)
+    # Warm the pool so graph construction is not counted
+    pose_analysis.detect_neck_movement(frames[0], stream_key='benchmark')
+    after = measure_fps(lambda f: pose_analysis.detect_neck_movement(f, stream_key='benchmark'), frames)
+
+    print(f"frames: {len(frames)} ({source or 'synthetic'})")
+    print(f"per-frame FaceMesh: {before:8.1f} fps")
+    print(f"pooled FaceMesh:    {after:8.1f} fps")
+    print(f"speedup:            {after / before:8.2f}x")
+    print(f"pool: {pose_analysis.face_mesh_pool.stats()}")
+
+
+if __name__ == '__main__':
+    main()
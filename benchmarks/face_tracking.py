@@ -0,0 +1,66 @@
+"""
+Per-frame face detection cost with a full Haar scan on every frame against
+the detect-then-track FaceTracker, and how often both report the same
+face count (the input of the multiple-people rule).
+
+Without a clip, two synthetic scenes are replayed: one student, and one
+where a second person walks in halfway and leaves again.
+
+Usage: python -m benchmarks.face_tracking [clip.mp4] [max_frames] [refresh]
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.face_detection import detect_faces
+from app.utils.face_tracker import FaceTracker
+from app.utils.frame_context import FrameContext
+from benchmarks.common import load_frames
+
+
+def with_visitor(frames):
+    """Paste a second face into the middle third of the frames."""
+    face = frames[0][130:360, 220:420]
+    scenes = []
+    for i, frame in enumerate(frames):
+        frame = frame.copy()
+        if len(frames) // 3 + 3 <= i < 2 * len(frames) // 3 + 3:
+            x = 20 + (i % 20)
+            small = cv2.resize(face, (150, 172))
+            frame[40:212, x:x + 150] = small
+        scenes.append(frame)
+    return scenes
+
+
+def replay(frames, tracker=None):
+    """Mean milliseconds per frame and the face count of each frame."""
+    counts = []
+    start = time.perf_counter()
+    for frame in frames:
+        counts.append(len(detect_faces(frame, FrameContext(frame), tracker)))
+    return 1e3 * (time.perf_counter() - start) / len(frames), counts
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    refresh = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    frames = load_frames(source, limit)
+    scenes = {'clip': frames} if source else {'one student': frames, 'visitor': with_visitor(frames)}
+
+    print(f"refresh interval: {refresh} frames")
+    print(f"{'scene':12s} {'full ms':>8s} {'tracked ms':>11s} {'speedup':>8s} {'counts agree':>13s} {'full scans':>11s}")
+    for name, scene in scenes.items():
+        full, expected = replay(scene)
+        tracker = FaceTracker(refresh)
+        tracked, actual = replay(scene, tracker)
+        agree = np.mean([a == b for a, b in zip(expected, actual)])
+        scans = sum(tracker.stats()['full_scans'].values())
+        print(f"{name:12s} {full:8.2f} {tracked:11.2f} {full / tracked:7.2f}x {100 * agree:12.1f}% {scans:11d}")
+        print(f"{'':12s} faces per frame: full {sorted(set(expected))}, tracked {sorted(set(actual))}")
+
+
+if __name__ == '__main__':
+    main()
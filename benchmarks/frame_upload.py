@@ -0,0 +1,65 @@
+"""
+Compare upload size and server-side decode time of the base64 JSON frame
+upload (/proctor/verify_image) with binary uploads (/proctor/verify_frame).
+
+Usage: python -m benchmarks.frame_upload [clip.mp4] [max_frames]
+"""
+import base64
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.frame_codec import decode_base64_frame, decode_frame_buffer
+from benchmarks.common import load_frames
+
+
+def encode_variants(frame, quality=80):
+    """Encoded uploads for one frame, keyed by variant name."""
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    _, jpeg = cv2.imencode('.jpg', frame, params)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    _, gray_jpeg = cv2.imencode('.jpg', gray, params)
+    small = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+    _, small_jpeg = cv2.imencode('.jpg', small, params)
+
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg.tobytes()).decode('ascii')
+    return {
+        'base64 json': json.dumps({'image_data': data_url}).encode(),
+        'binary jpeg': jpeg.tobytes(),
+        'binary gray': gray_jpeg.tobytes(),
+        'binary gray 1/2': small_jpeg.tobytes()
+    }
+
+
+def decode_json(body):
+    """The verify_image path: JSON parse, then base64 + PIL decode."""
+    return decode_base64_frame(json.loads(body)['image_data'])
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    frames = load_frames(source, limit)
+    uploads = [encode_variants(frame) for frame in frames]
+
+    print(f"frames: {len(frames)} ({source or 'synthetic'}) {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'upload':18s} {'bytes/frame':>12s} {'decode us':>10s} {'decoded':>14s}")
+    for name in uploads[0]:
+        decode = decode_json if name == 'base64 json' else decode_frame_buffer
+        bodies = [upload[name] for upload in uploads]
+        decode(bodies[0])  # warm up
+
+        start = time.perf_counter()
+        for body in bodies:
+            decoded = decode(body)
+        elapsed = time.perf_counter() - start
+
+        size = np.mean([len(body) for body in bodies])
+        print(f"{name:18s} {size:12.0f} {1e6 * elapsed / len(bodies):10.0f} {str(decoded.shape):>14s}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Cost of the MJPEG encode stage: the previous default cv2.imencode plus a
+concatenated multipart part per viewer, against JpegEncoder at a few
+quality and width settings with the parts yielded separately.
+
+Reports encode time, bytes per frame and the bandwidth one viewer needs
+at the configured FPS, and the frame rate a viewer gets under a
+bandwidth cap.
+
+Usage: python -m benchmarks.jpeg_encoding [clip.mp4] [max_frames] [viewers]
+"""
+import sys
+import time
+
+import cv2
+
+from app.utils.jpeg_encoder import BitrateLimiter, JpegEncoder, multipart_parts
+from benchmarks.common import load_frames
+
+FPS = 24
+
+
+def legacy_stream(frame, viewers):
+    """Default imencode, then one concatenated part per viewer."""
+    _, buffer = cv2.imencode('.jpg', frame)
+    jpeg = buffer.tobytes()
+    parts = [b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n' for _ in range(viewers)]
+    return len(jpeg), sum(len(part) for part in parts)
+
+
+def encoder_stream(encoder, frame, viewers):
+    jpeg = encoder.encode(frame)
+    parts = [chunk for _ in range(viewers) for chunk in multipart_parts(jpeg)]
+    return len(jpeg), sum(len(part) for part in parts)
+
+
+def measure(stream, frames, viewers):
+    """Milliseconds per frame and mean JPEG size."""
+    sizes = []
+    start = time.perf_counter()
+    for frame in frames:
+        size, written = stream(frame, viewers)
+        assert written >= size * viewers
+        sizes.append(size)
+    return 1e3 * (time.perf_counter() - start) / len(frames), sum(sizes) / len(sizes)
+
+
+def capped_fps(size, max_kbps, seconds=10):
+    """Frames per second one viewer receives at FPS under a bandwidth cap."""
+    limiter = BitrateLimiter(max_kbps)
+    sent = sum(limiter.allow(int(size), now=i / FPS) for i in range(seconds * FPS))
+    return sent / seconds
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    viewers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    frames = load_frames(source, limit)
+    print(f"frames: {len(frames)} at {frames[0].shape[1]}x{frames[0].shape[0]}, {viewers} viewers, {FPS} fps")
+
+    configs = [('before (q95, concat)', lambda f, v: legacy_stream(f, v))]
+    for quality, width in ((95, None), (80, None), (70, None), (80, 480), (70, 320)):
+        encoder = JpegEncoder(quality=quality, max_width=width)
+        label = f"q{quality}, {width or frames[0].shape[1]} px"
+        configs.append((label, lambda f, v, encoder=encoder: encoder_stream(encoder, f, v)))
+
+    print(f"{'encode':22s} {'ms':>6s} {'KB/frame':>9s} {'kbit/s':>8s} {'fps @1000':>10s} {'fps @500':>9s}")
+    for label, stream in configs:
+        stream(frames[0], viewers)  # warm up
+        ms, size = measure(stream, frames, viewers)
+        kbps = size * 8 * FPS / 1000
+        print(f"{label:22s} {ms:6.2f} {size / 1024:9.1f} {kbps:8.0f} "
+              f"{capped_fps(size, 1000):10.1f} {capped_fps(size, 500):9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Per-frame landmark feature extraction time: the previous per-landmark
+Python code of detect_neck_movement and detect_looking_away against one
+LandmarkFeatures extraction shared by both.
+
+Landmarks come from FaceMesh on the given clip; when no face is found
+(e.g. on the synthetic frames) a synthetic landmark set is used.
+
+Usage: python -m benchmarks.landmark_features [clip.mp4] [max_frames]
+"""
+import sys
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from app.utils.landmark_features import HEAD_MODEL_POINTS, LandmarkFeatures
+from benchmarks.common import load_frames
+
+
+def legacy_features(landmarks, img_w, img_h, with_pose=True):
+    """The previous extraction: landmark objects, Python lists and sums."""
+    def calculate_ear(eye):
+        a = np.linalg.norm(np.array([eye[1].x, eye[1].y]) - np.array([eye[5].x, eye[5].y]))
+        b = np.linalg.norm(np.array([eye[2].x, eye[2].y]) - np.array([eye[4].x, eye[4].y]))
+        c = np.linalg.norm(np.array([eye[0].x, eye[0].y]) - np.array([eye[3].x, eye[3].y]))
+        return (a + b) / (2.0 * c)
+
+    # detect_neck_movement
+    nose_tip, chin = landmarks[1], landmarks[175]
+    left_eye_outer, right_eye_outer = landmarks[33], landmarks[263]
+    left_eye = [landmarks[i] for i in [33, 160, 158, 133, 153, 144]]
+    right_eye = [landmarks[i] for i in [362, 385, 387, 263, 373, 380]]
+    avg_ear = (calculate_ear(left_eye) + calculate_ear(right_eye)) / 2.0
+    face_2d = [[nose_tip.x * img_w, nose_tip.y * img_h],
+               [chin.x * img_w, chin.y * img_h],
+               [left_eye_outer.x * img_w, left_eye_outer.y * img_h],
+               [right_eye_outer.x * img_w, right_eye_outer.y * img_h],
+               [landmarks[61].x * img_w, landmarks[61].y * img_h],
+               [landmarks[291].x * img_w, landmarks[291].y * img_h]]
+    face_2d = np.array(face_2d, dtype=np.float64)
+    angles = (0.0, 0.0, 0.0)
+    if with_pose:
+        cam_matrix = np.array([[img_w, 0, img_h / 2], [0, img_w, img_w / 2], [0, 0, 1]])
+        _, rot_vec, _ = cv2.solvePnP(HEAD_MODEL_POINTS, face_2d, cam_matrix, np.zeros((4, 1)))
+        angles = cv2.RQDecomp3x3(cv2.Rodrigues(rot_vec)[0])[0]
+
+    # detect_looking_away
+    left = [landmarks[i] for i in [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]]
+    right = [landmarks[i] for i in [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]]
+    left_cx = sum([lm.x for lm in left]) / len(left)
+    left_cy = sum([lm.y for lm in left]) / len(left)
+    right_cx = sum([lm.x for lm in right]) / len(right)
+    right_cy = sum([lm.y for lm in right]) / len(right)
+    gaze_x = ((landmarks[159].x - left_cx) + (landmarks[386].x - right_cx)) / 2
+    gaze_y = ((landmarks[159].y - left_cy) + (landmarks[386].y - right_cy)) / 2
+    nose, l_outer, r_outer = landmarks[1], landmarks[33], landmarks[263]
+    asymmetry = abs((nose.x - l_outer.x) - (r_outer.x - nose.x))
+
+    return avg_ear, (angles[0] * 360, angles[1] * 360, angles[2] * 360), (gaze_x, gaze_y), asymmetry
+
+
+def shared_features(landmarks, img_w, img_h, with_pose=True):
+    """One array extraction shared by both detectors."""
+    features = LandmarkFeatures.from_landmarks(landmarks, (img_w, img_h))
+    pose = features.head_pose() if with_pose else features.head_pose_image_points
+    return float(features.ear.mean()), pose, tuple(features.gaze), features.face_asymmetry
+
+
+def synthetic_landmarks(seed=0):
+    """A plausible face: points scattered around the frame centre."""
+    rng = np.random.default_rng(seed)
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z in rng.normal([0.5, 0.5, 0.0], [0.08, 0.1, 0.02], size=(468, 3)):
+        landmark_list.landmark.add(x=x, y=y, z=z)
+    return landmark_list.landmark
+
+
+def collect_landmarks(frames):
+    """FaceMesh landmarks of every frame with a face, and the mean FaceMesh time."""
+    with mp.solutions.face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1) as face_mesh:
+        found = []
+        start = time.perf_counter()
+        for frame in frames:
+            results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if results.multi_face_landmarks:
+                found.append(results.multi_face_landmarks[0].landmark)
+        return found, 1e6 * (time.perf_counter() - start) / len(frames)
+
+
+def time_per_call(fn, samples, img_w, img_h, with_pose, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for landmarks in samples:
+            fn(landmarks, img_w, img_h, with_pose)
+    return 1e6 * (time.perf_counter() - start) / (repeat * len(samples))
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    frames = load_frames(source, limit)
+    img_h, img_w = frames[0].shape[:2]
+
+    samples, mesh_us = collect_landmarks(frames)
+    origin = 'facemesh'
+    if not samples:
+        samples = [synthetic_landmarks(seed) for seed in range(len(frames))]
+        origin = 'synthetic'
+
+    # Both paths must agree before their timings mean anything
+    for landmarks in samples:
+        old, new = legacy_features(landmarks, img_w, img_h), shared_features(landmarks, img_w, img_h)
+        assert abs(old[0] - new[0]) < 1e-4, (old[0], new[0])
+        assert np.allclose(old[2], new[2], atol=1e-5), (old[2], new[2])
+        assert abs(old[3] - new[3]) < 1e-5, (old[3], new[3])
+        assert np.allclose(old[1], new[1], atol=0.5), (old[1], new[1])
+
+    print(f"landmark sets: {len(samples)} ({origin})")
+    print(f"{'':22s} {'per-landmark':>13s} {'shared array':>13s} {'speedup':>8s}")
+    # solvePnP is the same call on both paths and dominates when included
+    for label, with_pose in (('features', False), ('features + head pose', True)):
+        before = time_per_call(legacy_features, samples, img_w, img_h, with_pose)
+        after = time_per_call(shared_features, samples, img_w, img_h, with_pose)
+        print(f"{label:22s} {before:10.1f} us {after:10.1f} us {before / after:7.2f}x")
+    # Each detector used to run FaceMesh itself; now one run feeds both
+    before, after = 2 * mesh_us + before, mesh_us + after
+    print(f"{'incl. FaceMesh runs':22s} {before:10.1f} us {after:10.1f} us {before / after:7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Replay an exam session through the proctoring analysis with and without
+the motion gate, and report the share of frames skipped, the CPU time
+saved and how often the gated results agree with a full analysis.
+
+Without a clip, a session is synthesised: a student sitting still (the
+same frame plus sensor noise) with short bursts of head movement and a
+few seconds away from the camera.
+
+Usage: python -m benchmarks.motion_gate [clip.mp4] [max_frames]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.utils import student_analysis
+from app.utils.frame_context import FrameContext
+from app.utils.frame_processing import process_frame
+from app.utils.motion_gate import MotionGate
+from app.utils.proctor_session import ProctorSession
+from benchmarks.common import load_frames
+
+
+def synthetic_session(limit, seed=0):
+    """Mostly still frames, with movement bursts and an absence."""
+    rng = np.random.default_rng(seed)
+    moving = load_frames(None, 60)
+    empty = moving[0].copy()
+    empty[120:360, 200:440] = empty[120:360, 200:440].mean(axis=(0, 1)).astype(np.uint8)
+
+    frames = []
+    pose = 0
+    for i in range(limit):
+        phase = (i // 40) % 6
+        if phase == 2:
+            pose = (pose + 1) % len(moving)   # head movement
+            frame = moving[pose]
+        elif phase == 4:
+            frame = empty                     # student away
+        else:
+            frame = moving[pose]              # sitting still
+        noise = rng.integers(-2, 3, size=frame.shape, dtype=np.int16)
+        frames.append(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def replay(frames, analyse, gate=None):
+    """CPU seconds per frame and the per-frame face counts."""
+    counts = []
+    start = time.process_time()
+    for frame in frames:
+        context = FrameContext(frame)
+        if gate is not None and not gate.should_analyze(context):
+            counts.append(gate.result)
+            continue
+        count = analyse(frame, context)
+        if gate is not None:
+            gate.store(count)
+        counts.append(count)
+    return (time.process_time() - start) / len(frames), counts
+
+
+def proctor_analysis(frame, context):
+    """The upload path: cascade faces and FaceMesh neck movement."""
+    _, metadata = process_frame(frame, stream_key='replay', context=context, session=replay_session,
+                                annotate=False)
+    return metadata['multiple_people'][1]
+
+
+def student_side(frame, context):
+    """All student-side detectors, the motion gate disabled inside."""
+    student_analysis.extract_face_features(frame, context, 'replay')
+    _, count, _, _ = student_analysis.detect_multiple_persons(frame, context, 'replay')
+    student_analysis.detect_camera_blocked(frame, context)
+    return count
+
+
+replay_session = ProctorSession('replay')
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 480
+    frames = load_frames(source, limit) if source else synthetic_session(limit)
+
+    print(f"frames: {len(frames)} ({source or 'synthetic session'})")
+    print(f"{'analysis':14s} {'full ms':>8s} {'gated ms':>9s} {'skipped':>8s} {'cpu saved':>10s} {'agree':>7s}")
+    for name, analyse in (('proctor', proctor_analysis), ('student', student_side)):
+        analyse(frames[0], FrameContext(frames[0]))  # warm up
+        full, expected = replay(frames, analyse)
+        gate = MotionGate()
+        gated, actual = replay(frames, analyse, gate)
+        agree = np.mean([a == b for a, b in zip(expected, actual)])
+        print(f"{name:14s} {1e3 * full:8.2f} {1e3 * gated:9.2f} {100 * gate.skip_ratio:7.1f}% "
+              f"{100 * (1 - gated / full):9.1f}% {100 * agree:6.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Latency of unrelated requests while the server analyses heavy frame traffic.
+
+A server hosts the proctor blueprint: a threaded werkzeug server, or
+socketio.run with eventlet as the app is deployed (no monkey-patching,
+one OS thread serving every client from green threads). Sender threads
+post frames to /proctor/verify_image as fast as they get answers, while a
+prober requests /proctor/camera_status at a fixed rate. The run is
+repeated with in-process analysis and with the AnalysisPool; under
+eventlet also with the pool's result waited for by blocking the hub, as
+before wait_result.
+
+Usage: python -m benchmarks.offload_latency [senders=16] [seconds=10] [workers] [threaded|eventlet]
+"""
+import base64
+import json
+import logging
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import cv2
+import numpy as np
+from flask import Flask
+from werkzeug.serving import make_server
+
+from app.utils import analysis_pool
+from app.utils.analysis_pool import AnalysisPool, set_analysis_pool
+from benchmarks.common import load_frames, load_route_module
+
+
+def run_load(base_url, images, senders, seconds, probe_interval=0.05):
+    """Drive frame senders and a status prober, return the measurements."""
+    stop_at = time.perf_counter() + seconds
+    probe_latencies = []
+    frame_latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def sender(index):
+        i = index
+        while time.perf_counter() < stop_at:
+            # Each sender is one stream whose frames keep changing, so the
+            # motion gate never answers from the last analysis
+            payload = json.dumps({'image_data': images[i % len(images)], 'stream_id': f'bench-{index}'})
+            request = urllib.request.Request(
+                base_url + '/proctor/verify_image', data=payload.encode(),
+                headers={'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+                if status == 429:
+                    time.sleep(float(e.headers.get('Retry-After', 1)) / 10)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    frame_latencies.append(time.perf_counter() - start)
+            i += 1
+
+    def prober():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            with urllib.request.urlopen(base_url + '/proctor/camera_status') as response:
+                response.read()
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(probe_interval)
+
+    threads = [threading.Thread(target=sender, args=(i,)) for i in range(senders)]
+    threads.append(threading.Thread(target=prober))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'probe_ms': np.percentile(probe_latencies, [50, 95, 99]) * 1000,
+        'frames_per_s': len(frame_latencies) / seconds,
+        'frame_p50_ms': float(np.percentile(frame_latencies, 50) * 1000) if frame_latencies else float('nan'),
+        'statuses': statuses
+    }
+
+
+def serve_threaded(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown
+
+
+def serve_eventlet(app):
+    """socketio.run with eventlet, on its own OS thread like the app's main thread."""
+    from flask_socketio import SocketIO
+
+    socketio = SocketIO(app, async_mode='eventlet')
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    threading.Thread(target=socketio.run, args=(app,), kwargs={'host': '127.0.0.1', 'port': port,
+                                                              'log_output': False},
+                     daemon=True).start()
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(50):
+        try:
+            urllib.request.urlopen(base_url + '/proctor/camera_status').read()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return base_url, lambda: None
+
+
+def main():
+    senders = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 and sys.argv[3] else None
+    server = sys.argv[4] if len(sys.argv) > 4 else 'threaded'
+
+    images = []
+    for frame in load_frames(None, 8):
+        # Alternate with the mirrored frame: consecutive uploads differ enough to be analysed
+        for image in (frame, frame[:, ::-1]):
+            _, jpeg = cv2.imencode('.jpg', image)
+            images.append(base64.b64encode(jpeg.tobytes()).decode('ascii'))
+
+    proctor_bp = load_route_module('proctor').proctor_bp
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = Flask(__name__)
+    app.register_blueprint(proctor_bp, url_prefix='/proctor')
+    base_url, shutdown = serve_eventlet(app) if server == 'eventlet' else serve_threaded(app)
+
+    modes = ('in-process', 'pool, blocking wait', 'pool') if server == 'eventlet' else ('in-process', 'pool')
+    in_green_thread = analysis_pool._in_green_thread
+    print(f"server: {server}")
+    print(f"{'mode':20s} {'probe p50':>10s} {'p95':>8s} {'p99':>8s} {'frames/s':>9s} {'frame p50':>10s}  statuses")
+    for mode in modes:
+        pool = None
+        if mode != 'in-process':
+            pool = AnalysisPool(workers=workers)
+            pool.run(time.sleep, 0)  # start the workers before measuring
+        analysis_pool._in_green_thread = (lambda: False) if mode == 'pool, blocking wait' else in_green_thread
+        set_analysis_pool(pool)
+        result = run_load(base_url, images, senders, seconds)
+        p50, p95, p99 = result['probe_ms']
+        print(f"{mode:20s} {p50:10.1f} {p95:8.1f} {p99:8.1f} {result['frames_per_s']:9.1f} "
+              f"{result['frame_p50_ms']:10.1f}  {result['statuses']}")
+        if pool is not None:
+            print(f"{'':20s} pool: {pool.stats()}")
+    analysis_pool._in_green_thread = in_green_thread
+    set_analysis_pool(None)
+    shutdown()
+
+
+if __name__ == '__main__':
+    main()
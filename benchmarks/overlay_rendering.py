@@ -0,0 +1,75 @@
+"""
+Cost of the overlay on the JSON-only path (/proctor/verify_image): the
+previous process_frame, which copied the frame twice and drew the overlay
+on every call, against process_frame(annotate=False). Detection is
+carried over from a first pass so only the overlay work is measured.
+
+Also checks that the in-place overlay is pixel-identical to the previous
+copying one.
+
+Usage: python -m benchmarks.overlay_rendering [clip.mp4] [max_frames]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.utils.face_detection import draw_face_boxes
+from app.utils.frame_processing import add_status_indicators, annotate_frame, process_frame
+from app.utils.proctor_session import ProctorSession
+from benchmarks.common import load_frames
+
+session = ProctorSession('overlay')
+
+
+def legacy_overlay(frame, metadata):
+    """The previous drawing: a copy for process_frame, another in draw_face_boxes."""
+    processed = frame.copy()
+    multiple, _ = metadata.get('multiple_people', (False, 0))
+    processed = draw_face_boxes(processed, metadata.get('face_locations', []), is_multiple=multiple)
+    return add_status_indicators(processed, metadata, session)
+
+
+def json_only(frame, metadata, annotate):
+    """process_frame as verify_image calls it, with detection carried over."""
+    process_frame(frame, stream_key='overlay', detectors=set(), previous=metadata,
+                  session=session, annotate=annotate)
+
+
+def measure(fn, frames, metadata):
+    """Microseconds per call and peak bytes allocated by one call."""
+    start = time.perf_counter()
+    for frame, meta in zip(frames, metadata):
+        fn(frame, meta)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(frames[0], metadata[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return 1e6 * elapsed / len(frames), peak
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    frames = load_frames(source, limit)
+    metadata = [process_frame(frame, stream_key='overlay', session=session, annotate=False)[1]
+                for frame in frames]
+
+    for frame, meta in zip(frames, metadata):
+        assert np.array_equal(legacy_overlay(frame, meta), annotate_frame(frame.copy(), meta, session))
+    print(f"overlay: {len(frames)} frames pixel-identical to the copying version")
+
+    frame_bytes = frames[0].nbytes
+    print(f"{'verify_image overlay':26s} {'us/call':>8s} {'peak alloc':>11s} {'frame copies':>13s}")
+    for label, fn in (('before (copy + draw)', lambda f, m: json_only(f, m, False) or legacy_overlay(f, m)),
+                      ('annotate=True', lambda f, m: json_only(f, m, True)),
+                      ('annotate=False', lambda f, m: json_only(f, m, False))):
+        us, peak = measure(fn, frames, metadata)
+        print(f"{label:26s} {us:8.0f} {peak / 1024:8.0f} KB {peak / frame_bytes:13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Requests per second of one worker answering procrastination polls: every
+poll through check_violations (before) against the clean-poll fast path,
+for clean and for violating polls.
+
+Both run through a Flask test client with the route's request handling,
+minus login. Warning counts live in a SQLite counter store and violation
+records go to a buffer that discards them. The fast path's response must
+match the full check's for the same clean poll.
+
+Run once with logging left unconfigured, as the app does, and once with
+INFO records written to a file.
+
+Usage: python -m benchmarks.procrastination_check [requests] [students]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify, request
+
+from app.utils.procrastination import check_violations, clean_poll_response
+from app.utils.violation_buffer import ViolationBuffer, set_violation_buffer
+from app.utils.warning_counter import SQLiteCounterStore, WarningCounter, set_warning_counter
+
+CLEAN = {
+    'faceData': {'numFaces': 1, 'poseDirection': 'center', 'cameraBlocked': False},
+    'browserData': {'tabSwitched': False, 'windowFocusLost': False},
+    'inputData': {'copyAttempt': False, 'pasteAttempt': False, 'textSelectionAttempt': False,
+                  'suspiciousKeys': False},
+    'totalViolations': 0
+}
+VIOLATING = dict(CLEAN, faceData={'numFaces': 1, 'poseDirection': 'left', 'cameraBlocked': False},
+                 totalViolations=1)
+
+
+def create_app():
+    app = Flask(__name__)
+
+    @app.route('/before/<student_id>/<exam_id>', methods=['POST'])
+    def before(student_id, exam_id):
+        return jsonify(check_violations(student_id, exam_id, request.get_json()))
+
+    @app.route('/after/<student_id>/<exam_id>', methods=['POST'])
+    def after(student_id, exam_id):
+        data = request.get_json()
+        body = clean_poll_response(student_id, exam_id, data)
+        if body is not None:
+            return app.response_class(body, mimetype='application/json')
+        return jsonify(check_violations(student_id, exam_id, data))
+
+    return app
+
+
+def throughput(client, path, payload, requests, students, exams):
+    start = time.perf_counter()
+    for i in range(requests):
+        # Spread warnings so no student reaches the auto-submit limit
+        response = client.post(f"/{path}/student-{i % students}/exam-{i // students % exams}", json=payload)
+        assert response.status_code == 200
+    return requests / (time.perf_counter() - start)
+
+
+def handler_us(fn, requests, students):
+    start = time.perf_counter()
+    for i in range(requests):
+        fn(f"student-{i % students}", 'exam-0', CLEAN)
+    return 1e6 * (time.perf_counter() - start) / requests
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    students = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    # Each violating poll adds a warning: keep every count below the limit
+    # over the four violating runs
+    exams = requests // students // 4 + 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        set_warning_counter(WarningCounter(SQLiteCounterStore(os.path.join(directory, 'counters.sqlite3'))))
+        set_violation_buffer(ViolationBuffer(write=lambda records: None))
+        client = create_app().test_client()
+
+        # Same answer for a clean poll, and the warning count it reports
+        client.post('/before/student-0/exam-0', json=VIOLATING)
+        full = client.post('/before/student-0/exam-0', json=CLEAN).get_json()
+        fast = client.post('/after/student-0/exam-0', json=CLEAN).get_json()
+        assert fast == full and fast['warningCount'] == 1, (fast, full)
+        for student in range(students):
+            for exam in range(exams):
+                client.post(f"/after/student-{student}/exam-{exam}", json=CLEAN)
+
+        log = logging.getLogger('app.utils.procrastination')
+        handler = logging.FileHandler(os.path.join(directory, 'app.log'))
+        print(f"{requests} polls, {students} students, one worker")
+        print(f"{'logging':10s} {'poll':10s} {'before req/s':>13s} {'after req/s':>12s} {'speed-up':>9s}")
+        for logging_label in ('none', 'INFO file'):
+            if logging_label != 'none':
+                log.addHandler(handler)
+                log.setLevel(logging.INFO)
+            for label, payload in (('clean', CLEAN), ('violating', VIOLATING)):
+                before = throughput(client, 'before', payload, requests, students, exams)
+                after = throughput(client, 'after', payload, requests, students, exams)
+                print(f"{logging_label:10s} {label:10s} {before:13.0f} {after:12.0f} {after / before:8.1f}x")
+        log.removeHandler(handler)
+        handler.close()
+
+        # The handlers alone, without Flask's request handling
+        print(f"\nclean poll handler: check_violations {handler_us(check_violations, requests, students):.1f} us, "
+              f"clean_poll_response {handler_us(clean_poll_response, requests, students):.1f} us")
+
+
+if __name__ == '__main__':
+    main()
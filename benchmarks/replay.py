@@ -0,0 +1,269 @@
+"""
+Offline replay of the proctoring pipeline, stage by stage.
+
+Feeds a recorded clip or a synthetic scene through every stage that
+normally needs a live camera, and reports per-stage p50/p95/p99 latency,
+frames per second and the process' peak RSS after the stage. The face
+counts of the proctor (Haar + tracker) and student (MediaPipe) detectors
+are checked against a full-resolution Haar scan of every frame.
+
+Stages:
+    haar_full_scan   reference: the cascade on every full frame
+    process_frame    proctor detection, as the stream analysis calls it
+    suspicious       check_suspicious_activity on that metadata
+    render_encode    overlay on the streamed copy and JPEG encode
+    student_faces    student-side MediaPipe Face Detection
+    student_mesh     student-side Face Mesh landmark features
+    camera_blocked   camera blocking check
+    analyze_frame    every student-side detector, motion gate included
+    pipeline         threaded FramePipeline fed by a replayed camera at
+                     pipeline_fps (only when it is given and above 0; takes
+                     frames / fps seconds)
+
+The first argument is a clip or the name of a synthetic scene: student
+(default), visitor or session. Results can be written as JSON and
+compared with an earlier run: the exit status is 1 when a stage's p95
+latency grew by more than the tolerance (default 0.2, i.e. 20%). Pass an
+empty string to skip an argument.
+
+Usage: python -m benchmarks.replay [clip.mp4|scene] [max_frames] [pipeline_fps]
+                                   [results.json] [baseline.json] [tolerance]
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.utils import student_analysis
+from app.utils.alerts import check_suspicious_activity
+from app.utils.cascade_settings import CascadeSettings
+from app.utils.face_detection import face_cascade
+from app.utils.frame_context import FrameContext
+from app.utils.frame_processing import annotate_frame, process_frame
+from app.utils.jpeg_encoder import JpegEncoder
+from app.utils.proctor_session import ProctorSession
+from app.utils.stream_pipeline import FramePipeline
+from benchmarks.common import ReplayCamera, load_frames
+from benchmarks.face_tracking import with_visitor
+from benchmarks.motion_gate import synthetic_session
+
+WARMUP_FRAMES = 3
+# Synthetic scenes, replayed when no clip is given
+SCENES = ('student', 'visitor', 'session')
+# p95 changes smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 0.5
+
+# Face counts compared per frame: (label, detector, reference)
+AGREEMENT = (
+    ('proctor_vs_full_scan', 'process_frame', 'haar_full_scan'),
+    ('student_vs_full_scan', 'student_faces', 'haar_full_scan'),
+    ('proctor_vs_student', 'process_frame', 'student_faces'),
+    ('gated_vs_student', 'analyze_frame', 'student_faces'),
+)
+
+
+def peak_rss_mb():
+    """High-water mark of the process' resident set size."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarise(seconds):
+    ms = 1e3 * np.asarray(seconds)
+    p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+    mean = float(ms.mean())
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(mean, 3),
+        'fps': round(1e3 / mean, 1) if mean > 0 else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def time_stage(frames, stage):
+    """Seconds taken by `stage(index, frame)` on every frame, and its outputs."""
+    for i in range(min(WARMUP_FRAMES, len(frames))):
+        stage(i, frames[i])
+    seconds, outputs = [], []
+    for i, frame in enumerate(frames):
+        start = time.perf_counter()
+        outputs.append(stage(i, frame))
+        seconds.append(time.perf_counter() - start)
+    return seconds, outputs
+
+
+def stages(frames):
+    """The per-frame stages in replay order; later ones use earlier outputs."""
+    session = ProctorSession('replay')
+    encoder = JpegEncoder()
+    reference = CascadeSettings()
+    metadata = [None] * len(frames)
+
+    def proctor(i, frame):
+        _, metadata[i] = process_frame(frame, stream_key='replay', context=FrameContext(frame),
+                                       session=session, annotate=False)
+        return metadata[i]['multiple_people'][1]
+
+    def student_gated(i, frame):
+        return student_analysis.analyze_frame(frame, 'replay-student')['faces']['count']
+
+    return (
+        ('haar_full_scan', lambda i, f: len(reference.scan(face_cascade, FrameContext(f).gray))),
+        ('process_frame', proctor),
+        ('suspicious', lambda i, f: len(check_suspicious_activity(f, metadata[i], FrameContext(f), session))),
+        ('render_encode', lambda i, f: len(encoder.encode(annotate_frame(f.copy(), metadata[i], session)))),
+        ('student_faces', lambda i, f: student_analysis.detect_multiple_persons(
+            f, FrameContext(f), 'replay-faces')[1]),
+        ('student_mesh', lambda i, f: student_analysis.extract_face_features(
+            f, FrameContext(f), 'replay-mesh') is not None),
+        ('camera_blocked', lambda i, f: student_analysis.detect_camera_blocked(f, FrameContext(f))),
+        ('analyze_frame', student_gated),
+    )
+
+
+def replay_pipeline(frames, fps):
+    """Stream the frames through a FramePipeline the way gen_frames does."""
+    session = ProctorSession('replay-pipeline')
+    camera = ReplayCamera(frames, fps)
+    delivered = []
+    pipeline = FramePipeline(
+        camera,
+        analyze=lambda frame: process_frame(frame, stream_key='replay-pipeline', session=session,
+                                            annotate=False)[1],
+        render=lambda frame, metadata: annotate_frame(frame, metadata, session),
+        encode=JpegEncoder(),
+        sink=lambda payload: delivered.append(time.perf_counter()),
+        retry_delay=0.05,
+        name='replay'
+    )
+    start = time.perf_counter()
+    pipeline.start()
+    while not camera.finished:
+        time.sleep(0.05)
+    time.sleep(0.5)  # let the last frames drain
+    pipeline.stop()
+    elapsed = (delivered[-1] if delivered else time.perf_counter()) - start
+
+    stats = pipeline.stats()
+    gaps = np.diff(delivered) if len(delivered) > 1 else np.zeros(1)
+    return dict(summarise(gaps), **{
+        'capture_fps': fps,
+        'delivered': len(delivered),
+        'delivered_ratio': round(len(delivered) / len(frames), 3),
+        'stream_fps': round(len(delivered) / elapsed, 1) if elapsed > 0 else None,
+        'analysis_fps': round(stats['latency']['analysis']['count'] / elapsed, 1) if elapsed > 0 else None,
+        'dropped': {name: queue['dropped'] for name, queue in stats['queues'].items()},
+        'latency': stats['latency']
+    })
+
+
+def environment():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return {
+        'revision': revision,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'mediapipe': getattr(student_analysis.mp, '__version__', None),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def load_scene(source, limit):
+    if source == 'visitor':
+        return with_visitor(load_frames(None, limit))
+    if source == 'session':
+        return synthetic_session(limit)
+    if source in SCENES:
+        return load_frames(None, limit)
+    return load_frames(source, limit)
+
+
+def compare(results, baseline, tolerance):
+    """Print p95 changes against a baseline run; returns the regressed stages."""
+    regressed = []
+    print(f"\nagainst {baseline['environment'].get('revision') or 'baseline'} "
+          f"({baseline['frames']} frames, {baseline['source']}):")
+    if (baseline['source'], baseline['frames']) != (results['source'], results['frames']):
+        print("  note: the baseline replayed different frames")
+    for name, current in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if not before or not before.get('p95_ms'):
+            continue
+        change = current['p95_ms'] / before['p95_ms'] - 1
+        slower = current['p95_ms'] - before['p95_ms'] > MIN_REGRESSION_MS
+        flag = 'REGRESSION' if change > tolerance and slower else ''
+        if flag:
+            regressed.append(name)
+        print(f"  {name:16s} p95 {before['p95_ms']:9.2f} -> {current['p95_ms']:9.2f} ms {100 * change:+7.1f}% {flag}")
+    return regressed
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] else 'student'
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] else 240
+    pipeline_fps = float(sys.argv[3]) if len(sys.argv) > 3 and sys.argv[3] else 0.0
+    output = sys.argv[4] if len(sys.argv) > 4 else None
+    baseline_path = sys.argv[5] if len(sys.argv) > 5 else None
+    tolerance = float(sys.argv[6]) if len(sys.argv) > 6 and sys.argv[6] else 0.2
+
+    frames = load_scene(source, limit)
+    results = {
+        'environment': environment(),
+        'source': f"synthetic:{source}" if source in SCENES else source,
+        'frames': len(frames),
+        'resolution': [frames[0].shape[1], frames[0].shape[0]],
+        'stages': {},
+        'agreement': {}
+    }
+    counts = {}
+
+    print(f"frames: {len(frames)} at {frames[0].shape[1]}x{frames[0].shape[0]} ({results['source']})")
+    print(f"{'stage':16s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'fps':>8s} {'peak RSS':>9s}")
+    for name, stage in stages(frames):
+        seconds, counts[name] = time_stage(frames, stage)
+        summary = results['stages'][name] = summarise(seconds)
+        print(f"{name:16s} {summary['p50_ms']:8.2f} {summary['p95_ms']:8.2f} {summary['p99_ms']:8.2f} "
+              f"{summary['fps']:8.1f} {summary['peak_rss_mb']:6.0f} MB")
+
+    if pipeline_fps > 0:
+        summary = results['stages']['pipeline'] = replay_pipeline(frames, pipeline_fps)
+        print(f"{'pipeline':16s} {summary['p50_ms']:8.2f} {summary['p95_ms']:8.2f} {summary['p99_ms']:8.2f} "
+              f"{summary['stream_fps']:8.1f} {summary['peak_rss_mb']:6.0f} MB  (frame gaps; "
+              f"{100 * summary['delivered_ratio']:.0f}% delivered, analysis {summary['analysis_fps']} fps)")
+
+    print("\nface count agreement:")
+    for label, detector, reference in AGREEMENT:
+        agree = float(np.mean([a == b for a, b in zip(counts[detector], counts[reference])]))
+        results['agreement'][label] = round(agree, 4)
+        print(f"  {label:22s} {100 * agree:6.1f}%")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
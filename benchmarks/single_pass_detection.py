@@ -0,0 +1,78 @@
+"""
+Count Haar cascade passes and colour conversions per frame, and time the
+separate-detector path against process_frame's shared FrameContext.
+
+The session's face tracker is disabled, so process_frame scans every
+frame and the comparison measures FrameContext caching alone: exactly one
+cascade pass per frame.
+
+Usage: python -m benchmarks.single_pass_detection [clip.mp4] [max_frames]
+"""
+import sys
+import time
+
+from app.utils import face_detection
+from app.utils.frame_processing import process_frame
+from app.utils.proctor_session import ProctorSession
+from benchmarks.common import load_frames
+
+
+class CountingCascade:
+    """Wraps the cascade classifier and counts detectMultiScale calls."""
+
+    def __init__(self, cascade):
+        self.cascade = cascade
+        self.calls = 0
+        self.seconds = 0.0
+
+    def detectMultiScale(self, *args, **kwargs):
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            return self.cascade.detectMultiScale(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def separate_detectors(frame):
+    """The previous behaviour: each detector converts and scans on its own."""
+    face_detection.detect_multiple_persons(frame)
+    face_detection.extract_face_encodings(frame)
+
+
+def run(label, fn, frames, counter):
+    counter.calls, counter.seconds = 0, 0.0
+    start = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    elapsed = time.perf_counter() - start
+    print(f"{label:22s} cascade calls/frame: {counter.calls / len(frames):.2f}  "
+          f"cascade ms/frame: {1000 * counter.seconds / len(frames):6.2f}  "
+          f"total ms/frame: {1000 * elapsed / len(frames):6.2f}")
+    return counter.seconds
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    frames = load_frames(source, limit)
+
+    session = ProctorSession('benchmark')
+    session.face_tracker = None
+
+    original = face_detection.face_cascade
+    counter = CountingCascade(original)
+    face_detection.face_cascade = counter
+    try:
+        before = run('separate detectors', separate_detectors, frames, counter)
+        after = run('process_frame (shared)', lambda f: process_frame(f, session=session),
+                    frames, counter)
+    finally:
+        face_detection.face_cascade = original
+    assert counter.calls == len(frames), f"{counter.calls} cascade passes for {len(frames)} frames"
+
+    print(f"cascade cost reduction: {before / after:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Compare the student-side detectors called one by one, each converting the
+frame and running its MediaPipe graph itself, with analyze_frame, which
+runs Face Detection and Face Mesh once per frame for all of them.
+
+Usage: python -m benchmarks.student_analysis [clip.mp4] [max_frames]
+"""
+import sys
+
+from app.utils import student_analysis
+from benchmarks.common import load_frames, measure_fps
+
+STREAM = 'benchmark'
+
+
+def separate_detectors(frame):
+    """The previous behaviour: every detector starts from the raw frame."""
+    student_analysis.detect_multiple_persons(frame, stream_key=STREAM)
+    student_analysis.detect_neck_movement(frame, stream_key=STREAM)
+    student_analysis.detect_looking_away(frame, stream_key=STREAM)
+    student_analysis.detect_camera_blocked(frame)
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    frames = load_frames(source, limit)
+
+    # Measure graph sharing only: never let the motion gate skip a frame
+    student_analysis._stream_state(STREAM)['gate'].threshold = 0.0
+    # Warm up both graphs so model loading is not counted
+    student_analysis.analyze_frame(frames[0], STREAM)
+    before = measure_fps(separate_detectors, frames)
+    after = measure_fps(lambda frame: student_analysis.analyze_frame(frame, STREAM), frames)
+
+    print(f"frames: {len(frames)} ({source or 'synthetic'})")
+    print(f"separate detectors: {before:8.1f} fps")
+    print(f"analyze_frame:      {after:8.1f} fps")
+    print(f"speedup:            {after / before:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Concurrent student-side analysis: several exam sessions analysed from a
+thread pool, with the previous single shared Face Mesh / Face Detection
+pair (serialised behind a lock, which is the least it needs to be correct)
+against the per-session graph pool. Isolation between sessions is
+covered by tests/test_student_graphs.py.
+
+Usage: python -m benchmarks.student_graphs [clip.mp4] [max_frames] [sessions] [threads]
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.utils import student_analysis
+from app.utils.frame_context import FrameContext
+from benchmarks.common import load_frames
+
+
+def session_frames(frames, sessions):
+    """Per-session clips: the clip mirrored and shifted, so sessions differ."""
+    clips = []
+    for i in range(sessions):
+        clip = [np.roll(frame, 40 * i, axis=1) for frame in frames]
+        clips.append([frame[:, ::-1].copy() for frame in clip] if i % 2 else clip)
+    return clips
+
+
+def run_sessions(clips, threads, analyse):
+    """Analyse every session's clip in order, sessions spread over a thread pool."""
+    def session(i):
+        for frame in clips[i]:
+            analyse(frame, i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(session, range(len(clips))))
+    return sum(len(clip) for clip in clips) / (time.perf_counter() - start)
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    sessions = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    clips = session_frames(load_frames(source, limit), sessions)
+
+    # The previous module-level graphs, one pair for every request
+    shared_detection = student_analysis._create_face_detection()
+    shared_mesh = student_analysis._create_face_mesh()
+    shared_lock = threading.Lock()
+
+    def shared(frame, i):
+        rgb = FrameContext(frame).rgb
+        with shared_lock:
+            shared_mesh.process(rgb)
+            shared_detection.process(rgb)
+
+    def pooled(frame, i):
+        context = FrameContext(frame)
+        student_analysis.extract_face_features(frame, context, ('bench', i))
+        student_analysis.run_face_detection(frame, context, ('bench', i))
+
+    before = run_sessions(clips, threads, shared)
+    after = run_sessions(clips, threads, pooled)
+    print(f"sessions: {sessions}, threads: {threads}")
+    print(f"shared graphs + lock {before:8.1f} fps")
+    print(f"per-session graphs   {after:8.1f} fps  ({after / before:.2f}x)")
+    print(f"pool: {student_analysis.graph_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Throughput of procrastination violation writes: one insert_one per
+flagged poll on the request path (before) against the write-behind
+ViolationBuffer, with a simulated MongoDB round trip.
+
+A second run takes the database down partway through. The records must
+be spooled, then written once the database is back, with nothing lost
+and nothing written twice.
+
+Usage: python -m benchmarks.violation_buffer [students] [polls] [rtt_ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+from app.utils.violation_buffer import ViolationBuffer
+
+
+class FakeCollection:
+    """Stand-in for a collection: a fixed round trip plus a per-document cost."""
+
+    def __init__(self, rtt, per_document=20e-6):
+        self.rtt = rtt
+        self.per_document = per_document
+        self.documents = {}
+        self.round_trips = 0
+        self.down = False
+        self._lock = threading.Lock()
+
+    def insert_one(self, record):
+        self.insert_many([record])
+
+    def insert_many(self, records, ordered=True):
+        time.sleep(self.rtt + self.per_document * len(records))
+        if self.down:
+            raise ServerSelectionTimeoutError('database unavailable')
+        with self._lock:
+            self.round_trips += 1
+            duplicates = [{'code': 11000, 'index': i} for i, record in enumerate(records)
+                          if record.get('_id') in self.documents]
+            for record in records:
+                key = record.setdefault('_id', len(self.documents))
+                self.documents.setdefault(key, record)
+        if duplicates:
+            raise BulkWriteError({'writeErrors': duplicates, 'nInserted': len(records) - len(duplicates)})
+
+
+def violation(student, poll):
+    return {
+        'user_id': f"student-{student}",
+        'exam_id': 'exam-1',
+        'violations': [{'type': 'LOOKING_AWAY', 'severity': 'HIGH', 'timestamp': time.time()}],
+        'warning_count': poll,
+        'timestamp': datetime.utcnow(),
+        'auto_submit_triggered': False
+    }
+
+
+def simulate(students, polls, write):
+    """Concurrent students each writing one violation per poll; request-path seconds."""
+    latencies = [[] for _ in range(students)]
+
+    def student(index):
+        for poll in range(polls):
+            start = time.perf_counter()
+            write(violation(index, poll))
+            latencies[index].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, np.concatenate(latencies)
+
+
+def report(label, elapsed, latencies, total, collection):
+    p50, p99 = np.percentile(1e3 * latencies, (50, 99))
+    print(f"{label:24s} {total / elapsed:10.0f} {p50:9.3f} {p99:9.3f} {collection.round_trips:12d}")
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    polls = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rtt = float(sys.argv[3]) / 1e3 if len(sys.argv) > 3 else 0.002
+    total = students * polls
+    print(f"{students} students x {polls} flagged polls, {1e3 * rtt:.1f} ms round trip")
+    print(f"{'writes':24s} {'records/s':>10s} {'p50 ms':>9s} {'p99 ms':>9s} {'round trips':>12s}")
+
+    collection = FakeCollection(rtt)
+    elapsed, latencies = simulate(students, polls, collection.insert_one)
+    report('insert_one (before)', elapsed, latencies, total, collection)
+
+    collection = FakeCollection(rtt)
+    buffer = ViolationBuffer(lambda records: collection.insert_many(records, ordered=False))
+    start = time.perf_counter()
+    _, latencies = simulate(students, polls, buffer.add)
+    buffer.close()
+    report('ViolationBuffer', time.perf_counter() - start, latencies, total, collection)
+    assert len(collection.documents) == total
+
+    # Database outage in the middle of the exam
+    with tempfile.TemporaryDirectory() as directory:
+        collection = FakeCollection(rtt)
+        buffer = ViolationBuffer(lambda records: collection.insert_many(records, ordered=False),
+                                 flush_interval=0.05, spool_path=os.path.join(directory, 'spool.jsonl'))
+        collection.down = True
+        simulate(students, polls // 2, buffer.add)
+        time.sleep(0.2)
+        spooled = buffer.stats()['spooled']
+        collection.down = False
+        simulate(students, polls - polls // 2, buffer.add)
+        buffer.close()
+        written = len(collection.documents)
+        assert written == total, f"{written} of {total} records written"
+        assert not os.listdir(directory), "spool left behind"
+        print(f"\noutage: {spooled} records spooled while down, {written}/{total} written once after recovery")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Storage and read cost of a student's violation history: one
+procrastination_violations document per flagged poll (before) against the
+bucketed violation_timeline documents.
+
+An exam is simulated poll by poll. The records are applied to the
+buckets the way the ViolationBuffer writes them, one bulk write per
+flush, by a small in-memory stand-in for the bucket upserts and the
+$push/$inc/$min/$max event updates. The expanded timeline must reproduce every original violation.
+Without a MongoDB server the read side is measured as the BSON bytes and
+documents a query returns and the time to decode them into events.
+
+Usage: python -m benchmarks.violation_timeline [minutes] [poll_seconds] [violation_rate]
+"""
+import sys
+import time
+from datetime import datetime, timezone
+
+import bson
+import numpy as np
+
+from app.utils.violation_timeline import (
+    SUMMARY_PROJECTION, bucket_updates, expand_buckets, summarise_buckets
+)
+
+VIOLATIONS = (
+    ('LOOKING_AWAY', 'Looking {} - please focus on exam', 'HIGH', 0.5),
+    ('CAMERA_ISSUE', 'No face detected or camera blocked', 'HIGH', 0.15),
+    ('MULTIPLE_FACES', '{} faces detected - only one person allowed', 'HIGH', 0.05),
+    ('TAB_SWITCH', 'Tab switching detected', 'HIGH', 0.1),
+    ('WINDOW_FOCUS', 'Window focus lost', 'MEDIUM', 0.1),
+    ('TEXT_SELECTION', 'Text selection blocked', 'MEDIUM', 0.1),
+)
+
+
+def simulate_exam(minutes, poll_seconds, rate, seed=0):
+    """Per-poll records as procrastination_check builds them."""
+    rng = np.random.default_rng(seed)
+    weights = np.array([v[3] for v in VIOLATIONS])
+    start = datetime(2026, 5, 4, 9, 0, tzinfo=timezone.utc).timestamp()
+    records, warnings = [], 0
+    for poll in range(int(minutes * 60 / poll_seconds)):
+        if rng.random() >= rate:
+            continue
+        now = start + poll * poll_seconds + rng.random()
+        chosen = rng.choice(len(VIOLATIONS), size=rng.integers(1, 3), replace=False, p=weights / weights.sum())
+        violations = []
+        for index in chosen:
+            name, message, severity, _ = VIOLATIONS[index]
+            detail = rng.choice(['left', 'right']) if name == 'LOOKING_AWAY' else int(rng.integers(2, 4))
+            violations.append({'type': name, 'message': message.format(detail), 'severity': severity,
+                               'timestamp': now})
+        warnings += 1
+        records.append({
+            '_id': bson.ObjectId(),
+            'user_id': '6650f0c2a1b2c3d4e5f60718',
+            'exam_id': '6650f0c2a1b2c3d4e5f60719',
+            'violations': violations,
+            'warning_count': warnings,
+            'timestamp': datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None),
+            'auto_submit_triggered': False
+        })
+    return records
+
+
+def apply_update(buckets, operation):
+    """In-memory stand-in for one UpdateOne from bucket_updates."""
+    spec = operation._filter
+    key = (spec['student_id'], spec['exam_id'], spec['bucket'])
+    update = operation._doc
+    doc = buckets.get(key)
+    if doc is None:
+        if operation._upsert:
+            buckets[key] = {'_id': bson.ObjectId(), 'student_id': key[0], 'exam_id': key[1], 'bucket': key[2],
+                            **update['$setOnInsert']}
+        return
+    if '$setOnInsert' in update or set(spec['applied']['$nin']) & set(doc.get('applied', [])):
+        return  # bucket exists, or the batch was applied already
+    for field, push in update['$push'].items():
+        doc.setdefault(field, []).extend(push['$each'])
+    for field, amount in update['$inc'].items():
+        target = doc
+        *path, leaf = field.split('.')
+        for part in path:
+            target = target.setdefault(part, {})
+        target[leaf] = target.get(leaf, 0) + amount
+    for field, value in update['$min'].items():
+        doc[field] = min(doc.get(field, value), value)
+    for field, value in update['$max'].items():
+        doc[field] = max(doc.get(field, value), value)
+
+
+def legacy_events(documents):
+    return sorted(((datetime.fromtimestamp(v['timestamp'], tz=timezone.utc).replace(tzinfo=None), v['type'],
+                    v['severity'], v['message'], doc['warning_count'])
+                   for doc in documents for v in doc['violations']), key=lambda event: event[0])
+
+
+def timed(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return 1e3 * (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 120
+    poll_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    records = simulate_exam(minutes, poll_seconds, rate)
+
+    # One flush per second of polls, as the ViolationBuffer writes them
+    buckets = {}
+    flush, batch, last_batch = None, [], []
+    for record in records + [None]:
+        second = int(record['violations'][0]['timestamp']) if record else None
+        if batch and second != flush:
+            for operation in bucket_updates(batch):
+                apply_update(buckets, operation)
+            batch, last_batch = [], batch
+        if record:
+            flush = second
+            batch.append(record)
+    # A flush retried after it reached the database must not add events twice
+    for operation in bucket_updates(last_batch):
+        apply_update(buckets, operation)
+
+    legacy_bson = [bson.encode(record) for record in records]
+    bucket_docs = sorted(buckets.values(), key=lambda doc: doc['bucket'])
+    bucket_bson = [bson.encode(doc) for doc in bucket_docs]
+    # What get_violation_timeline reads: everything but the applied ids
+    timeline_bson = [bson.encode({k: v for k, v in doc.items() if k != 'applied'}) for doc in bucket_docs]
+    summary_bson = [bson.encode({k: v for k, v in doc.items() if k in SUMMARY_PROJECTION})
+                    for doc in bucket_docs]
+
+    expected = legacy_events(records)
+    actual = expand_buckets(bucket_docs)
+    assert len(actual) == len(expected), f"{len(actual)} events, expected {len(expected)}"
+    for before, after in zip(expected, actual):
+        assert abs((after['timestamp'] - before[0]).total_seconds()) < 0.001
+        assert (after['type'], after['severity'], after['message'], after['warning_count']) == before[1:]
+    print(f"exam: {minutes:.0f} min, poll every {poll_seconds:.0f} s, {100 * rate:.0f}% flagged -> "
+          f"{len(records)} records, {len(expected)} violations; timeline identical after expansion")
+
+    legacy_ms, _ = timed(lambda: legacy_events(bson.decode_all(b''.join(legacy_bson))))
+    bucket_ms, _ = timed(lambda: expand_buckets(bson.decode_all(b''.join(timeline_bson))))
+    summary_ms, summary = timed(lambda: summarise_buckets(bson.decode_all(b''.join(summary_bson))))
+    legacy_bytes, bucket_bytes = sum(map(len, legacy_bson)), sum(map(len, bucket_bson))
+    print(f"\nstored: {len(legacy_bson)} per-poll documents, {legacy_bytes / 1024:.1f} KB -> "
+          f"{len(bucket_bson)} buckets, {bucket_bytes / 1024:.1f} KB with applied ids "
+          f"({legacy_bytes / bucket_bytes:.1f}x smaller)")
+    print(f"\n{'read per student-exam':26s} {'documents':>10s} {'KB':>8s} {'decode ms':>10s}")
+    print(f"{'per-poll documents':26s} {len(legacy_bson):10d} {legacy_bytes / 1024:8.1f} {legacy_ms:10.2f}")
+    print(f"{'timeline buckets':26s} {len(timeline_bson):10d} {sum(map(len, timeline_bson)) / 1024:8.1f} "
+          f"{bucket_ms:10.2f}")
+    print(f"{'bucket counters (summary)':26s} {len(summary_bson):10d} {sum(map(len, summary_bson)) / 1024:8.1f} "
+          f"{summary_ms:10.2f}")
+    print(f"\nsummary: {summary['total']} events, {summary['by_type']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Multi-worker correctness and latency of the warning counter.
+
+Correctness: several processes increment the same student's counter
+through one shared SQLite store, as gunicorn workers would. With direct
+increments every returned total must be unique and the final count exact;
+with write-behind only the final count is checked, after every worker
+has flushed.
+
+Latency: the previous module-level dict (fast, but per process and lost
+on restart) against reads and increments through WarningCounter. Pass a
+MongoDB URI to measure MongoCounterStore as well.
+
+Usage: python -m benchmarks.warning_counter [workers] [increments] [mongodb_uri]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.utils.warning_counter import MongoCounterStore, SQLiteCounterStore, WarningCounter
+
+STUDENT, EXAM = 'student-1', 'exam-1'
+
+
+def worker(path, increments, write_behind, results):
+    counter = WarningCounter(SQLiteCounterStore(path), write_behind=write_behind, flush_interval=0.01)
+    totals = [counter.increment(STUDENT, EXAM) for _ in range(increments)]
+    counter.close()
+    results.put(totals)
+
+
+def check_workers(path, workers, increments, write_behind):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, increments, write_behind, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    totals = [total for _ in processes for total in results.get(timeout=120)]
+    for process in processes:
+        process.join()
+
+    expected = workers * increments
+    final = SQLiteCounterStore(path).get(STUDENT, EXAM)
+    assert final == expected, f"lost increments: {final} != {expected}"
+    if not write_behind:
+        assert sorted(totals) == list(range(1, expected + 1)), "two increments returned the same total"
+    return final
+
+
+def legacy_increment(counts, key):
+    counts[key] = counts.get(key, 0) + 1
+    return counts[key]
+
+
+def percentiles(fn, n):
+    seconds = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        seconds.append(time.perf_counter() - start)
+    return np.percentile(1e6 * np.asarray(seconds), (50, 99))
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    increments = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    mongo_uri = sys.argv[3] if len(sys.argv) > 3 else None
+
+    with tempfile.TemporaryDirectory() as directory:
+        for write_behind in (False, True):
+            path = os.path.join(directory, f"counters-{write_behind}.sqlite3")
+            start = time.perf_counter()
+            final = check_workers(path, workers, increments, write_behind)
+            print(f"{workers} workers x {increments} increments, write-behind {str(write_behind):5s}: "
+                  f"final count {final} exact, {time.perf_counter() - start:.2f} s")
+
+        stores = {'sqlite': SQLiteCounterStore(os.path.join(directory, 'latency.sqlite3'))}
+        if mongo_uri:
+            from flask import Flask
+            from app.mongodb import mongo
+            app = Flask(__name__)
+            app.config['MONGO_URI'] = mongo_uri
+            mongo.init_app(app)
+            app.app_context().push()
+            stores['mongo'] = MongoCounterStore()
+
+        n = 2000
+        counts = {}
+        print(f"\n{'operation':34s} {'p50 us':>8s} {'p99 us':>8s}")
+        rows = [('dict increment (before)', lambda i: legacy_increment(counts, (STUDENT, EXAM)))]
+        for name, store in stores.items():
+            direct = WarningCounter(store)
+            buffered = WarningCounter(store, write_behind=True)
+            uncached = WarningCounter(store, cache_ttl=0)
+            rows += [
+                (f"{name} increment", lambda i, c=direct: c.increment(STUDENT, f"{EXAM}-{i % 50}")),
+                (f"{name} read, cached", lambda i, c=direct: c.get(STUDENT, f"{EXAM}-{i % 50}")),
+                (f"{name} read, uncached", lambda i, c=uncached: c.get(STUDENT, f"{EXAM}-{i % 50}")),
+                (f"{name} increment, write-behind", lambda i, c=buffered: c.increment(STUDENT, f"{EXAM}-{i % 50}")),
+            ]
+        for label, fn in rows:
+            p50, p99 = percentiles(fn, n)
+            print(f"{label:34s} {p50:8.1f} {p99:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
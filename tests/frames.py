@@ -0,0 +1,71 @@
+"""Synthetic camera frames shared by the tests."""
+import cv2
+import numpy as np
+
+# Face box the cascade finds in every synthetic frame: (x, y, w, h) of frame 0
+FACE_BOX = (212, 134, 216, 216)
+
+
+def synthetic_frames(limit, width=640, height=480):
+    """A face-like ellipse with eyes swaying over a fixed blurred background."""
+    rng = np.random.default_rng(0)
+    background = rng.integers(40, 200, (height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (0, 0), 8)
+    frames = []
+    for i in range(limit):
+        frame = background.copy()
+        cx = width // 2 + int(20 * np.sin(i / 10.0))
+        cv2.ellipse(frame, (cx, height // 2), (80, 110), 0, 0, 360, (150, 180, 220), -1)
+        cv2.circle(frame, (cx - 30, height // 2 - 25), 10, (40, 40, 40), -1)
+        cv2.circle(frame, (cx + 30, height // 2 - 25), 10, (40, 40, 40), -1)
+        frames.append(frame)
+    return frames
+
+
+def distant_face_frame(side, position=(500, 300), width=640, height=480):
+    """A flat frame with only the synthetic face, shrunk to about `side` pixels."""
+    frame = synthetic_frames(1, width, height)[0]
+    x, y, w, h = FACE_BOX
+    margin = w // 2
+    crop = frame[y - margin:y + h + margin, x - margin:x + w + margin]
+    small = cv2.resize(crop, None, fx=side / w, fy=side / w, interpolation=cv2.INTER_AREA)
+    scene = np.full((height, width, 3), 110, np.uint8)
+    px, py = position
+    scene[py:py + small.shape[0], px:px + small.shape[1]] = small
+    return scene
+
+
+def blocking_frames(frames, seed=0):
+    """The frames plus frames at and around every camera blocking threshold."""
+    rng = np.random.default_rng(seed)
+    h, w = frames[0].shape[:2]
+    cases = list(frames)
+    for level in list(range(0, 50, 2)) + list(range(200, 256, 3)):
+        cases.append(np.full((h, w, 3), level, np.uint8))
+        noise = rng.normal(level, 6, size=(h, w, 3))
+        cases.append(np.clip(noise, 0, 255).astype(np.uint8))
+    for frame in frames[:10]:
+        # Hand over the lens, lights off, overexposed, washed out
+        cases.append(cv2.GaussianBlur(frame, (0, 0), 25))
+        cases.append((frame * 0.1).astype(np.uint8))
+        cases.append(cv2.convertScaleAbs(frame, alpha=0.3, beta=190))
+        cases.append(cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR))
+    # A dark frame with a few bright pixels, which a sample may not see
+    speckled = np.full((h, w, 3), 10, np.uint8)
+    speckled[1::7, 3::11] = 255
+    cases.append(speckled)
+    # Periodic content that a stride-4 sample sees as all bright
+    striped = np.full((h, w, 3), 10, np.uint8)
+    striped[::4] = 255
+    cases.append(striped)
+    cases.append(rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8))
+    return cases
+
+
+def session_frames(frames, sessions):
+    """Per-session clips: the clip mirrored and shifted, so sessions differ."""
+    clips = []
+    for i in range(sessions):
+        clip = [np.roll(frame, 40 * i, axis=1) for frame in frames]
+        clips.append([frame[:, ::-1].copy() for frame in clip] if i % 2 else clip)
+    return clips
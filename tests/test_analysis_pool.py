@@ -0,0 +1,74 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pytest
+
+from app.utils.analysis_pool import AnalysisPool, wait_result
+
+
+def slow(value, seconds=0.3):
+    time.sleep(seconds)
+    return value
+
+
+def test_waiting_green_thread_leaves_the_hub_serving_others():
+    eventlet = pytest.importorskip('eventlet')
+    ticks = []
+
+    def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            eventlet.sleep(0.05)
+
+    with ThreadPoolExecutor(1) as executor:
+        others = eventlet.spawn(ticker)
+        waiter = eventlet.spawn(lambda: wait_result(executor.submit(slow, 42), 2.0))
+        assert waiter.wait() == 42
+        others.wait()
+
+    # The ticker ran on schedule while the result was awaited
+    assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.3
+
+
+def test_green_wait_times_out_like_the_future():
+    eventlet = pytest.importorskip('eventlet')
+    with ThreadPoolExecutor(1) as executor:
+        waiter = eventlet.spawn(lambda: wait_result(executor.submit(slow, 1, 0.5), 0.05))
+        with pytest.raises(TimeoutError):
+            waiter.wait()
+
+
+def test_plain_threads_wait_on_the_future():
+    with ThreadPoolExecutor(1) as executor:
+        assert wait_result(executor.submit(slow, 7, 0.0), 1.0) == 7
+
+
+def tracker_refresh(stream_key):
+    from app.utils import analysis_pool
+    return os.getpid(), analysis_pool._worker_tracker(stream_key).refresh_interval
+
+
+@pytest.fixture
+def pool():
+    pool = AnalysisPool(workers=2, max_pending=8, timeout=60.0, face_track_refresh=3)
+    yield pool
+    pool.shutdown()
+
+
+def test_each_stream_stays_on_one_worker(pool):
+    streams = [('student-%d' % i, 'exam-1') for i in range(6)]
+    for _ in range(3):
+        for stream_key in streams:
+            pid, refresh = pool.run(tracker_refresh, stream_key, stream_key=stream_key)
+            assert refresh == 3
+            assert pool.run(os.getpid, stream_key=stream_key) == pid
+    pids = {pool.run(os.getpid, stream_key=stream_key) for stream_key in streams}
+    assert len(pids) == 2
+
+
+def test_work_without_a_stream_goes_to_the_idle_worker(pool):
+    busy_pid = pool.run(os.getpid, stream_key='busy')
+    busy = pool.submit(time.sleep, 1.0, stream_key='busy')
+    assert pool.run(os.getpid) != busy_pid
+    busy.result(timeout=60.0)
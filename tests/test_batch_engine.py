@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.utils import face_detection
+from app.utils.analysis_pool import AnalysisPool, PoolBusy
+from app.utils.batch_engine import BatchDetectionEngine, _prepare
+from app.utils.cascade_settings import CascadeSettings, get_detection_settings, set_detection_settings
+from tests.frames import synthetic_frames
+
+
+@pytest.fixture(params=[None, 320], ids=['full-resolution', 'downscaled'])
+def settings(request):
+    previous = get_detection_settings()
+    set_detection_settings(CascadeSettings(working_width=request.param))
+    yield get_detection_settings()
+    set_detection_settings(previous)
+
+
+@pytest.fixture(scope='module')
+def frames():
+    return synthetic_frames(6)
+
+
+def scan_in_process(frame, settings):
+    return settings.scan(face_detection.face_cascade, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+
+def test_workers_get_the_gray_frame_the_cascade_scans(frames, settings):
+    (gray, _, _), scale = _prepare(frames[0], settings)
+    assert gray.ndim == 2
+    assert gray.shape[1] == round(frames[0].shape[1] * scale)
+
+
+def test_batched_boxes_match_in_process_detection(frames, settings):
+    engine = BatchDetectionEngine(workers=1)
+    try:
+        futures = [engine.submit(frame) for frame in frames]
+        for frame, future in zip(frames, futures):
+            np.testing.assert_array_equal(future.result(timeout=60), scan_in_process(frame, settings))
+    finally:
+        engine.shutdown()
+
+
+def test_saturated_pool_rejects_instead_of_queueing(frames):
+    pool = AnalysisPool(workers=1, max_pending=1)
+    engine = BatchDetectionEngine(pool=pool)
+    try:
+        assert pool._slots.acquire(blocking=False)  # the only slot is taken
+        with pytest.raises(PoolBusy):
+            engine.detect(frames[0], timeout=10)
+        assert engine.stats()['rejected'] == 1 and pool.stats()['rejected'] == 1
+        pool._slots.release()
+        assert len(engine.detect(frames[0], timeout=60)) == 1
+    finally:
+        engine.shutdown()
+        pool.shutdown()
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.utils import student_analysis
+from app.utils.frame_context import FrameContext
+from tests.frames import blocking_frames, synthetic_frames
+
+
+@pytest.fixture(scope='module')
+def cases():
+    return blocking_frames(synthetic_frames(20))
+
+
+def baseline(frame, monkeypatch):
+    """detect_camera_blocked over the full frame, with the probe disabled."""
+    with monkeypatch.context() as patch:
+        patch.setattr(student_analysis, '_camera_blocked_probe', lambda frame, context=None: None)
+        return student_analysis.detect_camera_blocked(frame, FrameContext(frame))
+
+
+def test_probe_matches_full_frame_analysis(cases, monkeypatch):
+    for i, frame in enumerate(cases):
+        expected = baseline(frame, monkeypatch)
+        actual = student_analysis.detect_camera_blocked(frame, FrameContext(frame))
+        assert (actual[0], actual[2]) == (expected[0], expected[2]), i
+        assert actual[1] == pytest.approx(expected[1]), i
+
+
+def test_periodic_rows_are_not_mistaken_for_a_bright_block(monkeypatch):
+    striped = np.full((480, 640, 3), 10, np.uint8)
+    striped[::4] = 255
+    result = student_analysis.detect_camera_blocked(striped, FrameContext(striped))
+    assert result == baseline(striped, monkeypatch)
+    assert result[2] != 'bright_blocking'
+
+
+def test_probe_decides_colour_frames_with_the_exact_mean(cases):
+    for frame in cases:
+        result = student_analysis._camera_blocked_probe(frame, FrameContext(frame))
+        assert result is not None
+        assert result[1] == pytest.approx(np.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+
+
+def test_probe_leaves_grayscale_frames_to_the_full_analysis():
+    assert student_analysis._camera_blocked_probe(np.zeros((48, 64), np.uint8)) is None
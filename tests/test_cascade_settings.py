@@ -0,0 +1,34 @@
+import cv2
+import pytest
+
+from app.utils.cascade_settings import CASCADE_WINDOW, CascadeSettings
+from app.utils.face_detection import face_cascade
+from tests.frames import distant_face_frame
+
+# The PROCTORING_THRESHOLDS defaults of create_app
+APP_THRESHOLDS = {
+    'DETECTION_WIDTH': 320,
+    'DETECTION_SCALE_FACTOR': 1.2,
+    'DETECTION_MIN_NEIGHBORS': 5,
+    'MIN_FACE_RATIO': 30 / 480,
+    'MAX_FACE_RATIO': None
+}
+
+
+def test_downscaling_keeps_the_smallest_face_in_the_cascade_window():
+    settings = CascadeSettings.from_thresholds(APP_THRESHOLDS)
+    scale = settings.scale_for(640, 480)
+    assert settings.min_face_ratio * 480 * scale >= CASCADE_WINDOW - 1e-9
+    assert scale == pytest.approx(512 / 640)
+    # Larger frames are still downscaled as far as the faces allow
+    assert settings.scale_for(1280, 960) == pytest.approx(0.4)
+    assert settings.scale_for(320, 240) == 1.0
+
+
+@pytest.mark.parametrize('side', [35, 40])
+def test_background_face_is_found_at_the_default_resolution(side):
+    gray = cv2.cvtColor(distant_face_frame(side), cv2.COLOR_BGR2GRAY)
+    faces = CascadeSettings.from_thresholds(APP_THRESHOLDS).scan(face_cascade, gray)
+    assert len(faces) == 1
+    x, y, w, h = faces[0]
+    assert 500 <= x + w / 2 <= 500 + 2 * side and side * 0.8 <= w <= side * 1.4
@@ -0,0 +1,93 @@
+import pytest
+from flask import Flask
+from flask_login import LoginManager, UserMixin, login_user
+
+from app import socketio
+from app.utils.exam_channel import EXAM_NAMESPACE, ExamNamespace
+from app.utils.procrastination import MAX_WARNINGS
+from app.utils.violation_buffer import ViolationBuffer, get_violation_buffer, set_violation_buffer
+from app.utils.warning_counter import SQLiteCounterStore, WarningCounter, get_warning_counter, set_warning_counter
+
+STUDENT, EXAM = 'student-1', 'exam-1'
+CLEAN = {'faceData': {'numFaces': 1, 'poseDirection': 'center'}, 'browserData': {}, 'inputData': {}}
+VIOLATING = {'faceData': {'numFaces': 1, 'poseDirection': 'left'}, 'browserData': {}, 'inputData': {}}
+
+
+class User(UserMixin):
+    def __init__(self, user_id, role='student'):
+        self.id = user_id
+        self.role = role
+
+
+@pytest.fixture(scope='module')
+def app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    LoginManager(app).user_loader(lambda user_id: User(user_id, 'teacher' if user_id == 'teacher-1' else 'student'))
+
+    @app.route('/login/<user_id>')
+    def login(user_id):
+        login_user(User(user_id))
+        return 'ok'
+
+    socketio.init_app(app, async_mode='threading')
+    socketio.on_namespace(ExamNamespace())
+    return app
+
+
+@pytest.fixture(autouse=True)
+def counter(tmp_path):
+    counter = WarningCounter(SQLiteCounterStore(str(tmp_path / 'counters.sqlite3')))
+    previous_counter, previous_buffer = get_warning_counter(), get_violation_buffer()
+    set_warning_counter(counter)
+    set_violation_buffer(ViolationBuffer(write=lambda records: None))
+    yield counter
+    set_warning_counter(previous_counter)
+    set_violation_buffer(previous_buffer)
+
+
+def connect(app, user_id=None, auth=None):
+    client = app.test_client()
+    if user_id is not None:
+        client.get(f"/login/{user_id}")
+    return socketio.test_client(app, namespace=EXAM_NAMESPACE, flask_test_client=client,
+                                auth={'exam_id': EXAM} if auth is None else auth)
+
+
+@pytest.mark.parametrize('user_id, auth', [(None, None), ('teacher-1', None), (STUDENT, {})],
+                         ids=['anonymous', 'teacher', 'no-exam'])
+def test_connects_are_refused_without_a_student_and_exam(app, user_id, auth):
+    channel = connect(app, user_id, auth)
+    assert not channel.is_connected(EXAM_NAMESPACE)
+
+
+def test_poll_is_acknowledged_with_the_check_result(app, counter):
+    channel = connect(app, STUDENT)
+    assert channel.is_connected(EXAM_NAMESPACE)
+
+    clean = channel.emit('poll', CLEAN, namespace=EXAM_NAMESPACE, callback=True)
+    assert clean['success'] and clean['violations'] == [] and clean['warningCount'] == 0
+    flagged = channel.emit('poll', VIOLATING, namespace=EXAM_NAMESPACE, callback=True)
+    assert [v['type'] for v in flagged['violations']] == ['LOOKING_AWAY']
+    assert flagged['warningCount'] == counter.get(STUDENT, EXAM) == 1
+    assert not flagged['autoSubmit']
+    assert channel.get_received(EXAM_NAMESPACE) == []
+    channel.disconnect(EXAM_NAMESPACE)
+
+
+def test_warning_limit_pushes_auto_submit_to_every_page_of_the_student(app, counter):
+    pages = [connect(app, STUDENT), connect(app, STUDENT)]
+    other = connect(app, 'student-2')
+    counter.increment(STUDENT, EXAM, MAX_WARNINGS - 1)
+
+    result = pages[0].emit('poll', VIOLATING, namespace=EXAM_NAMESPACE, callback=True)
+    assert result['autoSubmit'] and result['warningCount'] == MAX_WARNINGS
+
+    for page in pages:
+        received = page.get_received(EXAM_NAMESPACE)
+        assert [(event['name'], event['args'][0]['warningCount']) for event in received] == \
+            [('auto_submit', MAX_WARNINGS)]
+        assert received[0]['args'][0]['examId'] == EXAM
+    assert other.get_received(EXAM_NAMESPACE) == []
+    for channel in pages + [other]:
+        channel.disconnect(EXAM_NAMESPACE)
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.graph_pool import GraphPool
+
+
+class Graph:
+    def __init__(self, build_seconds=0.0):
+        time.sleep(build_seconds)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_slow_build_does_not_block_other_keys():
+    build_seconds = {'slow': 0.5}
+    building = threading.Event()
+
+    def factory():
+        seconds = build_seconds.pop('slow', 0.0)
+        if seconds:
+            building.set()
+        return Graph(seconds)
+
+    pool = GraphPool(factory, max_size=4)
+    with pool.checkout('ready'):
+        pass
+
+    def slow_checkout():
+        with pool.checkout('new'):
+            pass
+
+    thread = threading.Thread(target=slow_checkout)
+    thread.start()
+    assert building.wait(1.0)
+    start = time.monotonic()
+    with pool.checkout('ready'):
+        pass
+    with pool.checkout('other'):
+        pass
+    waited = time.monotonic() - start
+    thread.join()
+
+    assert waited < 0.25
+    assert pool.stats()['created'] == 3
+
+
+def test_concurrent_checkouts_of_a_new_key_build_one_graph():
+    pool = GraphPool(lambda: Graph(0.1), max_size=4)
+    seen = []
+
+    def checkout():
+        with pool.checkout('student'):
+            with pool._lock:
+                seen.append(pool._entries['student'].graph)
+
+    threads = [threading.Thread(target=checkout) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(graph) for graph in seen}) == 1
+    assert pool.stats()['created'] == 1
+
+
+def test_failed_build_is_retried_by_the_next_checkout():
+    failures = [RuntimeError('model missing')]
+
+    def factory():
+        if failures:
+            raise failures.pop()
+        return Graph()
+
+    pool = GraphPool(factory, max_size=2)
+    with pytest.raises(RuntimeError):
+        with pool.checkout('student'):
+            pass
+    assert pool.stats() == dict(pool.stats(), size=1, in_use=0, created=0)
+
+    with pool.checkout('student') as graph:
+        assert isinstance(graph, Graph)
+    assert pool.stats()['created'] == 1
+
+
+def test_scratch_graphs_are_closed_and_not_pooled():
+    pool = GraphPool(Graph, max_size=2)
+    with pool.scratch() as graph:
+        pass
+    assert graph.closed
+    assert pool.stats()['size'] == 0
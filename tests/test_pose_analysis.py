@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from app.utils import pose_analysis
+from app.utils.graph_pool import GraphPool
+from app.utils.proctor_session import ProctorSession
+
+
+class FakeMesh:
+    """FaceMesh stand-in that finds no face and records what it was given."""
+
+    multi_face_landmarks = None
+
+    def __init__(self):
+        self.frames = 0
+
+    def process(self, _image):
+        self.frames += 1
+        return self
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    tracking, static = GraphPool(FakeMesh), GraphPool(FakeMesh)
+    monkeypatch.setattr(pose_analysis, 'face_mesh_pool', tracking)
+    monkeypatch.setattr(pose_analysis, 'static_face_mesh_pool', static)
+    return tracking, static
+
+
+def frame():
+    return np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def test_sessions_without_a_stream_key_track_with_their_own_graph(pools):
+    tracking, static = pools
+    for key in ('student-1:exam-1', 'student-2:exam-1', 'student-1:exam-1'):
+        assert pose_analysis.detect_neck_movement(frame(), session=ProctorSession(key)) == (False, 0.0)
+
+    assert set(tracking._entries) == {'student-1:exam-1', 'student-2:exam-1'}
+    assert tracking._entries['student-1:exam-1'].graph.frames == 2
+    assert static.stats()['created'] == 0
+
+
+def test_frames_of_no_stream_use_the_static_graph(pools):
+    tracking, static = pools
+    for _ in range(2):
+        assert pose_analysis.extract_head_position(frame()) is None
+
+    assert tracking.stats()['created'] == 0
+    assert static.stats()['created'] == 1
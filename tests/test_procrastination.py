@@ -0,0 +1,74 @@
+import itertools
+import time
+
+import pytest
+
+from app.utils import procrastination
+from app.utils.violation_buffer import ViolationBuffer, get_violation_buffer, set_violation_buffer
+from app.utils.warning_counter import SQLiteCounterStore, WarningCounter, get_warning_counter, set_warning_counter
+
+STUDENT, EXAM = 'student-1', 'exam-1'
+
+FACES = [
+    {'numFaces': 1, 'poseDirection': 'center'},
+    {'numFaces': 1, 'poseDirection': 'up'},
+    {'numFaces': 1},
+    {'numFaces': 0},
+    {'numFaces': 2, 'poseDirection': 'center'},
+    {'numFaces': 1, 'poseDirection': 'left'},
+    {'numFaces': 1, 'poseDirection': 'right'},
+    {'numFaces': 1, 'poseDirection': 'center', 'cameraBlocked': True},
+    {'numFaces': 1, 'poseDirection': 'center', 'cameraBlocked': False},
+]
+
+
+def flag_sets(flags):
+    yield {}
+    for flag in flags:
+        yield {flag: False}
+        yield {flag: True}
+
+
+PAYLOADS = [
+    {'faceData': face, 'browserData': browser, 'inputData': inputs}
+    for face, browser, inputs in itertools.product(
+        FACES, flag_sets(procrastination.BROWSER_FLAGS), flag_sets(procrastination.INPUT_FLAGS))
+] + [{}, {'faceData': {'numFaces': 1, 'poseDirection': 'center'}}]
+
+
+@pytest.fixture
+def counter(tmp_path):
+    counter = WarningCounter(SQLiteCounterStore(str(tmp_path / 'counters.sqlite3')), cache_ttl=0.05)
+    previous_counter, previous_buffer = get_warning_counter(), get_violation_buffer()
+    set_warning_counter(counter)
+    set_violation_buffer(ViolationBuffer(write=lambda records: None))
+    yield counter
+    set_warning_counter(previous_counter)
+    set_violation_buffer(previous_buffer)
+
+
+def test_fast_path_flags_exactly_what_check_violations_flags(counter):
+    flagged = 0
+    for payload in PAYLOADS:
+        counter.reset(STUDENT, EXAM)
+        result = procrastination.check_violations(STUDENT, EXAM, payload)
+        assert procrastination.has_violation_flags(payload) == bool(result['violations']), payload
+        flagged += bool(result['violations'])
+    assert 0 < flagged < len(PAYLOADS)
+
+
+def test_clean_poll_matches_check_violations(counter):
+    payload = {'faceData': {'numFaces': 1, 'poseDirection': 'center'}, 'browserData': {}, 'inputData': {}}
+    counter.increment(STUDENT, EXAM)
+    assert procrastination.clean_poll_result(STUDENT, EXAM, payload) == \
+        procrastination.check_violations(STUDENT, EXAM, payload)
+
+
+def test_clean_poll_sees_other_workers_increments(counter):
+    payload = {'faceData': {'numFaces': 1, 'poseDirection': 'center'}}
+    assert procrastination.clean_poll_result(STUDENT, EXAM, payload)['warningCount'] == 0
+    other_worker = WarningCounter(counter.store)
+    for _ in range(3):
+        other_worker.increment(STUDENT, EXAM)
+    time.sleep(counter.cache_ttl)
+    assert procrastination.clean_poll_result(STUDENT, EXAM, payload)['warningCount'] == 3
@@ -0,0 +1,57 @@
+import pytest
+from flask import Flask, session
+from flask_login import LoginManager, UserMixin, login_user
+
+from tests.frames import synthetic_frames
+from tests.routes import load_route_module
+
+proctor = load_route_module('proctor')
+
+
+class Student(UserMixin):
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    LoginManager(app).user_loader(Student)
+    return app
+
+
+def upload_key(app, fields, cookies=None, user=None):
+    with app.test_request_context('/proctor/verify_frame', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        if cookies:
+            session.update(cookies)
+        if user is not None:
+            login_user(Student(user))
+        return proctor._upload_stream_key(fields)
+
+
+def test_exam_uploads_are_keyed_by_student_and_exam(app):
+    assert upload_key(app, {'student_id': 's1', 'exam_id': 'e1'}) == proctor.session_key('s1', 'e1')
+    assert upload_key(app, {'exam_id': 'e1'}, user='s2') == proctor.session_key('s2', 'e1')
+
+
+def test_clients_behind_one_address_get_separate_sessions(app):
+    first = upload_key(app, {})
+    second = upload_key(app, {})
+    assert first != second
+    assert '10.0.0.1' not in first + second
+    # The same browser session keeps its key
+    assert upload_key(app, {}, cookies={'proctor_stream_id': 'abc'}) == 'client:abc'
+    assert upload_key(app, {'stream_id': 'cam-2'}) == 'client:cam-2'
+
+
+def test_unchanged_upload_reuses_the_response_without_timers(app):
+    frame = synthetic_frames(1)[0]
+    with app.test_request_context('/proctor/verify_frame'):
+        first = proctor._verify_frame(frame, 'client:reuse').get_json()
+        second = proctor._verify_frame(frame.copy(), 'client:reuse').get_json()
+    session = proctor.proctor_sessions.get('client:reuse')
+
+    assert not first['reused'] and second['reused']
+    assert dict(second, reused=False) == first
+    assert all(tracking['start_time'] is None for tracking in session.continuous_tracking.values())
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.utils import student_analysis
+from app.utils.frame_context import FrameContext
+from app.utils.landmark_features import FEATURE_LANDMARKS, LandmarkFeatures
+from tests.frames import session_frames, synthetic_frames
+
+
+@pytest.fixture(scope='module')
+def clips():
+    return session_frames(synthetic_frames(8), 3)
+
+
+def features_of(frame, key):
+    features = student_analysis.extract_face_features(frame, FrameContext(frame), key)
+    detections = student_analysis.run_face_detection(frame, FrameContext(frame), key)
+    nose = None if features is None else tuple(np.round(features.nose, 4))
+    return nose, len(detections)
+
+
+def release(*keys):
+    for key in keys:
+        student_analysis.release_graphs(key)
+
+
+def test_interleaved_streams_match_streams_analysed_alone(clips):
+    alone = []
+    for i, clip in enumerate(clips):
+        alone.append([features_of(frame, ('alone', i)) for frame in clip])
+        release(('alone', i))
+
+    interleaved = [[] for _ in clips]
+    for step in range(len(clips[0])):
+        for i, clip in enumerate(clips):
+            interleaved[i].append(features_of(clip[step], ('mixed', i)))
+    release(*(('mixed', i) for i in range(len(clips))))
+
+    assert interleaved == alone
+
+
+def test_each_stream_owns_its_graphs(clips):
+    keys = [('graphs', i) for i in range(len(clips))]
+    graphs = []
+    for key, clip in zip(keys, clips):
+        features_of(clip[0], key)
+        with student_analysis.face_mesh_pool.checkout(key) as face_mesh:
+            graphs.append(face_mesh)
+    release(*keys)
+
+    assert len({id(graph) for graph in graphs}) == len(keys)
+
+
+def face(rng, shift=0.0):
+    """Landmark features of a face around the frame centre."""
+    points = rng.uniform(0.4, 0.6, size=(len(FEATURE_LANDMARKS), 2)) + shift
+    return LandmarkFeatures(points, (640, 480))
+
+
+def test_neck_history_is_kept_per_stream(clips):
+    rng = np.random.default_rng(0)
+    first, second = ('neck', 0), ('neck', 1)
+    for frame in clips[0]:
+        student_analysis.detect_neck_movement(frame, features=face(rng), stream_key=first)
+    _, ratio, _ = student_analysis.detect_neck_movement(clips[1][0], features=face(rng, 0.2), stream_key=second)
+
+    history = student_analysis._stream_state(first)['positions']
+    other = student_analysis._stream_state(second)['positions']
+    release(first, second)
+
+    # The second stream's first frame has nothing to move from, however
+    # far it is from the first stream's face
+    assert ratio == 0.0
+    assert len(history) == len(clips[0])
+    assert len(other) == 1 and other[0] not in history
+
+
+def test_neck_movement_without_a_stream_key_reports_no_history(clips):
+    rng = np.random.default_rng(1)
+    before = student_analysis.graph_stats()
+    for frame in clips[0][:2]:
+        assert student_analysis.detect_neck_movement(frame) == (False, 0.0, 'no_history')
+        assert student_analysis.detect_neck_movement(frame, features=face(rng)) == (False, 0.0, 'no_history')
+
+    # Nothing was run, so no graph was built
+    assert student_analysis.graph_stats() == before
+    assert None not in student_analysis._stream_states
+
+
+def test_calls_without_a_stream_key_share_stateless_graphs(clips):
+    for frame in clips[0]:
+        assert not student_analysis.analyze_frame(frame)['reused']
+        assert not student_analysis.analyze_frame(frame)['reused']
+
+    stats = student_analysis.graph_stats()
+    assert stats['static_face_mesh']['created'] == 1
+    with student_analysis.checkout_graph(student_analysis.face_mesh_pool) as face_mesh:
+        pass
+    with student_analysis.static_face_mesh_pool.checkout(student_analysis.STATIC_GRAPH_KEY) as static:
+        assert face_mesh is static
+    assert student_analysis.face_mesh_pool.stats() == stats['face_mesh']
+    assert None not in student_analysis._stream_states
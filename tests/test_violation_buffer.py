@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+
+from bson import json_util
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+from app.utils.violation_buffer import ViolationBuffer
+
+
+class Writer:
+    """Records written batches; raises the queued errors first."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.batches = []
+
+    def __call__(self, records):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.batches.append([record['_id'] for record in records])
+
+
+def violation(n):
+    return {'user_id': 'student-1', 'exam_id': 'exam-1', 'violations': [], 'warning_count': n}
+
+
+def refused(code):
+    return BulkWriteError({'writeErrors': [{'code': code, 'index': 0, 'errmsg': 'refused'}], 'nInserted': 0})
+
+
+def test_duplicates_count_as_written():
+    write = Writer(refused(11000))
+    buffer = ViolationBuffer(write, flush_interval=60)
+    buffer.add(violation(1))
+    assert buffer.flush() == 1
+    assert buffer.stats()['pending'] == 0 and buffer.duplicates == 1
+
+
+def test_refused_records_are_kept_and_retried():
+    write = Writer(refused(121))
+    buffer = ViolationBuffer(write, flush_interval=60)
+    buffer.add(violation(1))
+    assert buffer.flush() == 0
+    assert buffer.stats()['pending'] == 1 and buffer.rejected == 1
+    assert buffer.flush() == 1
+    assert len(write.batches) == 1
+
+
+def test_refused_batch_does_not_hold_back_newer_ones(tmp_path):
+    write = Writer(refused(121))
+    buffer = ViolationBuffer(write, flush_interval=60, spool_path=str(tmp_path / 'spool.jsonl'))
+    buffer.add(violation(1))
+    buffer.flush()
+    buffer.add(violation(2))
+    # The spooled batch is written on this flush, and the new one after it
+    assert buffer.flush() == 2
+    assert len(write.batches) == 2 and not os.listdir(tmp_path)
+
+
+def test_unreachable_database_spools_the_batch(tmp_path):
+    spool = tmp_path / 'spool.jsonl'
+    write = Writer(ServerSelectionTimeoutError('down'))
+    buffer = ViolationBuffer(write, flush_interval=60, spool_path=str(spool))
+    buffer.add(violation(1))
+    assert buffer.flush() == 0 and spool.exists()
+    assert buffer.flush() == 1 and not spool.exists()
+
+
+def test_spool_claimed_by_a_dead_worker_is_recovered(tmp_path):
+    spool = tmp_path / 'spool.jsonl'
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    records = [dict(violation(1), _id='a'), dict(violation(2), _id='b')]
+    (tmp_path / f"spool.jsonl.{dead.pid}").write_text(json_util.dumps(records) + '\n')
+
+    write = Writer()
+    buffer = ViolationBuffer(write, flush_interval=60, spool_path=str(spool))
+    assert buffer.flush() == 2
+    assert write.batches == [['a', 'b']] and not os.listdir(tmp_path)
+
+
+def test_spool_of_a_running_worker_is_left_alone(tmp_path):
+    spool = tmp_path / 'spool.jsonl'
+    claimed = tmp_path / f"spool.jsonl.{os.getppid()}"
+    claimed.write_text(json_util.dumps([dict(violation(1), _id='a')]) + '\n')
+    buffer = ViolationBuffer(Writer(), flush_interval=60, spool_path=str(spool))
+    assert buffer.flush() == 0 and claimed.exists()
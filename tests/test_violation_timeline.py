@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.mongodb import mongo
+from app.utils import violation_timeline
+from app.utils.violation_timeline import bucket_updates, write_timeline
+
+
+def record(timestamp, violation_type='TAB_SWITCH'):
+    return {
+        '_id': ObjectId(),
+        'user_id': 'student-1',
+        'exam_id': 'exam-1',
+        'violations': [{'type': violation_type, 'message': 'Tab switching detected', 'severity': 'HIGH',
+                        'timestamp': timestamp}],
+        'warning_count': 1,
+        'timestamp': datetime.utcnow(),
+        'auto_submit_triggered': False
+    }
+
+
+class FakeTimeline:
+    """Collection whose bulk_write fails with the given errors, then succeeds."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def bulk_write(self, updates, ordered=True):
+        self.calls.append((updates, ordered))
+        if self.errors:
+            raise BulkWriteError({'writeErrors': self.errors.pop(0), 'nInserted': 0})
+
+
+@pytest.fixture
+def timeline(monkeypatch):
+    def install(*errors):
+        collection = FakeTimeline(*errors)
+        monkeypatch.setattr(mongo, 'db', type('Db', (), {'violation_timeline': collection})(), raising=False)
+        return collection
+    return install
+
+
+def test_buckets_are_created_before_events_are_applied():
+    records = [record(1_700_000_000.0), record(1_700_000_400.0)]
+    updates = bucket_updates(records)
+
+    creates, events = updates[:2], updates[2:]
+    assert all(op._upsert and set(op._doc) == {'$setOnInsert'} and 'applied' not in op._filter for op in creates)
+    assert not any(op._upsert for op in events)
+    # Every event keeps the id of its record; nothing is capped
+    assert [op._filter['applied']['$nin'] for op in events] == [[records[0]['_id']], [records[1]['_id']]]
+    assert [op._doc['$push']['applied']['$each'] for op in events] == [[records[0]['_id']], [records[1]['_id']]]
+
+
+def test_lost_bucket_race_is_written_again(timeline):
+    collection = timeline([{'code': 11000, 'index': 0}])
+    write_timeline([record(1_700_000_000.0)])
+    assert len(collection.calls) == 2
+    assert all(ordered for _, ordered in collection.calls)
+
+
+def test_persistent_conflict_is_not_taken_for_a_duplicate(timeline):
+    conflict = [{'code': 11000, 'index': 0}]
+    timeline(*[conflict] * violation_timeline.UPSERT_ATTEMPTS)
+    with pytest.raises(PyMongoError) as raised:
+        write_timeline([record(1_700_000_000.0)])
+    assert not isinstance(raised.value, BulkWriteError)
+
+
+def test_other_write_errors_are_raised(timeline):
+    collection = timeline([{'code': 121, 'index': 1, 'errmsg': 'Document failed validation'}])
+    with pytest.raises(BulkWriteError):
+        write_timeline([record(1_700_000_000.0)])
+    assert len(collection.calls) == 1
+
+
+class FakeLegacy:
+    """procrastination_violations stand-in: find().sort('_id', 1) yields the records."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def find(self):
+        return self
+
+    def sort(self, field, direction):
+        return iter(sorted(self.records, key=lambda record: record[field], reverse=direction < 0))
+
+
+def test_legacy_records_migrate_in_stable_batches(monkeypatch):
+    records = [record(1_700_000_000.0 + 10 * i) for i in range(5)]
+    timeline = FakeTimeline()
+    db = type('Db', (), {'violation_timeline': timeline,
+                         'procrastination_violations': FakeLegacy(records[::-1])})()
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    assert violation_timeline.migrate_legacy_records(batch_size=2) == 5
+    first = [[op._filter for op in updates] for updates, _ in timeline.calls]
+    assert violation_timeline.migrate_legacy_records(batch_size=2) == 5
+    again = [[op._filter for op in updates] for updates, _ in timeline.calls[len(first):]]
+
+    # Every record is written once, in _id order, in batches of two
+    applied = [spec['applied']['$nin'] for batch in first for spec in batch if 'applied' in spec]
+    assert applied == [[records[0]['_id'], records[1]['_id']], [records[2]['_id'], records[3]['_id']],
+                       [records[4]['_id']]]
+    # A second run sends the same bucket updates, which the buckets skip
+    assert again == first
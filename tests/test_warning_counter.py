@@ -0,0 +1,100 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from app.utils.warning_counter import SQLiteCounterStore, WarningCounter
+
+STUDENT, EXAM = 'student-1', 'exam-1'
+WORKERS, INCREMENTS = 4, 100
+
+
+def worker(path, returning, write_behind, results):
+    store = SQLiteCounterStore(path)
+    store.returning = returning
+    counter = WarningCounter(store, write_behind=write_behind, flush_interval=0.01)
+    totals = [counter.increment(STUDENT, EXAM) for _ in range(INCREMENTS)]
+    counter.close()
+    results.put((totals, counter.stats()['store_errors']))
+
+
+def run_workers(path, returning, write_behind):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, returning, write_behind, results))
+                 for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+    return [total for totals, _ in outcomes for total in totals], sum(errors for _, errors in outcomes)
+
+
+@pytest.mark.parametrize('returning', [True, False], ids=['returning', 'update-select'])
+def test_concurrent_workers_never_share_a_total(tmp_path, returning):
+    path = str(tmp_path / 'counters.sqlite3')
+    totals, errors = run_workers(path, returning, write_behind=False)
+    assert errors == 0
+    assert sorted(totals) == list(range(1, WORKERS * INCREMENTS + 1))
+    assert SQLiteCounterStore(path).get(STUDENT, EXAM) == WORKERS * INCREMENTS
+
+
+def test_write_behind_workers_lose_no_increments(tmp_path):
+    path = str(tmp_path / 'counters.sqlite3')
+    _, errors = run_workers(path, True, write_behind=True)
+    assert errors == 0
+    assert SQLiteCounterStore(path).get(STUDENT, EXAM) == WORKERS * INCREMENTS
+
+
+@pytest.mark.parametrize('returning', [True, False], ids=['returning', 'update-select'])
+def test_reset_and_increment_again(tmp_path, returning):
+    store = SQLiteCounterStore(str(tmp_path / 'counters.sqlite3'))
+    store.returning = returning
+    assert store.reset(STUDENT, EXAM)
+    assert store.increment(STUDENT, EXAM, 3) == 3
+    assert store.reset(STUDENT, EXAM) and store.get(STUDENT, EXAM) == 0
+    assert store.increment(STUDENT, EXAM) == 1
+
+
+class SlowStore(SQLiteCounterStore):
+    """Store whose increments of one key wait until released."""
+
+    def __init__(self, path, slow_key):
+        super().__init__(path)
+        self.slow_key = slow_key
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def increment(self, student_id, exam_id, amount=1):
+        if (student_id, exam_id) == self.slow_key:
+            self.entered.set()
+            self.release.wait(10)
+        return super().increment(student_id, exam_id, amount)
+
+
+def test_reset_during_flush_drops_the_buffered_increments(tmp_path):
+    other = ('student-2', EXAM)
+    store = SlowStore(str(tmp_path / 'counters.sqlite3'), (STUDENT, EXAM))
+    counter = WarningCounter(store, write_behind=True, flush_interval=60.0)
+    for _ in range(5):
+        counter.increment(STUDENT, EXAM)
+        counter.increment(*other)
+
+    # The flush has taken both keys from the buffer and is writing one
+    # of them when both are reset
+    flush = threading.Thread(target=counter.flush)
+    flush.start()
+    assert store.entered.wait(10)
+    resets = [threading.Thread(target=counter.reset, args=key) for key in ((STUDENT, EXAM), other)]
+    for reset in resets:
+        reset.start()
+    time.sleep(0.1)
+    store.release.set()
+    for thread in [flush] + resets:
+        thread.join(10)
+
+    assert store.get(STUDENT, EXAM) == 0 and store.get(*other) == 0
+    assert counter.get(STUDENT, EXAM) == 0 and counter.get(*other) == 0
+    counter.close()
+    assert store.get(STUDENT, EXAM) == 0 and store.get(*other) == 0